@@ -0,0 +1,53 @@
+"""
+Benchmark merging additive list options.
+
+Merges two lists of 100,000 items (half of them shared) with
+`StringListOption(additive=True).merge_value`, and with the previous
+item-by-item list scan for 1,000 to 10,000 items: scanning 100,000
+items would take hours.
+
+Usage: python benchmarks/additive_merge.py [repetitions]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# pylint: disable=wrong-import-position
+from user_config import StringListOption
+
+def scan_merge(current, value):
+    """Merge the way additive lists used to, scanning the result."""
+    result = list(current)
+    for item in value:
+        if item not in result:
+            result.append(item)
+    return result
+
+def lists(items):
+    """Return two lists of `items` host names, half of them shared."""
+    current = ['host{}'.format(index) for index in range(items)]
+    value = ['host{}'.format(index + items // 2) for index in range(items)]
+    return current, value
+
+def main(repetitions=3):
+    """Print best time per list size and merge."""
+    option = StringListOption(additive=True)
+    for items in (1000, 10000, 100000):
+        current, value = lists(items)
+        merged = min(timeit.repeat(
+            lambda: option.merge_value(current, value),
+            number=1, repeat=repetitions))
+        if items <= 10000:
+            scanned = min(timeit.repeat(
+                lambda: scan_merge(current, value),
+                number=1, repeat=repetitions))
+            print("{:>7} items: merge_value {:8.2f} ms, scan {:10.2f} ms"
+                  " ({:.0f}x)".format(
+                      items, merged * 1000, scanned * 1000, scanned / merged))
+        else:
+            print("{:>7} items: merge_value {:8.2f} ms".format(
+                items, merged * 1000))
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,57 @@
+"""
+Microbenchmark for reading configuration values.
+
+Compares `config.general.name` and `config['general']['name']` to the
+same lookups on plain dicts and a plain attribute load.
+
+Usage: python benchmarks/attribute_access.py [repetitions]
+"""
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'examples')]
+# pylint: disable=wrong-import-position
+from simple_example import MyConfig
+
+NUMBER = 1000000
+
+class Plain(object):
+
+    """Object with a plain attribute."""
+
+    def __init__(self):
+        self.name = "unknown person"
+
+def main(repetitions=5):
+    """Print best time per lookup."""
+    sys.argv = [sys.argv[0], '--age', '42']
+    config = MyConfig()
+    general = config.general
+    data = {'general': {'name': "unknown person"}}
+    section = data['general']
+    plain = Plain()
+    plain.general = plain
+    statements = [
+        ("config.general.name", "config.general.name"),
+        ("config['general']['name']", "config['general']['name']"),
+        ("general.name (bound section)", "general.name"),
+        ("dict['general']['name']", "data['general']['name']"),
+        ("dict['name']", "section['name']"),
+        ("plain.general.name", "plain.general.name"),
+        ("plain.name", "plain.name")]
+    namespace = {
+        'config': config,
+        'general': general,
+        'data': data,
+        'section': section,
+        'plain': plain}
+    for label, statement in statements:
+        best = min(timeit.repeat(
+            statement, globals=namespace, number=NUMBER,
+            repeat=repetitions)) / NUMBER
+        print("{:<32} {:8.1f} ns".format(label, best * 1e9))
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
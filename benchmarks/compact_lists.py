@@ -0,0 +1,51 @@
+"""
+Benchmark compact storage of numeric list options.
+
+Compares memory use and validation time of a list of 100,000 integers
+and floats stored as list and as `CompactList`, and parsing the same
+values from ini list text.
+
+Usage: python benchmarks/compact_lists.py [repetitions]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# pylint: disable=wrong-import-position
+from user_config import IntegerListOption, FloatListOption
+from user_config.ini import get_converter
+
+ITEMS = 100000
+
+def list_size(value):
+    """Return bytes used by `value`, including boxed items of lists."""
+    if isinstance(value, list):
+        return sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value)
+    return sys.getsizeof(value)
+
+def main(repetitions=3):
+    """Print memory and best times per storage."""
+    for option_type, items in (
+            (IntegerListOption, list(range(1 << 40, (1 << 40) + ITEMS))),
+            (FloatListOption, [index / 3. for index in range(ITEMS)])):
+        plain = option_type()
+        compact = option_type(compact=True)
+        compact_items = compact.to_compact(items)
+        text = '\n'.join('- {!r}'.format(item) for item in items)
+        print("{} {} items".format(ITEMS, option_type.subtype.__name__))
+        print("  memory: list {:8.0f} KiB, compact {:8.0f} KiB".format(
+            list_size(items) / 1024., list_size(compact_items) / 1024.))
+        for name, option, value in (
+                ('list', plain, items), ('compact', compact, compact_items)):
+            validated = min(timeit.repeat(
+                lambda: option.validate(value),
+                number=1, repeat=repetitions))
+            convert = get_converter(option)
+            parsed = min(timeit.repeat(
+                lambda: convert(text), number=1, repeat=repetitions))
+            print("  {:<7}: validate {:8.3f} ms, parse {:8.2f} ms".format(
+                name, validated * 1000, parsed * 1000))
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
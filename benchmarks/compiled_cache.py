@@ -0,0 +1,71 @@
+"""
+Benchmark loading configuration from compiled cache files.
+
+Generates a configuration class and a user configuration file with
+1,000 and 10,000 keys, in sections of 100 keys, and compares creating
+an instance from the ini file to creating it from the compiled cache.
+
+Usage: python benchmarks/compiled_cache.py [repetitions]
+"""
+import os
+import sys
+import shutil
+import tempfile
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# pylint: disable=wrong-import-position
+from user_config import Config, Section, StringOption, IntegerOption
+
+KEYS_PER_SECTION = 100
+
+def generate(directory, keys, compiled_cache):
+    """Return configuration class for `keys` keys and write its file."""
+    attributes = {
+        '__doc__': "Generated configuration.",
+        'application': "benchmark",
+        'author': "nobody",
+        'compiled_cache': compiled_cache}
+    with open(str(directory / 'config.cfg'), 'w') as config_file:
+        for section in range(keys // KEYS_PER_SECTION):
+            config_file.write("[section_{}]\n".format(section))
+            options = {'__doc__': "Generated section."}
+            for index in range(KEYS_PER_SECTION):
+                if index % 2:
+                    options['key_{}'.format(index)] = IntegerOption()
+                    config_file.write("key_{} = {}\n".format(index, index))
+                else:
+                    options['key_{}'.format(index)] = StringOption()
+                    config_file.write("key_{} = value\n".format(index))
+            attributes['section_{}'.format(section)] = type(
+                'Section{}'.format(section), (Section,), options)()
+    return type('Generated', (Config,), attributes)
+
+def main(repetitions=5):
+    """Print best time per file size, with and without compiled cache."""
+    sys.argv = [sys.argv[0]]
+    directory = Path(tempfile.mkdtemp())
+    try:
+        for keys in (1000, 10000):
+            results = []
+            for compiled_cache in (None, directory / 'cache'):
+                config_class = generate(directory, keys, compiled_cache)
+                def create(config_class=config_class):
+                    """Create one instance."""
+                    config_class(global_path=directory, user_path=directory)
+                # fill the compiled cache
+                create()
+                results.append(min(timeit.repeat(
+                    create, number=10, repeat=repetitions)) / 10)
+            print("{:>6} keys: ini {:8.3f} ms, compiled {:8.3f} ms"
+                  " ({:.1f}x)".format(
+                      keys,
+                      results[0] * 1000,
+                      results[1] * 1000,
+                      results[0] / results[1]))
+    finally:
+        shutil.rmtree(str(directory))
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,70 @@
+"""
+Benchmark reading drop-in directories.
+
+Writes 500 fragments with 20 keys each and compares reading them in the
+calling thread, in a thread pool, and from the fragment cache.
+
+Usage: python benchmarks/drop_in.py [repetitions]
+"""
+import os
+import sys
+import shutil
+import tempfile
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# pylint: disable=wrong-import-position
+from user_config import Config, Section, IntegerOption, StringListOption
+from user_config.cache import FileCache
+from user_config.sources import DirectorySource
+
+FRAGMENTS = 500
+KEYS = 20
+
+OPTIONS = {'__doc__': "General section."}
+OPTIONS['hosts'] = StringListOption(required=False, additive=True)
+OPTIONS.update(
+    ('key_{}'.format(index), IntegerOption(required=False))
+    for index in range(KEYS))
+
+class DropInConfig(Config):
+
+    """Drop-in benchmark."""
+
+    application = "benchmark"
+    author = "nobody"
+    general = type('GeneralSection', (Section,), OPTIONS)()
+
+def generate(directory):
+    """Write fragments."""
+    for fragment in range(FRAGMENTS):
+        with open(str(directory / '{:04}.cfg'.format(fragment)), 'w') as \
+                fragment_file:
+            fragment_file.write("[general]\nhosts = - host{}\n".format(
+                fragment))
+            for index in range(KEYS):
+                fragment_file.write("key_{} = {}\n".format(index, fragment))
+
+def main(repetitions=5):
+    """Print best time per strategy."""
+    directory = Path(tempfile.mkdtemp())
+    try:
+        generate(directory)
+        cache = FileCache(max_entries=FRAGMENTS)
+        strategies = [
+            ("sequential", lambda: DropInConfig(sources=[DirectorySource(
+                directory, max_workers=1, cache=FileCache())])),
+            ("thread pool", lambda: DropInConfig(sources=[DirectorySource(
+                directory, cache=FileCache())])),
+            ("cached", lambda: DropInConfig(sources=[DirectorySource(
+                directory, cache=cache)]))]
+        for label, create in strategies:
+            create()
+            best = min(timeit.repeat(create, number=1, repeat=repetitions))
+            print("{:<12} {:8.1f} ms".format(label, best * 1000))
+    finally:
+        shutil.rmtree(str(directory))
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,69 @@
+"""
+Benchmark building configuration classes from generated schemas.
+
+Builds a class with 100,000 options in 1,000 sections, from a schema
+description with `Config.from_schema`, from the same description as
+JSON, and by hand with `type()` calls on dictionaries of elements.
+
+Usage: python benchmarks/generated_schema.py [repetitions] [options]
+"""
+import os
+import sys
+import json
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# pylint: disable=wrong-import-position
+from user_config import Config, Section, ELEMENT_TYPES
+
+OPTIONS = 100000
+PER_SECTION = 100
+TYPES = ('string', 'integer', 'boolean', 'integer_list')
+DEFAULTS = {'string': 'value', 'integer': 1, 'boolean': False,
+            'integer_list': [1, 2]}
+
+def describe(options):
+    """Return schema description with `options` options."""
+    schema = {}
+    for start in range(0, options, PER_SECTION):
+        section = {}
+        for index in range(start, min(start + PER_SECTION, options)):
+            type_name = TYPES[index % len(TYPES)]
+            section['option{}'.format(index)] = {
+                'type': type_name,
+                'default': DEFAULTS[type_name],
+                'doc': 'feature flag {}'.format(index)}
+        schema['section{}'.format(start)] = {
+            'type': 'section', 'options': section}
+    return schema
+
+def build_by_hand(schema):
+    """Build the class the way generated schemas were built before."""
+    attributes = {'application': 'benchmark', 'author': 'nobody'}
+    for section_name, section in schema.items():
+        section_attributes = {}
+        for name, description in section['options'].items():
+            arguments = dict(description)
+            section_attributes[name] = ELEMENT_TYPES[
+                arguments.pop('type')](**arguments)
+        attributes[section_name] = type(Section)(
+            '{}Section'.format(section_name), (Section,),
+            section_attributes)()
+    return type(Config)('GeneratedConfig', (Config,), attributes)
+
+def main(repetitions=3, options=OPTIONS):
+    """Print best time per way of building the class."""
+    schema = describe(options)
+    text = json.dumps(schema)
+    for name, build in (
+            ('from_schema(dict)', lambda: Config.from_schema(
+                schema, application='benchmark', author='nobody')),
+            ('from_schema(json)', lambda: Config.from_schema(
+                text, application='benchmark', author='nobody')),
+            ('type() by hand', lambda: build_by_hand(schema))):
+        seconds = min(timeit.repeat(build, number=1, repeat=repetitions))
+        print("{:<18} {} options: {:8.1f} ms ({:.1f} us per option)".format(
+            name, options, seconds * 1000, seconds / options * 1e6))
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
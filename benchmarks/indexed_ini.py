@@ -0,0 +1,70 @@
+"""
+Benchmark reading two sections of a large ini file.
+
+Generates a file of about 10 MB with 2,000 sections of 100 keys, and
+reads the two sections a configuration knows about with a full parse
+(`ini_parse`), and with `ini_load`, which locates the section headers
+and only reads and parses the sections it needs, with and without a
+cached index.
+
+Usage: python benchmarks/indexed_ini.py [repetitions]
+"""
+import os
+import sys
+import shutil
+import tempfile
+import timeit
+from collections import OrderedDict
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# pylint: disable=wrong-import-position
+from user_config import Section, StringOption
+from user_config.ini import ini_parse, ini_load, INDEX_CACHE
+
+SECTIONS = 2000
+KEYS_PER_SECTION = 100
+
+def generate(path):
+    """Write a large ini file, like ini_write would."""
+    with path.open('w') as config_file:
+        for section in range(SECTIONS):
+            config_file.write(u"[section_{}]\n".format(section))
+            for key in range(KEYS_PER_SECTION):
+                config_file.write(u"## documentation for key {}\n".format(key))
+                config_file.write(u"key_{} = value {}\n\n".format(key, key))
+
+def create_elements():
+    """Return element tree with two of the sections."""
+    attributes = dict(
+        ('key_{}'.format(key), StringOption())
+        for key in range(KEYS_PER_SECTION))
+    section_type = type(Section)('LargeSection', (Section,), attributes)
+    return OrderedDict([
+        ('section_10', section_type()), ('section_1500', section_type())])
+
+def main(repetitions=5):
+    """Print best time per way of reading."""
+    directory = Path(tempfile.mkdtemp())
+    try:
+        path = directory / 'config.cfg'
+        generate(path)
+        elements = create_elements()
+        print("{:.1f} MB, {} sections".format(
+            path.stat().st_size / 1e6, SECTIONS))
+        max_entries = INDEX_CACHE.max_entries
+        for name, function, cache in (
+                ('ini_parse', lambda: ini_parse(path), max_entries),
+                ('ini_load, no cache', lambda: ini_load(
+                    None, path, elements), 0),
+                ('ini_load, cached index', lambda: ini_load(
+                    None, path, elements), max_entries)):
+            INDEX_CACHE.resize(cache)
+            best = min(timeit.repeat(function, number=1, repeat=repetitions))
+            print("{:<24} {:10.3f} ms".format(name, best * 1000))
+        INDEX_CACHE.resize(max_entries)
+    finally:
+        shutil.rmtree(str(directory))
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,79 @@
+"""
+Benchmark ini parsing against configparser.
+
+Generates ini files with 10, 1,000 and 100,000 keys, in sections of
+100 keys, and compares reading every key with
+`configparser.ConfigParser` to `user_config.ini.ini_parse`.
+
+Usage: python benchmarks/ini_parse.py [repetitions]
+"""
+import os
+import sys
+import shutil
+import tempfile
+import timeit
+try:
+    import configparser
+except ImportError:
+    import ConfigParser as configparser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# pylint: disable=wrong-import-position
+from user_config.ini import ini_parse
+
+KEYS_PER_SECTION = 100
+
+def generate(path, keys):
+    """Write an ini file with `keys` keys, like ini_write would."""
+    with open(path, 'w') as config_file:
+        for index in range(keys):
+            if index % KEYS_PER_SECTION == 0:
+                config_file.write("[section_{}]\n".format(
+                    index // KEYS_PER_SECTION))
+            config_file.write("## documentation for key {}\n".format(index))
+            if index % 10 == 0:
+                config_file.write("key_{} = - a\n    - b\n    - c\n\n".format(
+                    index))
+            else:
+                config_file.write("key_{} = {}\n\n".format(index, index))
+
+def read_configparser(path):
+    """Read every key through configparser."""
+    parser = configparser.ConfigParser()
+    parser.read(path)
+    for section in parser.sections():
+        for key in parser.options(section):
+            parser.get(section, key)
+
+def read_ini_parse(path):
+    """Read every key through ini_parse."""
+    for section in ini_parse(path).values():
+        for key in section:
+            section.get(key)
+
+def main(repetitions=5):
+    """Print best time per file size and parser."""
+    directory = tempfile.mkdtemp()
+    try:
+        for keys in (10, 1000, 100000):
+            path = os.path.join(directory, '{}.cfg'.format(keys))
+            generate(path, keys)
+            number = max(1, 10000 // keys)
+            results = []
+            for function in (read_configparser, read_ini_parse):
+                best = min(timeit.repeat(
+                    lambda: function(path),
+                    number=number,
+                    repeat=repetitions)) / number
+                results.append(best)
+            print("{:>7} keys: configparser {:10.3f} ms, ini_parse {:10.3f} ms"
+                  " ({:.1f}x)".format(
+                      keys,
+                      results[0] * 1000,
+                      results[1] * 1000,
+                      results[0] / results[1]))
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,83 @@
+"""
+Benchmark reading configuration files with lazy sections.
+
+Loads a file with 2,000 optional sections of 10 options each, then
+reads 5 of them, with all sections read at load time and with
+`lazy_sections = 'optional'`. Reports time and memory allocated per
+instance.
+
+Usage: python benchmarks/lazy_sections.py [repetitions] [sections]
+"""
+import os
+import sys
+import shutil
+import timeit
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# pylint: disable=wrong-import-position
+from user_config import Config
+
+SECTIONS = 2000
+OPTIONS = 10
+TOUCHED = 5
+
+def describe(sections):
+    """Return schema description of `sections` optional sections."""
+    return dict(
+        ('section{}'.format(section), {
+            'type': 'section', 'required': False, 'options': dict(
+                ('option{}'.format(option), {'type': 'integer'})
+                for option in range(OPTIONS))})
+        for section in range(sections))
+
+def write_file(path, sections):
+    """Write a value for every option."""
+    with path.open('w') as config_file:
+        for section in range(sections):
+            config_file.write(u'[section{}]\n'.format(section))
+            for option in range(OPTIONS):
+                config_file.write(u'option{} = {}\n'.format(option, option))
+
+def load(config_class, directory, sections):
+    """Create an instance and read `TOUCHED` sections."""
+    config = config_class(
+        global_path=directory, user_path=directory / 'user', cli=False)
+    step = max(1, sections // TOUCHED)
+    for section in range(0, sections, step)[:TOUCHED]:
+        getattr(config, 'section{}'.format(section)).option0
+    return config
+
+def measure(function, *args):
+    """Return bytes `function` left allocated."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = function(*args)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return after - before
+
+def main(repetitions=5, sections=SECTIONS):
+    """Print best time and memory per mode."""
+    directory = Path(tempfile.mkdtemp())
+    try:
+        write_file(directory / 'config.cfg', sections)
+        schema = describe(sections)
+        for mode in (None, 'optional'):
+            config_class = Config.from_schema(
+                schema, application='benchmark', author='nobody',
+                lazy_sections=mode)
+            seconds = min(timeit.repeat(
+                lambda: load(config_class, directory, sections),
+                number=1, repeat=repetitions))
+            allocated = measure(load, config_class, directory, sections)
+            print("lazy_sections={!r:<10} {:8.2f} ms, {:8.0f} KiB".format(
+                mode, seconds * 1000, allocated / 1024.))
+    finally:
+        shutil.rmtree(str(directory))
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,70 @@
+"""
+Benchmark the cost of profiling configuration loading.
+
+Loads a file with 100 sections of 100 integer options, without profile
+and with a `ConfigProfile`, and prints the slowest phases and
+validators of the last profiled load.
+
+Usage: python benchmarks/profile_overhead.py [repetitions] [sections]
+"""
+import os
+import sys
+import shutil
+import timeit
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# pylint: disable=wrong-import-position
+from user_config import Config
+from user_config.profile import ConfigProfile
+
+SECTIONS = 100
+OPTIONS = 100
+
+def describe(sections):
+    """Return schema description of `sections` sections."""
+    return dict(
+        ('section{}'.format(section), {'type': 'section', 'options': dict(
+            ('option{}'.format(option), {'type': 'integer'})
+            for option in range(OPTIONS))})
+        for section in range(sections))
+
+def write_file(path, sections):
+    """Write a value for every option."""
+    with path.open('w') as config_file:
+        for section in range(sections):
+            config_file.write(u'[section{}]\n'.format(section))
+            for option in range(OPTIONS):
+                config_file.write(u'option{} = {}\n'.format(option, option))
+
+def main(repetitions=5, sections=SECTIONS):
+    """Print best time with and without profile."""
+    directory = Path(tempfile.mkdtemp())
+    try:
+        write_file(directory / 'config.cfg', sections)
+        config_class = Config.from_schema(
+            describe(sections), application='benchmark', author='nobody')
+        profiles = []
+        for name, create_profile in (
+                ('no profile', lambda: None),
+                ('profile', lambda: profiles.append(ConfigProfile()) or
+                 profiles[-1])):
+            seconds = min(timeit.repeat(
+                lambda: config_class(
+                    global_path=directory, user_path=directory / 'user',
+                    cli=False, profile=create_profile()),
+                number=1, repeat=repetitions))
+            print("{:<12} {:8.2f} ms".format(name, seconds * 1000))
+        result = profiles[-1].as_dict()
+        for phase in result['phases']:
+            print("  {:<10} {:8.2f} ms".format(
+                phase['name'], phase['seconds'] * 1000))
+        for record in result['validators'][:3]:
+            print("  {section}.{key}: {calls} calls, {0:.1f} us".format(
+                record['seconds'] * 1e6, **record))
+    finally:
+        shutil.rmtree(str(directory))
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
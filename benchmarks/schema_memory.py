@@ -0,0 +1,88 @@
+"""
+Benchmark memory used by large schemas.
+
+Builds a configuration class with 50,000 options (one section per 100
+options, alternating string, integer, boolean and integer list options)
+and reports the bytes allocated per option, for the elements alone and
+for the whole class including its compiled schema. Elements use
+`__slots__`; the same options without slots (subclasses that add an
+instance dictionary) are measured for comparison.
+
+Usage: python benchmarks/schema_memory.py [options]
+"""
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# pylint: disable=wrong-import-position
+from user_config import (
+    Config,
+    Section,
+    StringOption,
+    IntegerOption,
+    BooleanOption,
+    IntegerListOption)
+
+OPTIONS = 50000
+PER_SECTION = 100
+
+# pylint: disable=missing-docstring
+class DictStringOption(StringOption):
+    pass
+
+class DictIntegerOption(IntegerOption):
+    pass
+
+class DictBooleanOption(BooleanOption):
+    pass
+
+class DictIntegerListOption(IntegerListOption):
+    pass
+
+def create_elements(types, options):
+    """Return `options` elements, cycling through `types`."""
+    return [
+        types[index % len(types)](
+            doc='feature flag {}'.format(index), required=False)
+        for index in range(options)]
+
+def create_config(elements):
+    """Return `Config` subclass holding `elements`."""
+    attributes = {'application': 'benchmark', 'author': 'nobody'}
+    for start in range(0, len(elements), PER_SECTION):
+        section_type = type(Section)(
+            'Section{}'.format(start), (Section,), dict(
+                ('option{}'.format(index), elements[index])
+                for index in range(
+                    start, min(start + PER_SECTION, len(elements)))))
+        attributes['section{}'.format(start)] = section_type()
+    return type(Config)('LargeConfig', (Config,), attributes)
+
+def measure(function, *args):
+    """Return result of `function` and bytes it left allocated."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = function(*args)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+def main(options=OPTIONS):
+    """Print bytes per option with and without slots."""
+    for name, types in (
+            ('slots', (
+                StringOption, IntegerOption, BooleanOption,
+                IntegerListOption)),
+            ('dict', (
+                DictStringOption, DictIntegerOption, DictBooleanOption,
+                DictIntegerListOption))):
+        elements, element_bytes = measure(create_elements, types, options)
+        _, config_bytes = measure(create_config, elements)
+        print("{:<5}: elements {:6.0f} bytes per option, "
+              "with schema {:6.0f} bytes per option".format(
+                  name, element_bytes / float(options),
+                  (element_bytes + config_bytes) / float(options)))
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,40 @@
+"""
+Startup benchmark for user_config.
+
+Times `import user_config` plus defining the `MyConfig` class from
+`examples/simple_example.py` in a fresh interpreter.
+
+Usage: python benchmarks/startup.py [repetitions]
+"""
+import os
+import subprocess
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATEMENT = (
+    "import sys; sys.path[:0] = [{root!r}, {examples!r}]; "
+    "import user_config; import simple_example").format(
+        root=ROOT, examples=os.path.join(ROOT, 'examples'))
+
+def run_once():
+    """Run a single fresh interpreter."""
+    subprocess.check_call([sys.executable, '-c', STATEMENT])
+
+def baseline():
+    """Run an empty fresh interpreter."""
+    subprocess.check_call([sys.executable, '-c', 'pass'])
+
+def main(repetitions=20):
+    """Print median startup cost with and without user_config."""
+    empty = sorted(timeit.repeat(baseline, number=1, repeat=repetitions))
+    loaded = sorted(timeit.repeat(run_once, number=1, repeat=repetitions))
+    empty_median = empty[len(empty) // 2]
+    loaded_median = loaded[len(loaded) // 2]
+    print("interpreter:            {:8.1f} ms".format(empty_median * 1000))
+    print("import + MyConfig:      {:8.1f} ms".format(loaded_median * 1000))
+    print("user_config overhead:   {:8.1f} ms".format(
+        (loaded_median - empty_median) * 1000))
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,142 @@
+"""Test parsed file caches."""
+import os
+import time
+import threading
+import pytest
+
+from user_config.cache import (
+    FileCache, InFlightReads, CompiledCache, file_key)
+
+# pylint: disable=missing-docstring
+def write(path, text, mtime_ns=None):
+    path.write_text(text)
+    if mtime_ns is not None:
+        os.utime(str(path), ns=(mtime_ns, mtime_ns))
+
+def test_disabled(tmp_path):
+    path = tmp_path / 'config.cfg'
+    write(path, 'a')
+    cache = FileCache()
+    calls = []
+    cache.get(path, calls.append)
+    cache.get(path, calls.append)
+    assert len(calls) == 2
+    assert len(cache) == 0
+
+def test_hit_and_invalidation(tmp_path):
+    path = tmp_path / 'config.cfg'
+    write(path, 'a', 10 ** 18)
+    cache = FileCache(max_entries=4)
+    def parse(parse_path):
+        return parse_path.read_text()
+    assert cache.get(path, parse) == 'a'
+    assert cache.get(path, parse) == 'a'
+    assert (cache.hits, cache.misses) == (1, 1)
+    # same size, different modification time
+    write(path, 'b', 10 ** 18 + 1)
+    assert cache.get(path, parse) == 'b'
+    assert (cache.hits, cache.misses) == (1, 2)
+    # same modification time, different size
+    write(path, 'cc', 10 ** 18 + 1)
+    assert cache.get(path, parse) == 'cc'
+    assert cache.misses == 3
+    assert file_key(path)[0] == str(path)
+
+def test_lru_eviction(tmp_path):
+    paths = [tmp_path / '{}.cfg'.format(index) for index in range(3)]
+    for path in paths:
+        write(path, path.name)
+    cache = FileCache(max_entries=2)
+    def parse(parse_path):
+        return parse_path.read_text()
+    cache.get(paths[0], parse)
+    cache.get(paths[1], parse)
+    # refresh 0, so 1 is least recently used
+    cache.get(paths[0], parse)
+    cache.get(paths[2], parse)
+    assert len(cache) == 2
+    misses = cache.misses
+    cache.get(paths[0], parse)
+    assert cache.misses == misses
+    cache.get(paths[1], parse)
+    assert cache.misses == misses + 1
+    cache.resize(1)
+    assert len(cache) == 1
+    cache.clear()
+    assert len(cache) == 0
+
+def test_in_flight_reads(monkeypatch):
+    waiting = []
+    # python 2 only has a factory function named Event
+    class Event(getattr(threading, '_Event', threading.Event)):
+        def wait(self, timeout=None):
+            waiting.append(threading.current_thread())
+            return super(Event, self).wait(timeout)
+    monkeypatch.setattr(threading, 'Event', Event)
+    reads = InFlightReads()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    def read(value):
+        calls.append(value)
+        started.set()
+        release.wait()
+        return value
+    results = []
+    threads = [threading.Thread(
+        target=lambda: results.append(reads.call('key', read, 'parsed')))]
+    threads[0].start()
+    started.wait()
+    threads.append(threading.Thread(
+        target=lambda: results.append(reads.call('key', read, 'other'))))
+    threads[1].start()
+    # the second caller must be waiting before the first one finishes
+    for _ in range(100):
+        if threads[1] in waiting:
+            break
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert threads[1] in waiting
+    assert calls == ['parsed']
+    assert results == ['parsed', 'parsed']
+    assert len(reads) == 0
+    # nothing is kept once the read finished
+    assert reads.call('key', read, 'again') == 'again'
+
+def test_in_flight_errors():
+    reads = InFlightReads()
+    def read():
+        raise ValueError('broken')
+    with pytest.raises(ValueError):
+        reads.call('key', read)
+    assert len(reads) == 0
+
+def test_compiled_cache(tmp_path):
+    path = tmp_path / 'config.cfg'
+    write(path, 'a', 10 ** 18)
+    cache = CompiledCache(tmp_path / 'cache')
+    assert cache.load(path, 'hash') is None
+    cache.store(path, file_key(path), 'hash', {0: ['a'], 1: 5})
+    assert cache.load(path, 'hash') == {0: ['a'], 1: 5}
+    # schema changed
+    assert cache.load(path, 'other hash') is None
+    # file changed
+    write(path, 'b', 10 ** 18 + 1)
+    assert cache.load(path, 'hash') is None
+    # unsupported values are not stored
+    cache.store(path, file_key(path), 'hash', {0: object()})
+    assert cache.load(path, 'hash') is None
+    # broken compiled files are ignored
+    cache.get_path(path).write_bytes(b'broken')
+    assert cache.load(path, 'hash') is None
+
+def test_tag(tmp_path):
+    path = tmp_path / 'config.cfg'
+    write(path, 'a')
+    cache = FileCache(max_entries=4)
+    assert cache.get(path, lambda path: 'one', tag=1) == 'one'
+    assert cache.get(path, lambda path: 'two', tag=2) == 'two'
+    assert cache.get(path, lambda path: 'three', tag=1) == 'one'
+    assert (cache.hits, cache.misses) == (1, 2)
@@ -0,0 +1,139 @@
+"""Test compact storage of numeric lists."""
+import sys
+import copy
+import pytest
+
+from user_config import (
+    Config,
+    Section,
+    InvalidData,
+    StringListOption,
+    IntegerListOption,
+    FloatListOption,
+    BooleanListOption)
+from user_config.compact import CompactList, BooleanCompactList
+from user_config.shared import SharedConfig
+
+# pylint: disable=missing-docstring
+class CompactTestConfig(Config):
+
+    """Test configuration with compact lists."""
+
+    application = "test"
+    author = "nobody"
+
+    class GeneralSection(Section):
+
+        """General section."""
+
+        ports = IntegerListOption(default=[80, 443], compact=True)
+        weights = FloatListOption(required=False, compact=True)
+        flags = BooleanListOption(required=False, compact=True)
+        extra = IntegerListOption(
+            default=[1], compact=True, additive=True)
+
+    general = GeneralSection()
+
+@pytest.fixture
+def config(tmp_path):
+    (tmp_path / 'user').mkdir()
+    (tmp_path / 'user' / 'config.cfg').write_text(
+        u"[general]\nweights = - 0.5\n    - 0.25\n"
+        u"flags = - yes\n    - no\nextra = - 2\n    - 1\n")
+    sys.argv = [sys.argv[0]]
+    return CompactTestConfig(
+        global_path=tmp_path / 'global', user_path=tmp_path / 'user')
+
+def test_compact_list():
+    numbers = CompactList('q', [3, 1, 2])
+    assert numbers == [3, 1, 2]
+    assert numbers != (3, 1)
+    assert numbers[1:] == [1, 2]
+    assert isinstance(numbers[1:], CompactList)
+    numbers.sort()
+    assert numbers == [1, 2, 3]
+    numbers.sort(reverse=True)
+    assert numbers == [3, 2, 1]
+    assert numbers.count(2) == 1
+    assert numbers.index(1) == 2
+    numbers += [4]
+    assert numbers + [5] == [3, 2, 1, 4, 5]
+    assert [0] + numbers == [0, 3, 2, 1, 4]
+    duplicate = copy.copy(numbers)
+    duplicate.append(6)
+    assert numbers == [3, 2, 1, 4]
+    with pytest.raises(TypeError):
+        hash(numbers)
+
+def test_boolean_compact_list():
+    flags = BooleanCompactList('B', [True, False])
+    assert flags[0] is True
+    assert list(flags) == [True, False]
+    assert flags.tolist() == [True, False]
+    assert flags == [True, False]
+
+def test_compact_element():
+    element = IntegerListOption(default=[1, 2], compact=True)
+    assert isinstance(element.get_default(), CompactList)
+    element.append(3)
+    element.extend([4, 5])
+    element.sort(reverse=True)
+    assert element[0] == 5
+    assert list(element) == [5, 4, 3, 2, 1]
+    assert element.count(3) == 1
+    assert element.index(1) == 4
+    assert 4 in element
+    with pytest.raises(InvalidData):
+        element.append("six")
+    with pytest.raises(InvalidData):
+        element.validate([1, "two"])
+    with pytest.raises(InvalidData):
+        element.to_compact([1 << 64])
+    element.validate(CompactList('q', [1]))
+    with pytest.raises(InvalidData):
+        element.validate(CompactList('d', [1.]))
+
+def test_compact_unsupported():
+    with pytest.raises(ValueError):
+        StringListOption(compact=True)
+
+def test_load(config):
+    assert config.general.ports == [80, 443]
+    assert isinstance(config.general.ports, CompactList)
+    assert config.general.weights == [0.5, 0.25]
+    assert isinstance(config.general.weights, CompactList)
+    assert config.general.flags == [True, False]
+    assert config.general.flags[0] is True
+    assert config.general.extra == [1, 2]
+    assert isinstance(config.general.extra, CompactList)
+    config.general.ports.append(8080)
+    # defaults are not shared between instances
+    assert CompactTestConfig._defaults[0] == [80, 443]
+
+def test_set(config):
+    config.general.ports = [1, 2]
+    assert isinstance(config.general.ports, CompactList)
+    with pytest.raises(InvalidData):
+        config.general.ports = [1, 2.5]
+
+def test_invalid_file(tmp_path):
+    (tmp_path / 'user').mkdir()
+    (tmp_path / 'user' / 'config.cfg').write_text(
+        u"[general]\nports = - 80\n    443\n")
+    sys.argv = [sys.argv[0]]
+    with pytest.raises(ValueError):
+        CompactTestConfig(
+            global_path=tmp_path / 'global', user_path=tmp_path / 'user')
+
+def test_freeze(config):
+    frozen = config.freeze()
+    assert frozen.general.ports == (80, 443)
+    hash(frozen)
+
+def test_shared(config):
+    shared = SharedConfig.create(config)
+    worker = shared.load()
+    assert isinstance(worker.general.weights, CompactList)
+    assert worker.general.weights == [0.5, 0.25]
+    assert worker.general.flags[1] is False
+    shared.close()
@@ -1,8 +1,15 @@
 """Test Config."""
+import io
+import os
 import sys
+import subprocess
 from pathlib import Path
 import pytest
-from user_config import Config, Section, StringOption
+from user_config import (
+    Config, Section, StringOption, InvalidConfigTree, MissingData,
+    SlotProperty)
+from user_config.file_types import FILE_TYPES
+from user_config import ini
 
 class FallbackConfig(Config):
 
@@ -76,3 +83,523 @@ def test_required_attributes():
         application = "test"
     with pytest.raises(AttributeError):
         NoAuthor()
+    # also without the default sources, which resolve paths
+    with pytest.raises(AttributeError):
+        NoAuthor(sources=[])
+
+def test_schema():
+    class SchemaConfig(Config):
+        """Test schema compilation."""
+        application = "test"
+        author = "nobody"
+        class GeneralSection(Section):
+            """General section."""
+            string = StringOption(default="default", short_name="s")
+            other = StringOption(long_name="other_string", required=False)
+        general = GeneralSection()
+        class OptionalSection(Section):
+            """Optional section."""
+            text = StringOption()
+        optional = OptionalSection(required=False)
+    # pylint: disable=protected-access
+    schema = SchemaConfig._schema
+    assert [(entry.section, entry.key) for entry in schema] == [
+        ('general', 'string'), ('general', 'other'), ('optional', 'text')]
+    assert schema[0].cli_names == ('-s', '--string')
+    assert schema[0].dest == 'string'
+    assert schema[0].default == "default"
+    assert schema[1].cli_names == ('--other_string',)
+    assert schema[1].dest == 'other_string'
+    assert not schema[1].required
+    assert schema[0].section_required
+    assert not schema[2].section_required
+
+    sys.argv = [sys.argv[0]]
+    config = SchemaConfig(
+        file_name="default",
+        global_path=Path(__file__).parents[0] / 'test_config' / 'global',
+        user_path=Path(__file__).parents[0] / 'test_config' / 'user')
+    assert config.general.string == "default"
+    assert config.optional.incomplete_count == 1
+
+def test_tree_validated_on_class_creation():
+    with pytest.raises(InvalidConfigTree):
+        # pylint: disable=unused-variable
+        class InvalidConfig(Config):
+            """Root level options are not allowed in ini files."""
+            application = "test"
+            author = "nobody"
+            string = StringOption()
+
+def test_independent_instances():
+    config_directory = Path(__file__).parents[0] / 'test_config'
+    sys.argv = [sys.argv[0]]
+    global_config = FallbackConfig(
+        file_name="global",
+        global_path=config_directory / 'global',
+        user_path=config_directory / 'user')
+    user_config = FallbackConfig(
+        file_name="user",
+        global_path=config_directory / 'global',
+        user_path=config_directory / 'user')
+    assert global_config.general.string == "global"
+    assert user_config.general.string == "user"
+    user_config.general.string = "changed"
+    assert user_config['general']['string'] == "changed"
+    assert global_config.general.string == "global"
+    # the shared element tree is left untouched
+    # pylint: disable=protected-access
+    assert FallbackConfig._elements['general'].string == "default"
+
+def test_cli_prescan():
+    # pylint: disable=protected-access
+    has_arguments = FallbackConfig._has_cli_arguments
+    assert not has_arguments([])
+    assert not has_arguments(['unrelated', '--unrelated', '-x'])
+    assert not has_arguments(['--', '--string'])
+    assert has_arguments(['--string', 'value'])
+    assert has_arguments(['--string=value'])
+    assert has_arguments(['--str', 'value'])
+    assert has_arguments(['-h'])
+    assert has_arguments(['--generate-config'])
+
+    config_directory = Path(__file__).parents[0] / 'test_config'
+    FallbackConfig._parser = None
+    sys.argv = [sys.argv[0], 'unrelated_argument']
+    config = FallbackConfig(
+        file_name="user",
+        global_path=config_directory / 'global',
+        user_path=config_directory / 'user')
+    assert config.general.string == "user"
+    assert FallbackConfig._parser is None
+
+    sys.argv = [sys.argv[0], '--string', 'cli']
+    config = FallbackConfig(
+        file_name="user",
+        global_path=config_directory / 'global',
+        user_path=config_directory / 'user')
+    parser = FallbackConfig._parser
+    assert parser is not None
+    # paths don't matter, the parser is shared by the whole class
+    config = FallbackConfig(
+        file_name="global",
+        global_path=config_directory / 'user',
+        user_path=config_directory / 'global')
+    assert config.general.string == "cli"
+    assert FallbackConfig._parser is parser
+
+def test_cli_help(capsys):
+    config_directory = Path(__file__).parents[0] / 'test_config'
+    # pylint: disable=protected-access
+    assert FallbackConfig._wants_help(['--he'])
+    assert not FallbackConfig._wants_help(['--string', '--', '-h'])
+    sys.argv = [sys.argv[0], '--help']
+    with pytest.raises(SystemExit):
+        FallbackConfig(
+            file_name="user",
+            global_path=config_directory / 'global',
+            user_path=config_directory / 'user')
+    out, _ = capsys.readouterr()
+    assert str(config_directory / 'user' / 'user.cfg') in out
+    assert '--string' in out
+
+def test_dump(tmp_path, capsys):
+    config_directory = Path(__file__).parents[0] / 'test_config'
+    sys.argv = [sys.argv[0]]
+    config = FallbackConfig(
+        file_name="user",
+        global_path=config_directory / 'global',
+        user_path=config_directory / 'user')
+    config.dump(tmp_path / 'config.cfg')
+    text = (tmp_path / 'config.cfg').read_text()
+    assert "string = user\n" in text
+
+    sys.argv = [sys.argv[0], '--generate-config']
+    with pytest.raises(SystemExit):
+        FallbackConfig(
+            file_name="user",
+            global_path=config_directory / 'global',
+            user_path=config_directory / 'user')
+    out, _ = capsys.readouterr()
+    assert out == text
+
+def test_attribute_access():
+    config_directory = Path(__file__).parents[0] / 'test_config'
+    sys.argv = [sys.argv[0]]
+    config = FallbackConfig(
+        file_name="user",
+        global_path=config_directory / 'global',
+        user_path=config_directory / 'user')
+    general = config.general
+    assert config.general is general
+    assert config['general'] is general
+    # pylint: disable=protected-access
+    assert config.__dict__['general'] is general
+    assert isinstance(type(general).__dict__['string'], SlotProperty)
+    assert general.string == "user"
+    general.string = "changed"
+    assert config.general.string == "changed"
+    assert general['string'] == "changed"
+    with pytest.raises(NotImplementedError):
+        config.general = {}
+    assert config.general is general
+
+def test_read_hook_plugin():
+    def old_extension():
+        # plug-ins written before file types could return values, or
+        # write to streams
+        return {
+            'extension': 'cfg',
+            'read': lambda _, path, elements: elements[
+                'general'].get_elements()['string'].set_value(
+                    path.read_text().split()[-1]),
+            'write': ini.ini_write,
+            'validate': ini.ini_validate}
+    FILE_TYPES.register('old', old_extension)
+    class OldConfig(Config):
+        """Test file types without load."""
+        file_type = 'old'
+        application = "test"
+        author = "nobody"
+        general = FallbackConfig.GeneralSection()
+    sys.argv = [sys.argv[0]]
+    config_directory = Path(__file__).parents[0] / 'test_config'
+    config = OldConfig(
+        file_name="user",
+        global_path=config_directory / 'global',
+        user_path=config_directory / 'user')
+    assert config.general.string == "user"
+    # the element tree is left as it was
+    # pylint: disable=protected-access
+    assert OldConfig._elements['general'].get_elements()[
+        'string'].get_value() == "default"
+    # without dump, the output of write is captured
+    stream = io.StringIO()
+    config.dump(stream)
+    assert "string = user\n" in stream.getvalue()
+
+def test_root_level_options():
+    def flat_extension():
+        return {
+            'extension': 'flat',
+            'load': lambda _, path, elements: {},
+            'read': None,
+            'write': None,
+            'dump': None,
+            'validate': lambda _, elements: None}
+    FILE_TYPES.register('flat', flat_extension)
+    class FlatConfig(Config):
+        """Test options outside of sections."""
+        file_type = 'flat'
+        application = "test"
+        author = "nobody"
+        string = StringOption(default="default")
+        keys = StringOption(default="shadowed by method")
+    class ChildConfig(FlatConfig):
+        """Test inherited slot properties."""
+        other = StringOption(default="other")
+    sys.argv = [sys.argv[0]]
+    config_directory = Path(__file__).parents[0] / 'test_config'
+    config = FlatConfig(
+        global_path=config_directory / 'global',
+        user_path=config_directory / 'user')
+    assert isinstance(FlatConfig.__dict__['string'], SlotProperty)
+    assert config.string == "default"
+    config.string = "changed"
+    assert config.string == "changed"
+    assert config['keys'] == "shadowed by method"
+    child = ChildConfig(
+        global_path=config_directory / 'global',
+        user_path=config_directory / 'user')
+    assert child.other == "other"
+    with pytest.raises(AttributeError):
+        # pylint: disable=pointless-statement
+        child.string
+    with pytest.raises(KeyError):
+        # pylint: disable=pointless-statement
+        child['string']
+
+def test_freeze():
+    config_directory = Path(__file__).parents[0] / 'test_config'
+    sys.argv = [sys.argv[0]]
+    config = FallbackConfig(
+        file_name="user",
+        global_path=config_directory / 'global',
+        user_path=config_directory / 'user')
+    snapshot = config.freeze()
+    assert snapshot.general.string == "user"
+    assert snapshot == (("user",),)
+    assert hash(snapshot) == hash(config.freeze())
+    with pytest.raises(AttributeError):
+        snapshot.general.string = "changed"
+    config.general.string = "changed"
+    assert snapshot.general.string == "user"
+    assert config.freeze().general.string == "changed"
+    # pylint: disable=protected-access
+    assert FallbackConfig._get_snapshot_type() is (
+        FallbackConfig._get_snapshot_type())
+
+def test_load_async():
+    # python 2 has no asyncio
+    asyncio = pytest.importorskip('asyncio')
+    config_directory = Path(__file__).parents[0] / 'test_config'
+    sys.argv = [sys.argv[0]]
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        configs = loop.run_until_complete(asyncio.gather(*[
+            FallbackConfig.load_async(
+                file_name="user",
+                global_path=config_directory / 'global',
+                user_path=config_directory / 'user')
+            for _ in range(4)]))
+        assert [config.general.string for config in configs] == ["user"] * 4
+        assert configs[0].general is not configs[1].general
+        with pytest.raises(AttributeError):
+            loop.run_until_complete(Config.load_async())
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+def test_compiled_cache(tmp_path, monkeypatch):
+    class CachedConfig(Config):
+        """Test compiled cache files."""
+        application = "test"
+        author = "nobody"
+        compiled_cache = tmp_path / 'cache'
+        class GeneralSection(Section):
+            """General section."""
+            string = StringOption(default="default")
+        general = GeneralSection()
+    user_path = tmp_path / 'user'
+    user_path.mkdir()
+    (user_path / 'config.cfg').write_text(u"[general]\nstring = user\n")
+    sys.argv = [sys.argv[0]]
+    config = CachedConfig(global_path=tmp_path, user_path=user_path)
+    assert config.general.string == "user"
+    assert len(list((tmp_path / 'cache').iterdir())) == 1
+
+    def fail(path):
+        raise AssertionError('{} parsed again'.format(path))
+    monkeypatch.setattr(ini, 'ini_parse', fail)
+    config = CachedConfig(global_path=tmp_path, user_path=user_path)
+    assert config.general.string == "user"
+    monkeypatch.undo()
+
+    (user_path / 'config.cfg').write_text(u"[general]\nstring = changed\n")
+    config = CachedConfig(global_path=tmp_path, user_path=user_path)
+    assert config.general.string == "changed"
+
+def test_compiled_cache_lazy_sections(tmp_path):
+    class LazyCachedConfig(Config):
+        """Test compiled cache with lazy sections."""
+        application = "test"
+        author = "nobody"
+        compiled_cache = tmp_path / 'cache'
+        lazy_sections = 'all'
+        class GeneralSection(Section):
+            """General section."""
+            string = StringOption(default="default")
+        general = GeneralSection()
+    (tmp_path / 'config.cfg').write_text(u"[general]\nstring = global\n")
+    config = LazyCachedConfig(
+        global_path=tmp_path, user_path=tmp_path / 'user', cli=False)
+    assert config.general.string == "global"
+    # files are read as a whole and stored
+    assert len(list((tmp_path / 'cache').iterdir())) == 1
+
+FINGERPRINT_SCRIPT = '''
+from user_config import Config, Section, StringOption
+class FingerprintConfig(Config):
+    """Fingerprint test."""
+    application = "test"
+    author = "nobody"
+    class GeneralSection(Section):
+        """General section."""
+        string = StringOption(default="default")
+    general = GeneralSection()
+print(FingerprintConfig.schema_fingerprint)
+'''
+
+def test_schema_fingerprint():
+    def create(default="default", doc=None, required=True):
+        class FingerprintConfig(Config):
+            """Fingerprint test."""
+            application = "test"
+            author = "nobody"
+            class GeneralSection(Section):
+                """General section."""
+                string = StringOption(
+                    default=default, doc=doc, required=required)
+            general = GeneralSection()
+        return FingerprintConfig.schema_fingerprint
+    fingerprint = create()
+    assert fingerprint == create(doc="documentation changes nothing")
+    assert fingerprint != create(default="other")
+    assert fingerprint != create(required=False)
+    # only the element tree counts, not class names
+    assert FallbackConfig.schema_fingerprint == fingerprint
+    # stable across processes, independent of hash seeds and import order
+    environment = dict(os.environ, PYTHONHASHSEED='123')
+    environment['PYTHONPATH'] = os.pathsep.join(
+        [str(Path(__file__).parents[1])] + sys.path)
+    output = subprocess.check_output(
+        [sys.executable, '-c', FINGERPRINT_SCRIPT], env=environment)
+    assert output.decode().strip() == fingerprint
+    with pytest.raises(AttributeError):
+        # pylint: disable=unused-variable
+        class ReservedConfig(Config):
+            """Fingerprint is reserved."""
+            schema_fingerprint = "mine"
+
+def test_from_schema(tmp_path):
+    schema = '''{
+        "zeta": {"type": "section", "options": {
+            "number": {"type": "integer", "default": 1}}},
+        "general": {"type": "section", "doc": "General section.", "options": {
+            "string": {"type": "string", "default": "default"},
+            "hosts": {"type": "string_list", "required": false,
+                      "additive": true},
+            "ports": {"type": "integer_list", "default": [80],
+                      "compact": true}}},
+        "alpha": {"type": "section", "required": false, "options": {
+            "flag": {"type": "boolean", "default": false}}}}'''
+    GeneratedConfig = Config.from_schema(
+        schema, application="test", author="nobody")
+    assert issubclass(GeneratedConfig, Config)
+    # order of the description, not of names or creation
+    assert list(GeneratedConfig._elements) == ['zeta', 'general', 'alpha']
+    assert GeneratedConfig.schema_fingerprint == Config.from_schema(
+        schema, application="test", author="nobody").schema_fingerprint
+    (tmp_path / 'config.cfg').write_text(
+        u"[zeta]\nnumber = 2\n[general]\nstring = user\nhosts = - a\n")
+    config = GeneratedConfig(
+        global_path=tmp_path, user_path=tmp_path / 'user', cli=False)
+    assert config.zeta.number == 2
+    assert config.general.string == "user"
+    assert config.general.hosts == ["a"]
+    assert config.general.ports == [80]
+    assert config.alpha.flag is False
+    assert type(config.get_elements()['general']).__doc__ == \
+        "General section."
+    with pytest.raises(InvalidConfigTree):
+        Config.from_schema({'option': {'type': 'nonsense'}})
+    with pytest.raises(InvalidConfigTree):
+        Config.from_schema({'general': {'type': 'section', 'options': {
+            'option': {'type': 'string', 'nonsense': True}}}})
+
+def test_from_schema_names():
+    for name in ('max-conn', '_private', 'class', '1st'):
+        with pytest.raises(InvalidConfigTree) as error:
+            Config.from_schema({'general': {'type': 'section', 'options': {
+                name: {'type': 'integer'}}}})
+        assert repr(name) in str(error.value)
+    GeneratedConfig = Config.from_schema({
+        'general': {'type': 'section', 'options': {
+            'max_conn': {'type': 'integer', 'default': 1,
+                         'long_name': '--max-conn'}}}},
+        application="test", author="nobody")
+    sys.argv = [sys.argv[0], '--max-conn', '5']
+    config = GeneratedConfig(global_path=Path('/nonexistent'),
+                             user_path=Path('/nonexistent'))
+    assert config.general.max_conn == 5
+    assert config.freeze().general._fields == ('max_conn',)
+
+class LazyConfig(Config):
+
+    """Test lazy sections."""
+
+    application = "test"
+    author = "nobody"
+    lazy_sections = 'optional'
+
+    class GeneralSection(Section):
+
+        """General section."""
+
+        string = StringOption(default="default")
+
+    class OptionalSection(Section):
+
+        """Optional section."""
+
+        string = StringOption()
+
+    general = GeneralSection()
+    first = OptionalSection(required=False)
+    second = OptionalSection(required=False)
+
+def test_lazy_sections(tmp_path, monkeypatch):
+    (tmp_path / 'config.cfg').write_text(
+        u"[general]\nstring = global\n[first]\nstring = one\n"
+        u"[second]\nstring = two\n")
+    (tmp_path / 'user').mkdir()
+    (tmp_path / 'user' / 'config.cfg').write_text(
+        u"[second]\nstring = user\n")
+    loaded = []
+    load = ini.IniIndex.load
+    def record(index, section):
+        loaded.append(section)
+        return load(index, section)
+    monkeypatch.setattr(ini.IniIndex, 'load', record)
+    config = LazyConfig(
+        global_path=tmp_path, user_path=tmp_path / 'user', cli=False)
+    # required sections are read at load time
+    assert loaded == ['general']
+    assert config.general.string == "global"
+    assert config['second']['string'] == "user"
+    assert sorted(loaded) == ['general', 'second', 'second']
+    assert config.first.string == "one"
+    assert config.freeze().first.string == "one"
+
+    del loaded[:]
+    config = LazyConfig(
+        global_path=tmp_path, user_path=tmp_path / 'user', cli=False)
+    assert config.freeze().second.string == "user"
+    assert sorted(loaded) == ['first', 'general', 'second', 'second']
+
+    (tmp_path / 'config.cfg').write_text(
+        u"[general]\nstring = global\n[first]\nstring = changed\n")
+    config = LazyConfig(
+        global_path=tmp_path, user_path=tmp_path / 'user', cli=False)
+    config.reload()
+    assert config.first.string == "changed"
+
+def test_lazy_required_sections(tmp_path):
+    class AllLazyConfig(LazyConfig):
+        """Test lazy required sections."""
+        lazy_sections = 'all'
+        class RequiredSection(Section):
+            """Required section."""
+            string = StringOption()
+        general = RequiredSection()
+    (tmp_path / 'config.cfg').write_text(u"[general]\nother = value\n")
+    config = AllLazyConfig(
+        global_path=tmp_path, user_path=tmp_path / 'user', cli=False)
+    with pytest.raises(MissingData):
+        config.validate_data()
+    with pytest.raises(MissingData):
+        AllLazyConfig(
+            global_path=tmp_path, user_path=tmp_path / 'user',
+            cli=False).general
+    # a missing section is deferred the same as an empty one
+    for text in (u"[general]\n", u"[other]\nkey = value\n", u""):
+        (tmp_path / 'config.cfg').write_text(text)
+        config = AllLazyConfig(
+            global_path=tmp_path, user_path=tmp_path / 'user', cli=False)
+        with pytest.raises(MissingData):
+            config.general
+        with pytest.raises(MissingData):
+            AllLazyConfig(
+                global_path=tmp_path, user_path=tmp_path / 'user',
+                cli=False).validate_data()
+    class EagerConfig(AllLazyConfig):
+        """Test eager sections."""
+        lazy_sections = None
+        class RequiredSection(Section):
+            """Required section."""
+            string = StringOption()
+        general = RequiredSection()
+    with pytest.raises(MissingData):
+        EagerConfig(
+            global_path=tmp_path, user_path=tmp_path / 'user', cli=False)
@@ -358,6 +358,39 @@ class TestStringListOption(object):
         del list_option[0]
         assert len(list_option.get_value()) == 3
 
+    def test_merge_value(self):
+        list_option = StringListOption(additive=True)
+        current = ["a", "b", "a"]
+        assert list_option.merge_value(current, ["c", "a", "d", "c"]) == [
+            "a", "b", "a", "c", "d"]
+        assert current == ["a", "b", "a"]
+        assert list_option.merge_value(None, ["a"]) == ["a"]
+        assert StringListOption().merge_value(current, ["c"]) == ["c"]
+        # unhashable items fall back to scanning
+        assert list_option.merge_value([["a"]], [["a"], ["b"]]) == [
+            ["a"], ["b"]]
+
+    def test_index(self):
+        list_option = StringListOption(default=[], additive=True)
+        list_option.extend(["a", "b", "a"])
+        assert list_option.count("a") == 2
+        list_option.set_value(["b", "c"])
+        assert list_option.get_value() == ["a", "b", "a", "c"]
+        list_option.append("d")
+        list_option.insert(0, "e")
+        list_option.remove("a")
+        assert list_option.pop() == "d"
+        list_option[0] = "f"
+        list_option += ["g"]
+        del list_option[1]
+        list_option[1:2] = ["h", "h"]
+        assert list_option.get_value() == ["f", "h", "h", "c", "g"]
+        for item in "abcdefgh":
+            assert (item in list_option) == (item in list_option.get_value())
+            assert list_option.count(item) == (
+                list_option.get_value().count(item))
+        assert 5 not in list_option
+
 # pylint: disable=unsubscriptable-object
 class TestIntegerListOption(object):
 
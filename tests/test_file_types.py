@@ -0,0 +1,41 @@
+"""Test file type registry."""
+import pytest
+
+from user_config.file_types import (
+    FileTypeRegistry,
+    BUILTIN_FILE_TYPES,
+    ENTRY_POINT_GROUP,
+    FILE_TYPES)
+from user_config.ini import register_extension
+
+# pylint: disable=missing-docstring,protected-access
+def test_builtin():
+    registry = FileTypeRegistry(ENTRY_POINT_GROUP, BUILTIN_FILE_TYPES)
+    extension = registry.get('ini')
+    assert extension == register_extension()
+    # builtin types never scan entry points
+    assert registry._loaders is None
+    assert registry.get('ini') is extension
+
+def test_missing():
+    registry = FileTypeRegistry('user_config.nonexistent_group', {})
+    with pytest.raises(ImportError):
+        registry.get('ini')
+    assert registry._loaders == {}
+
+def test_register():
+    calls = []
+    def my_extension():
+        calls.append(True)
+        return {'extension': 'my'}
+    registry = FileTypeRegistry(ENTRY_POINT_GROUP, {})
+    registry.register('my', my_extension)
+    assert registry.get('my')['extension'] == 'my'
+    assert registry.get('my')['extension'] == 'my'
+    assert len(calls) == 1
+    registry.clear()
+    assert registry.get('my')['extension'] == 'my'
+    assert len(calls) == 2
+
+def test_process_wide():
+    assert FILE_TYPES.get('ini')['extension'] == 'cfg'
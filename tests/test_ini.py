@@ -1,17 +1,37 @@
 """Test ini backend."""
+import io
+import os
 from collections import OrderedDict
 from pathlib import Path
 import pytest
+try:
+    import configparser
+except ImportError:
+    import ConfigParser as configparser
 
 from user_config import (
     Section,
     StringListOption,
+    IntegerListOption,
+    FloatListOption,
     StringOption,
     BooleanOption,
     IntegerOption,
     FloatOption,
     InvalidConfigTree)
-from user_config.ini import ini_validate, ini_read, ini_write, register_extension
+from user_config.ini import (
+    ini_validate,
+    ini_read,
+    ini_write,
+    ini_lines,
+    ini_dump,
+    ini_parse,
+    ini_parse_lines,
+    ini_load,
+    ini_index,
+    register_extension,
+    PARSE_CACHE,
+    INDEX_CACHE)
 
 # pylint: disable=missing-docstring
 class EmptySection(Section):
@@ -50,8 +70,9 @@ def test_validate():
     with pytest.raises(InvalidConfigTree):
         ini_validate(None, OrderedDict(
             nested_section=NestedSection()))
-    unsupported_option = StringOption()
-    unsupported_option.type_ = "nonsense"
+    class UnsupportedOption(StringOption):
+        type_ = "nonsense"
+    unsupported_option = UnsupportedOption()
     with pytest.raises(InvalidConfigTree):
         ini_validate(None, OrderedDict(
             unsupported_option=unsupported_option))
@@ -126,6 +147,7 @@ def test_register_extension():
     assert result['read'] is ini_read
     assert result['write'] is ini_write
     assert result['validate'] is ini_validate
+    assert result['index'] is ini_index
 
 # pylint: disable=no-self-use,function-redefined
 class TestWrite(object):
@@ -528,3 +550,206 @@ class TestWrite(object):
             "",
             ""])
         assert err == ""
+
+def test_read_cached():
+    config_directory = Path(__file__).parents[0] / 'test_read'
+    class SectionOne(Section):
+        string = StringOption()
+        integer = IntegerOption()
+    PARSE_CACHE.clear()
+    PARSE_CACHE.resize(8)
+    try:
+        for _ in range(3):
+            config_tree = OrderedDict([('section_one', SectionOne())])
+            ini_read(None, config_directory / 'data_types.cfg', config_tree)
+            assert config_tree['section_one'].string == "some text"
+            assert config_tree['section_one'].integer == 5
+        assert PARSE_CACHE.misses == 1
+        assert PARSE_CACHE.hits == 2
+    finally:
+        PARSE_CACHE.resize(0)
+        PARSE_CACHE.clear()
+
+def test_parse_lines():
+    lines = [
+        "## documentation",
+        "[section]",
+        "# commented = out",
+        "Key = value",
+        "colon: value: with colon",
+        "url = http://example.com",
+        "multiline = first",
+        "    second",
+        "",
+        "    # comment inside value",
+        "    third",
+        "",
+        "",
+        "empty =",
+        "[other]",
+        "list = - a",
+        "    - b"]
+    assert ini_parse_lines(lines) == {
+        'section': {
+            'key': 'value',
+            'colon': 'value: with colon',
+            'url': 'http://example.com',
+            'multiline': 'first\nsecond\n\nthird',
+            'empty': ''},
+        'other': {'list': '- a\n- b'}}
+    with pytest.raises(configparser.MissingSectionHeaderError):
+        ini_parse_lines(["key = value"])
+    with pytest.raises(configparser.ParsingError):
+        ini_parse_lines(["[section]", "no delimiter"])
+    with pytest.raises(configparser.ParsingError):
+        ini_parse_lines(["[section]", "= no key"])
+    with pytest.raises(configparser.ParsingError):
+        ini_parse_lines(["[section]", "[section]"])
+    with pytest.raises(configparser.ParsingError):
+        ini_parse_lines(["[section]", "key = 1", "key = 2"])
+
+def test_parse_matches_configparser():
+    path = Path(__file__).parents[0] / 'test_read' / 'data_types.cfg'
+    parser = configparser.ConfigParser()
+    parser.read(str(path))
+    expected = {
+        section: dict(parser.items(section))
+        for section in parser.sections()}
+    assert ini_parse(path) == expected
+    assert ini_parse(path.parent / 'missing.cfg') == {}
+
+def test_read_typed_lists(tmp_path):
+    path = tmp_path / 'config.cfg'
+    path.write_text(u"[section]\nintegers = - 1\n    - 2\nfloats = - 1.5\n")
+    class ListSection(Section):
+        integers = IntegerListOption()
+        floats = FloatListOption()
+    config_tree = OrderedDict(section=ListSection())
+    ini_read(None, path, config_tree)
+    assert config_tree['section'].integers == [1, 2]
+    assert config_tree['section'].floats == [1.5]
+
+def test_index(tmp_path):
+    path = Path(__file__).parents[0] / 'test_read' / 'data_types.cfg'
+    class SectionOne(Section):
+        string = StringOption()
+        multiline_string = StringOption()
+        list = StringListOption()
+        integer = IntegerOption()
+        float = FloatOption()
+        boolean = BooleanOption()
+    class SectionThree(Section):
+        not_an_integer = IntegerOption()
+    elements = OrderedDict([
+        ('section_one', SectionOne()),
+        ('section_three', SectionThree()),
+        ('missing_section', EmptySection())])
+    index = ini_index(None, path, elements)
+    assert index.sections == ['section_one', 'section_three']
+    expected = ini_load(None, path, OrderedDict(
+        section_one=elements['section_one']))
+    assert index.load('section_one') == expected
+    with pytest.raises(ValueError):
+        index.load('section_three')
+
+    path = tmp_path / 'config.cfg'
+    # may be a continuation line, only a full parse can tell
+    path.write_text(u"[section]\nvalue = 1\n    [other]\n")
+    assert ini_index(None, path, elements) is None
+    path.write_text(u"[section]\n[section]\n")
+    assert ini_index(None, path, elements) is None
+    path.write_text(u"value = 1\n[section_one]\n")
+    with pytest.raises(configparser.MissingSectionHeaderError):
+        ini_index(None, path, elements)
+    # errors mention the line in the file, not in the section
+    path.write_text(u"[section_three]\n\n[section_one]\nstring = a\nstring = b\n")
+    index = ini_index(None, path, elements)
+    with pytest.raises(configparser.ParsingError) as error:
+        index.load('section_one')
+    assert error.value.errors[0][0] == 5
+
+def test_index_files(tmp_path):
+    class MySection(Section):
+        string = StringOption()
+    elements = OrderedDict(section=MySection())
+    path = tmp_path / 'config.cfg'
+    path.write_text(u"")
+    assert ini_load(None, path, elements) == {}
+    path.write_text(
+        u"[other]\nstring = other\n[section]\nstring = value\n")
+    INDEX_CACHE.clear()
+    index = ini_index(None, path, elements)
+    assert index.sections == ['section']
+    assert ini_load(None, path, elements) == {('section', 'string'): "value"}
+    assert INDEX_CACHE.hits == 1
+    if os.path.isdir('/proc/self/fd'):
+        # no file handles are kept open
+        assert str(path) not in [
+            os.path.realpath(os.path.join('/proc/self/fd', name))
+            for name in os.listdir('/proc/self/fd')]
+    # a replaced file is parsed again
+    replacement = tmp_path / 'replacement.cfg'
+    replacement.write_text(u"[other]\n[section]\nstring = replaced\n")
+    replacement.rename(path)
+    assert index.load('section') == {('section', 'string'): "replaced"}
+    index = ini_index(None, path, elements)
+    # as is a file changed in place, even when truncated
+    with path.open('w') as config_file:
+        config_file.write(u"[section]\nstring = x\n")
+    assert index.load('section') == {('section', 'string'): "x"}
+    # and a file that is gone has no values
+    path.unlink()
+    assert index.load('section') == {}
+    assert ini_load(None, path, elements) == {}
+
+def test_dump(tmp_path):
+    class MySection(Section):
+        string = StringOption(default="value", required=False)
+    elements = OrderedDict(section=MySection())
+    elements['section'].string = "overwritten"
+    expected = '\n'.join([
+        "## test",
+        "",
+        "[section]",
+        "# string = value",
+        "string = overwritten",
+        "",
+        "",
+        ""])
+    assert ''.join(ini_lines(None, elements, "test")) == expected
+
+    stream = io.StringIO()
+    ini_dump(None, elements, u"test", stream)
+    assert stream.getvalue() == expected
+
+    path = tmp_path / 'config.cfg'
+    path.write_text(u"old content")
+    ini_dump(None, elements, "test", path)
+    assert path.read_text() == expected
+    # no temporary files are left behind
+    assert [child.name for child in tmp_path.iterdir()] == ['config.cfg']
+    # written files can be read again
+    elements = OrderedDict(section=MySection())
+    ini_read(None, path, elements)
+    assert elements['section'].string == "overwritten"
+
+def test_dump_mode(tmp_path):
+    class MySection(Section):
+        string = StringOption(default="value", required=False)
+    elements = OrderedDict(section=MySection())
+    elements['section'].string = u"\u00fcberschrieben"
+    umask = os.umask(0o027)
+    try:
+        path = tmp_path / 'new.cfg'
+        ini_dump(None, elements, None, path)
+        assert path.stat().st_mode & 0o777 == 0o640
+        # the umask is never changed
+        assert os.umask(0o027) == 0o027
+    finally:
+        os.umask(umask)
+    os.chmod(str(path), 0o600)
+    ini_dump(None, elements, None, path)
+    assert path.stat().st_mode & 0o777 == 0o600
+    elements = OrderedDict(section=MySection())
+    ini_read(None, path, elements)
+    assert elements['section'].string == u"\u00fcberschrieben"
@@ -0,0 +1,129 @@
+"""Test ConfigProfile."""
+import logging
+import pytest
+from user_config import (
+    Config, Section, StringOption, IntegerOption, InvalidData)
+from user_config.cache import FileCache
+from user_config.sources import (
+    CommandLineSource, DictSource, DirectorySource, FileSource)
+from user_config.profile import ConfigProfile
+
+def slow_validate(value):
+    """Reject negative numbers."""
+    if value < 0:
+        raise InvalidData('negative')
+
+class ProfiledConfig(Config):
+
+    """Test profiling."""
+
+    application = "test"
+    author = "nobody"
+
+    class GeneralSection(Section):
+
+        """General section."""
+
+        string = StringOption(default="default")
+        number = IntegerOption(default=1, validate=slow_validate)
+
+    general = GeneralSection()
+
+def test_profile(tmp_path):
+    (tmp_path / 'config.cfg').write_text(u"[general]\nnumber = 3\n")
+    calls = []
+    profile = ConfigProfile(callback=calls.append)
+    config = ProfiledConfig(
+        sources=[
+            FileSource(tmp_path / 'config.cfg', 'global'),
+            FileSource(tmp_path / 'missing.cfg', 'user'),
+            CommandLineSource(['--string', 'cli'])],
+        profile=profile)
+    assert config.general.number == 3
+    assert calls == [profile]
+    result = profile.as_dict()
+    # command line phases are part of the third source
+    assert result['seconds'] >= sum(
+        phase['seconds'] for phase in result['phases']
+        if phase['name'] not in ('parser', 'parse_args', 'extract')) > 0
+    assert [phase['name'] for phase in result['phases']] == [
+        'source', 'source', 'parser', 'parse_args', 'extract', 'source',
+        'merge', 'finish', 'check']
+    assert [phase.get('source') for phase in result['phases'][:3]] == [
+        'FileSource', 'FileSource', None]
+    assert result['files'] == [
+        {'path': str(tmp_path / 'config.cfg'), 'bytes': 21,
+         'seconds': result['files'][0]['seconds']},
+        {'path': str(tmp_path / 'missing.cfg'), 'bytes': None,
+         'seconds': result['files'][1]['seconds']}]
+    validators = dict(
+        ((record['section'], record['key']), record['calls'])
+        for record in result['validators'])
+    # read from the file and the command line, then checked once merged
+    assert validators == {
+        ('general', 'number'): 2, ('general', 'string'): 2}
+
+def test_profile_sources(tmp_path):
+    profile = ConfigProfile()
+    ProfiledConfig(
+        global_path=tmp_path, user_path=tmp_path, cli=False, profile=profile)
+    assert profile.phases[0]['name'] == 'sources'
+    assert [record['path'] for record in profile.files] == [
+        str(tmp_path / 'config.cfg')] * 2
+
+def test_profile_failure():
+    profile = ConfigProfile()
+    with pytest.raises(InvalidData):
+        ProfiledConfig(
+            sources=[DictSource({'general': {'number': -1}})],
+            profile=profile)
+    assert profile.validators[('general', 'number')][0] == 1
+    assert profile.seconds is None
+
+def test_profile_lazy_cached(tmp_path):
+    class LazyProfiledConfig(Config):
+        """Test profiling lazy sections."""
+        application = "test"
+        author = "nobody"
+        lazy_sections = 'all'
+        general = ProfiledConfig.GeneralSection()
+    (tmp_path / '10-number.cfg').write_text(u"[general]\nnumber = 3\n")
+    cache = FileCache(max_entries=10)
+    first = ConfigProfile()
+    LazyProfiledConfig(
+        sources=[DirectorySource(tmp_path, cache=cache)], profile=first)
+    second = ConfigProfile()
+    # the fragment comes from the cache, read by this instance
+    config = LazyProfiledConfig(
+        sources=[DirectorySource(tmp_path, cache=cache)], profile=second)
+    assert config.general.number == 3
+    assert first.validators == {}
+    assert second.validators[('general', 'number')][0] == 1
+
+def test_profile_async(tmp_path):
+    # python 2 has no asyncio
+    asyncio = pytest.importorskip('asyncio')
+    (tmp_path / 'config.cfg').write_text(u"[general]\nnumber = 3\n")
+    profile = ConfigProfile()
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        config = loop.run_until_complete(ProfiledConfig.load_async(
+            sources=[FileSource(tmp_path / 'config.cfg')], profile=profile))
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+    assert config.general.number == 3
+    assert [phase['name'] for phase in profile.phases] == [
+        'source', 'merge', 'finish', 'check']
+    assert len(profile.files) == 1
+
+def test_profile_log(caplog):
+    caplog.set_level(logging.DEBUG, logger='user_config.profile')
+    ProfiledConfig(sources=[], profile=ConfigProfile())
+    assert 'merge' in caplog.records[0].getMessage()
+
+def test_no_profile():
+    config = ProfiledConfig(sources=[])
+    assert config._profile is None # pylint: disable=protected-access
+    assert config.general.number == 1
@@ -0,0 +1,245 @@
+"""Test reloading configuration files."""
+import os
+import sys
+import time
+import threading
+import pytest
+
+from user_config import (
+    Config, Section, StringOption, IntegerOption, StringListOption,
+    InvalidData, MissingData)
+from user_config.reload import ConfigWatcher, InotifyBackend
+from user_config.sources import DirectorySource
+from user_config.cache import FileCache
+
+# pylint: disable=missing-docstring
+class ReloadConfig(Config):
+
+    """Test configuration reloading."""
+
+    application = "test"
+    author = "nobody"
+
+    class GeneralSection(Section):
+
+        """General section."""
+
+        string = StringOption(default="default")
+        number = IntegerOption(required=False)
+        hosts = StringListOption(required=False, additive=True)
+
+    general = GeneralSection()
+
+def write(path, text):
+    # make sure the modification time changes, even on coarse clocks
+    mtime = time.time() + 1 if not path.exists() else \
+        os.stat(str(path)).st_mtime + 1
+    path.write_text(text)
+    os.utime(str(path), (mtime, mtime))
+
+@pytest.fixture
+def directories(tmp_path):
+    global_path = tmp_path / 'global'
+    user_path = tmp_path / 'user'
+    global_path.mkdir()
+    user_path.mkdir()
+    return global_path, user_path
+
+def create(directories, *args):
+    sys.argv = [sys.argv[0]] + list(args)
+    return ReloadConfig(
+        global_path=directories[0], user_path=directories[1])
+
+def test_reload(directories):
+    global_file = directories[0] / 'config.cfg'
+    user_file = directories[1] / 'config.cfg'
+    write(global_file, u"[general]\nstring = global\nhosts = - a\n")
+    config = create(directories)
+    assert config.get_paths() == [global_file, user_file]
+    assert config.general.string == "global"
+    calls = []
+    config.subscribe(lambda config, changed: calls.append(changed))
+
+    # user file appears, overrides global file
+    write(user_file, u"[general]\nstring = user\nhosts = - b\n")
+    assert config.reload(user_file) == [
+        ('general', 'string'), ('general', 'hosts')]
+    assert config.general.string == "user"
+    assert config.general.hosts == ["a", "b"]
+    assert len(calls) == 1
+
+    # global file changes, user file still wins
+    write(global_file, u"[general]\nstring = global2\nnumber = 5\n")
+    assert config.reload(global_file) == [
+        ('general', 'number'), ('general', 'hosts')]
+    assert config.general.string == "user"
+    assert config.general.number == 5
+    assert config.general.hosts == ["b"]
+
+    # nothing changed, nobody gets called
+    assert config.reload() == []
+    assert len(calls) == 2
+
+def test_reload_keeps_cli_and_runtime_values(directories):
+    user_file = directories[1] / 'config.cfg'
+    write(user_file, u"[general]\nstring = user\nnumber = 1\n")
+    config = create(directories, '--string', 'cli')
+    config.general.hosts = ["runtime"]
+    write(user_file, u"[general]\nstring = user2\nnumber = 2\n")
+    config.reload(user_file)
+    assert config.general.string == "cli"
+    assert config.general.number == 2
+    assert config.general.hosts == ["runtime"]
+
+def test_reload_invalid(directories):
+    user_file = directories[1] / 'config.cfg'
+    write(user_file, u"[general]\nnumber = 1\n")
+    config = create(directories)
+    write(user_file, u"[general]\nnumber = not a number\n")
+    with pytest.raises(ValueError):
+        config.reload(user_file)
+    assert config.general.number == 1
+
+    class ValidatedConfig(ReloadConfig):
+        """Test validation during reload."""
+        class GeneralSection(Section):
+            """General section."""
+            number = IntegerOption(validate=lambda value: value < 5 or (
+                _ for _ in ()).throw(InvalidData('too big')))
+        general = GeneralSection()
+    write(user_file, u"[general]\nnumber = 1\n")
+    sys.argv = [sys.argv[0]]
+    config = ValidatedConfig(
+        global_path=directories[0], user_path=directories[1])
+    write(user_file, u"[general]\nnumber = 6\n")
+    with pytest.raises(InvalidData):
+        config.reload(user_file)
+    assert config.general.number == 1
+
+def test_inotify_flags(tmp_path):
+    if not InotifyBackend.available():
+        pytest.skip('inotify not available')
+    fcntl = pytest.importorskip('fcntl')
+    backend = InotifyBackend([tmp_path / 'config.cfg'])
+    try:
+        # pylint: disable=protected-access
+        assert fcntl.fcntl(backend._fd, fcntl.F_GETFL) & os.O_NONBLOCK
+        assert fcntl.fcntl(backend._fd, fcntl.F_GETFD) & fcntl.FD_CLOEXEC
+    finally:
+        backend.close()
+
+@pytest.mark.parametrize('use_inotify', [False, True])
+def test_watcher(directories, use_inotify):
+    if use_inotify and not InotifyBackend.available():
+        pytest.skip('inotify not available')
+    user_file = directories[1] / 'config.cfg'
+    config = create(directories)
+    changed = threading.Event()
+    config.subscribe(lambda config, keys: changed.set())
+    watcher = ConfigWatcher(config, interval=0.05, use_inotify=use_inotify)
+    # nothing changed yet
+    assert watcher.check() == []
+    with watcher:
+        write(user_file, u"[general]\nstring = user\n")
+        assert changed.wait(5)
+    assert config.general.string == "user"
+
+def test_reload_drop_in(tmp_path):
+    drop_in = tmp_path / 'config.d'
+    drop_in.mkdir()
+    write(drop_in / '10-first.cfg', u"[general]\nhosts = - a\n")
+    config = ReloadConfig(sources=[
+        DirectorySource(drop_in, cache=FileCache(max_entries=10))])
+    assert config.general.hosts == ["a"]
+    write(drop_in / '20-second.cfg', u"[general]\nhosts = - b\nnumber = 2\n")
+    # listed again when reloading the directory or all files
+    assert config.reload(drop_in) == [
+        ('general', 'number'), ('general', 'hosts')]
+    assert config.general.hosts == ["a", "b"]
+    (drop_in / '10-first.cfg').unlink()
+    assert config.reload() == [('general', 'hosts')]
+    assert config.general.hosts == ["b"]
+    assert config.get_paths() == [drop_in / '20-second.cfg']
+
+@pytest.mark.parametrize('use_inotify', [False, True])
+def test_watcher_drop_in(tmp_path, use_inotify):
+    if use_inotify and not InotifyBackend.available():
+        pytest.skip('inotify not available')
+    drop_in = tmp_path / 'config.d'
+    drop_in.mkdir()
+    config = ReloadConfig(sources=[
+        DirectorySource(drop_in, cache=FileCache(max_entries=10))])
+    changed = threading.Event()
+    config.subscribe(lambda config, keys: changed.set())
+    watcher = ConfigWatcher(config, interval=0.05, use_inotify=use_inotify)
+    with watcher:
+        # files added later are read, and watched from then on
+        write(drop_in / '10-added.cfg', u"[general]\nnumber = 1\n")
+        assert changed.wait(5)
+        assert config.general.number == 1
+        changed.clear()
+        write(drop_in / '10-added.cfg', u"[general]\nnumber = 2\n")
+        assert changed.wait(5)
+    assert config.general.number == 2
+
+def test_incremental_reload(directories):
+    validated = []
+    def count_validation(value):
+        validated.append(value)
+    class CountingConfig(Config):
+        """Test incremental reloading."""
+        application = "test"
+        author = "nobody"
+        class GeneralSection(Section):
+            """General section."""
+            one = StringOption(validate=count_validation)
+            two = StringOption(validate=count_validation)
+        general = GeneralSection()
+        class OptionalSection(Section):
+            """Optional section."""
+            three = StringOption(validate=count_validation)
+        optional = OptionalSection(required=False)
+    user_file = directories[1] / 'config.cfg'
+    write(user_file, u"[general]\none = a\ntwo = b\n[optional]\nthree = c\n")
+    sys.argv = [sys.argv[0]]
+    config = CountingConfig(
+        global_path=directories[0], user_path=directories[1])
+    del validated[:]
+
+    # only the changed key is validated
+    write(user_file, u"[general]\none = a\ntwo = x\n[optional]\nthree = c\n")
+    assert config.reload(user_file) == [('general', 'two')]
+    assert validated == ["x"]
+    assert config.optional.incomplete_count == 0
+
+    # removed key in optional section, required check for that section only
+    del validated[:]
+    write(user_file, u"[general]\none = a\ntwo = x\n")
+    assert config.reload(user_file) == [('optional', 'three')]
+    assert validated == []
+    assert config.optional.incomplete_count == 1
+
+    # removed key in required section
+    write(user_file, u"[general]\none = a\n")
+    with pytest.raises(MissingData):
+        config.reload(user_file)
+    assert config.general.two == "x"
+
+    # full reload validates everything
+    del validated[:]
+    write(user_file, u"[general]\none = a\ntwo = x\n")
+    assert config.reload(user_file, incremental=False) == []
+    assert sorted(validated) == ["a", "a", "x", "x"]
+
+def test_snapshot_follows_reload(directories):
+    user_file = directories[1] / 'config.cfg'
+    write(user_file, u"[general]\nhosts = - a\n")
+    config = create(directories)
+    snapshots = [config.freeze()]
+    config.subscribe(
+        lambda config, changed: snapshots.append(config.freeze()))
+    write(user_file, u"[general]\nhosts = - b\n")
+    config.reload(user_file)
+    assert snapshots[0].general.hosts == ("a",)
+    assert snapshots[1].general.hosts == ("b",)
+    assert len({snapshots[0], snapshots[1], config.freeze()}) == 2
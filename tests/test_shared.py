@@ -0,0 +1,96 @@
+"""Test sharing configuration values between processes."""
+import os
+import sys
+import pytest
+
+from user_config import Config, Section, StringOption, StringListOption
+from user_config.shared import SharedConfig
+
+# pylint: disable=missing-docstring
+class SharedTestConfig(Config):
+
+    """Test shared configuration."""
+
+    application = "test"
+    author = "nobody"
+
+    class GeneralSection(Section):
+
+        """General section."""
+
+        string = StringOption(default="default")
+        hosts = StringListOption(required=False)
+
+    general = GeneralSection()
+
+@pytest.fixture
+def config(tmp_path):
+    (tmp_path / 'user').mkdir()
+    (tmp_path / 'user' / 'config.cfg').write_text(
+        u"[general]\nstring = user\nhosts = - a\n    - b\n")
+    sys.argv = [sys.argv[0]]
+    return SharedTestConfig(
+        global_path=tmp_path / 'global', user_path=tmp_path / 'user')
+
+def test_attach(tmp_path, config):
+    path = tmp_path / 'shared'
+    shared = SharedConfig.create(config, path=path)
+    worker_shared = SharedConfig.attach(SharedTestConfig, path)
+    worker = worker_shared.load()
+    assert worker.general.string == "user"
+    assert worker['general']['hosts'] == ["a", "b"]
+    assert worker_shared.sync(worker) == []
+
+    calls = []
+    worker.subscribe(lambda config, changed: calls.append(changed))
+    (tmp_path / 'user' / 'config.cfg').write_text(
+        u"[general]\nstring = reloaded\n")
+    config.reload()
+    assert worker.general.string == "user"
+    assert worker_shared.sync(worker) == [
+        ('general', 'string'), ('general', 'hosts')]
+    assert worker.general.string == "reloaded"
+    assert worker.general.hosts is None
+    assert calls == [[('general', 'string'), ('general', 'hosts')]]
+
+    # values set in the worker survive updates
+    worker.general.string = "worker"
+    config.general.hosts = ["c"]
+    shared.publish(config)
+    assert worker_shared.sync(worker) == [('general', 'hosts')]
+    assert worker.general.string == "worker"
+    worker_shared.close()
+    shared.close()
+    # closed memory is no longer published to
+    config.subscribe(lambda config, changed: calls.append(changed))
+    (tmp_path / 'user' / 'config.cfg').write_text(
+        u"[general]\nstring = closed\n")
+    assert config.reload() == [('general', 'string')]
+    assert calls[-1] == [('general', 'string')]
+
+def test_capacity(config):
+    shared = SharedConfig.create(config, size=128)
+    config.general.string = "x" * 128
+    with pytest.raises(ValueError):
+        shared.publish(config)
+    assert shared.load().general.string == "user"
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="requires fork")
+def test_fork(config):
+    shared = SharedConfig.create(config)
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # pylint: disable=protected-access
+        try:
+            worker = shared.load()
+            os.read(read, 1)
+            shared.sync(worker)
+            os.write(write, worker.general.string.encode())
+        finally:
+            os._exit(0)
+    config.general.string = "changed"
+    shared.publish(config)
+    os.write(write, b'x')
+    os.waitpid(pid, 0)
+    assert os.read(read, 64) == b'changed'
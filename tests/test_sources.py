@@ -0,0 +1,140 @@
+"""Test sources of configuration values."""
+import sys
+import pytest
+
+from user_config import (
+    Config, Section, StringOption, IntegerOption, BooleanOption,
+    StringListOption, IntegerListOption, InvalidData)
+from user_config.sources import (
+    FileSource, DirectorySource, EnvironmentSource, DictSource,
+    CommandLineSource, convert_text)
+from user_config.cache import FileCache
+
+# pylint: disable=missing-docstring
+class SourceConfig(Config):
+
+    """Test configuration sources."""
+
+    application = "my-app"
+    author = "nobody"
+
+    class GeneralSection(Section):
+
+        """General section."""
+
+        string = StringOption(default="default")
+        number = IntegerOption(required=False)
+        flag = BooleanOption(required=False)
+        hosts = StringListOption(required=False, additive=True)
+
+    general = GeneralSection()
+
+def test_convert_text():
+    assert convert_text(IntegerOption(), "5") == 5
+    assert convert_text(BooleanOption(), "Yes") is True
+    assert convert_text(BooleanOption(), "off") is False
+    assert convert_text(IntegerListOption(), "1, 2,,3") == [1, 2, 3]
+    with pytest.raises(ValueError):
+        convert_text(BooleanOption(), "maybe")
+
+def test_pipeline(tmp_path):
+    (tmp_path / 'config.cfg').write_text(
+        u"[general]\nstring = file\nhosts = - a\n")
+    drop_in = tmp_path / 'config.d'
+    drop_in.mkdir()
+    (drop_in / '20-second.cfg').write_text(u"[general]\nnumber = 2\n")
+    (drop_in / '10-first.cfg').write_text(
+        u"[general]\nnumber = 1\nhosts = - b\n")
+    (drop_in / 'ignored.txt').write_text(u"[general]\nnumber = 3\n")
+    environment = {
+        'MY_APP_GENERAL_FLAG': 'yes',
+        'MY_APP_GENERAL_HOSTS': 'c,d',
+        'MY_APP_GENERAL_STRING': ''}
+    config = SourceConfig(sources=[
+        FileSource(tmp_path / 'missing.cfg'),
+        FileSource(tmp_path / 'config.cfg'),
+        DirectorySource(drop_in),
+        DirectorySource(tmp_path / 'missing.d'),
+        EnvironmentSource(environment=environment),
+        DictSource({'general': {'string': "dict"}}),
+        CommandLineSource(['--number', '7'])])
+    assert config.general.string == "dict"
+    assert config.general.number == 7
+    assert config.general.flag is True
+    assert config.general.hosts == ["a", "b", "c", "d"]
+    assert config.get_paths() == [
+        tmp_path / 'missing.cfg',
+        tmp_path / 'config.cfg',
+        drop_in / '10-first.cfg',
+        drop_in / '20-second.cfg']
+
+    # drop-in files are reloaded like any other file
+    (drop_in / '20-second.cfg').write_text(u"[general]\nflag = no\n")
+    assert config.reload(drop_in / '20-second.cfg') == []
+    config = SourceConfig(sources=[DirectorySource(drop_in)])
+    assert config.general.number == 1
+    assert config.general.flag is False
+
+def test_invalid_sources(tmp_path):
+    with pytest.raises(ValueError):
+        SourceConfig(sources=[EnvironmentSource(
+            prefix='other', environment={'OTHER_GENERAL_NUMBER': 'many'})])
+    with pytest.raises(InvalidData):
+        SourceConfig(sources=[DictSource({'general': {'number': "many"}})])
+    with pytest.raises(AttributeError) as error:
+        SourceConfig(sources=[DictSource({'general': {'nmae': 1}})])
+    assert str(error.value) == 'no option nmae in section general'
+    with pytest.raises(AttributeError):
+        SourceConfig(sources=[DictSource({'unknown': 1})])
+
+def test_get_sources(tmp_path):
+    class EnvironmentConfig(Config):
+        """Test adding sources."""
+        application = "my-app"
+        author = "nobody"
+        class GeneralSection(Section):
+            """General section."""
+            number = IntegerOption(required=False)
+        general = GeneralSection()
+        def get_sources(self, *args):
+            return Config.get_sources(self, *args) + [
+                EnvironmentSource(environment={'MY_APP_GENERAL_NUMBER': '3'})]
+    sys.argv = [sys.argv[0], '--number', '5']
+    config = EnvironmentConfig(global_path=tmp_path, user_path=tmp_path)
+    # environment has the last word
+    assert config.general.number == 3
+    config = EnvironmentConfig(
+        global_path=tmp_path, user_path=tmp_path, cli=False)
+    assert config.general.number == 3
+
+def test_drop_in_directory(tmp_path):
+    drop_in = tmp_path / 'config.d'
+    drop_in.mkdir()
+    for index in range(50):
+        (drop_in / '{:02}-fragment.cfg'.format(index)).write_text(
+            u"[general]\nnumber = {0}\nhosts = - host{0}\n    - shared\n".format(
+                index))
+    cache = FileCache(max_entries=100)
+    parallel = SourceConfig(sources=[
+        DirectorySource(drop_in, max_workers=8, cache=cache)])
+    assert cache.misses == 50
+    sequential = SourceConfig(sources=[
+        DirectorySource(drop_in, max_workers=1, cache=cache)])
+    assert cache.hits == 50
+    expected = ["host0", "shared"] + [
+        "host{}".format(index) for index in range(1, 50)]
+    assert parallel.general.hosts == expected
+    assert sequential.general.hosts == expected
+    assert parallel.general.number == 49
+
+    # only changed fragments are read again
+    (drop_in / '10-fragment.cfg').write_text(u"[general]\nnumber = 100\n")
+    SourceConfig(sources=[DirectorySource(drop_in, cache=cache)])
+    assert cache.misses == 51
+
+    # the first broken fragment in lexical order is reported
+    (drop_in / '20-fragment.cfg').write_text(u"[general]\nnumber = x\n")
+    (drop_in / '30-fragment.cfg').write_text(u"broken\n")
+    with pytest.raises(ValueError) as error:
+        SourceConfig(sources=[DirectorySource(drop_in, cache=cache)])
+    assert 'invalid literal' in str(error.value)
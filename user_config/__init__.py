@@ -1,11 +1,31 @@
 """User config management."""
+import io
+import os
 import sys
+import json
+import keyword
+import array
+import errno
+import locale
+import binascii
+import re
+import hashlib
+import threading
 import collections
+from itertools import repeat, count
 from pathlib import Path
 import argparse
-from pkg_resources import iter_entry_points
-from six import string_types
+from six import string_types, get_unbound_function, StringIO
 from appdirs import AppDirs
+from user_config.file_types import FILE_TYPES
+from user_config.cache import InFlightReads, CompiledCache, file_key
+from user_config.sources import (
+    Layer, LazyValues, FileSource, CommandLineSource)
+from user_config.compact import COMPACT_TYPES, to_builtin
+from user_config.profile import NULL_PHASE
+
+# reads of the same file by concurrently created instances are shared
+_FILE_READS = InFlightReads()
 
 def with_metaclass(meta, *bases):
     """
@@ -51,8 +71,11 @@ class ConfigMeta(type):
     """
     ORM-like magic for configuration class.
 
-    Gather all `ConfigElement` attributes into `_elements` and
-    get correct `_validate`, `_read` and `_writer` functions.
+    Gather all `ConfigElement` attributes into `_elements`, compile
+    them into a flat `_schema` table with a `schema_fingerprint` and get
+    correct `_validate`, `_read` and `_writer` functions. The element
+    tree is validated against the file type once, when the class is
+    created.
 
     Parameters
     ----------
@@ -67,6 +90,8 @@ class ConfigMeta(type):
     ------
     AttributeError:
         if class tries to overwrite a reserved attribute
+    InvalidConfigTree:
+        if configuration tree is inappropriate for `file_type`
     ImportError:
         if no appropriate `entry_point` could be found for `file_type`
 
@@ -79,8 +104,24 @@ class ConfigMeta(type):
     def __new__(mcs, cls_name, cls_parents, cls_attributes):
         reserved_names = [
             '_elements',
+            '_schema',
+            'schema_fingerprint',
+            '_defaults',
+            '_positions',
+            '_section_positions',
+            '_copy_positions',
+            '_compact_positions',
+            '_cli_options',
+            '_bound_types',
+            '_cli_destinations',
+            '_parser',
+            '_snapshot_type',
+            '_compiled',
             '_extension',
             '_read',
+            '_load',
+            '_index',
+            '_dump',
             '_write',
             '_validate']
         new_attributes = {'_elements': collections.OrderedDict()}
@@ -94,17 +135,14 @@ class ConfigMeta(type):
                 fields[attribute] = cls_attributes[attribute]
                 fields[attribute].element_name = attribute
             elif attribute == 'file_type':
-                file_types = {}
-                for entry_point in iter_entry_points('user_config.file_type'):
-                    # TODO: deal with duplicate entry point names
-                    file_types[entry_point.name] = entry_point
-                if cls_attributes[attribute] not in file_types:
-                    raise ImportError(
-                        'no entry point found for file type {}'.format(
-                            cls_attributes[attribute]))
-                extension = file_types[cls_attributes[attribute]].load()()
+                extension = FILE_TYPES.get(cls_attributes[attribute])
                 new_attributes['_extension'] = extension['extension']
                 new_attributes['_read'] = extension['read']
+                new_attributes['_load'] = extension.get(
+                    'load') or read_loader(extension['read'])
+                new_attributes['_index'] = extension.get('index')
+                new_attributes['_dump'] = extension.get(
+                    'dump') or write_dumper(extension['write'])
                 new_attributes['_write'] = extension['write']
                 new_attributes['_validate'] = extension['validate']
             else:
@@ -112,38 +150,513 @@ class ConfigMeta(type):
         for attribute in sorted(
                 fields, key=lambda name: fields[name].creation_counter):
             new_attributes['_elements'][attribute] = fields[attribute]
-        return type.__new__(mcs, cls_name, cls_parents, new_attributes)
+        new_attributes['_schema'] = compile_schema(
+            new_attributes['_elements'])
+        if any(issubclass(parent, ConfigElement) for parent in cls_parents):
+            # sections only need their schema, which the root class
+            # compiles into its own. They have no file type either,
+            # `_validate` is their validator
+            return type.__new__(mcs, cls_name, cls_parents, new_attributes)
+        new_attributes['schema_fingerprint'] = compile_fingerprint(
+            new_attributes['_schema'])
+        new_attributes.update(compile_value_layout(new_attributes['_schema']))
+        new_attributes['_cli_options'] = frozenset(
+            name for entry in new_attributes['_schema']
+            for name in entry.cli_names)
+        new_attributes['_cli_destinations'] = tuple(
+            (entry.dest, index)
+            for index, entry in enumerate(new_attributes['_schema']))
+        new_attributes['_parser'] = None
+        new_attributes['_snapshot_type'] = None
+        new_attributes['_compiled'] = None
+        new_class = type.__new__(mcs, cls_name, cls_parents, new_attributes)
+        compile_accessors(new_class)
+        # check the element tree once, instead of on every instantiation
+        validate = getattr(new_class, '_validate', None)
+        if validate is not None:
+            get_unbound_function(validate)(new_class, new_class._elements)
+        return new_class
+
+SchemaEntry = collections.namedtuple('SchemaEntry', [
+    'section',
+    'key',
+    'element',
+    'type_',
+    'required',
+    'default',
+    'cli_names',
+    'dest',
+    'validate',
+    'section_required'])
+
+def compile_schema(elements):
+    """
+    Flatten an element tree into an immutable schema table.
+
+    Every element that is not a `Section` gets one `SchemaEntry`, in tree
+    order. Elements directly inside a root level `Section` carry that
+    section's name, root level elements have `section` set to None.
+    Sections nested deeper than that are kept as a single entry.
+
+    Parameters
+    ----------
+    elements: Dict[ConfigElement]
+        element tree
+
+    Raises
+    ------
+    None
+
+    Returns
+    -------
+    Tuple[SchemaEntry]
+
+    Examples
+    --------
+    ..doctest::
+
+        >>> TODO
+    """
+    schema = []
+    for name in elements:
+        element = elements[name]
+        if isinstance(element, Section):
+            # same as `_replace`, without its per-entry overhead
+            middle = slice(1, len(SchemaEntry._fields) - 1)
+            schema.extend(
+                tuple.__new__(SchemaEntry, (name,) + entry[middle] + (
+                    element.required,))
+                for entry in element._schema)
+        else:
+            cli_names, dest = element.get_cli_names()
+            schema.append(SchemaEntry(
+                section=None,
+                key=name,
+                element=element,
+                type_=element.type_,
+                required=element.required,
+                default=element.get_default(),
+                cli_names=cli_names,
+                dest=dest,
+                validate=element.validate,
+                section_required=True))
+    return tuple(schema)
+
+def compile_fingerprint(schema):
+    """
+    Return a stable hash of everything in `schema` that shapes values.
+
+    Covers element names and order, element classes, types and subtypes,
+    required flags, additive lists and defaults. Documentation and
+    command line names are left out. Only the order of elements is
+    used, not their `creation_counter`, which depends on import order.
+    The result is the same in every process, so it can be stored next
+    to values to tell if they still fit a class.
+
+    Parameters
+    ----------
+    schema: Tuple[SchemaEntry]
+        compiled schema
+
+    Returns
+    -------
+    str
+        hexadecimal sha1 digest
+    """
+    description = []
+    for entry in schema:
+        element = entry.element
+        description.append([
+            entry.section,
+            entry.key,
+            type(element).__name__,
+            entry.type_.__name__,
+            getattr(getattr(element, 'subtype', None), '__name__', None),
+            entry.required,
+            entry.section_required,
+            getattr(element, '_additive', False),
+            entry.default])
+    return hashlib.sha1(json.dumps(
+        description, sort_keys=True, default=repr).encode(
+            'utf-8')).hexdigest()
+
+def compile_value_layout(schema):
+    """
+    Compute how per-instance values are stored for `schema`.
+
+    Values live in a list with one slot per schema entry, so creating
+    an instance only costs a copy of `_defaults`.
+
+    Parameters
+    ----------
+    schema: Tuple[SchemaEntry]
+        compiled schema
+
+    Returns
+    -------
+    Dict
+        `_defaults`: Tuple[Any], initial slot values
+        `_positions`: Dict[Tuple[str, str], int], slot per (section, key)
+        `_section_positions`: Dict[str, Dict[str, int]], slot per key,
+        grouped by section
+        `_copy_positions`: Tuple[int], slots with mutable defaults that
+        have to be copied per instance
+        `_compact_positions`: Tuple[int], slots of compact lists, which
+        are stored as plain lists outside of the process
+    """
+    positions = {}
+    section_positions = {}
+    copy_positions = []
+    compact_positions = []
+    for index, entry in enumerate(schema):
+        positions[(entry.section, entry.key)] = index
+        section_positions.setdefault(entry.section, {})[entry.key] = index
+        if isinstance(entry.default, (list, array.array)):
+            copy_positions.append(index)
+        if getattr(entry.element, 'compact', False):
+            compact_positions.append(index)
+    return {
+        '_defaults': tuple(entry.default for entry in schema),
+        '_positions': positions,
+        '_section_positions': section_positions,
+        '_copy_positions': tuple(copy_positions),
+        '_compact_positions': tuple(compact_positions)}
+
+class SlotProperty(object):
+
+    """
+    Read-only accessor for a value slot, generated by `ConfigMeta`.
+
+    One small object per option, large schemas have many of them.
+    """
+
+    __slots__ = ('index',)
+
+    def __init__(self, index):
+        self.index = index
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        # pylint: disable=protected-access
+        return instance._values[self.index]
+
+    def __set__(self, instance, value):
+        raise AttributeError("can't set attribute")
+
+class _HiddenSlot(SlotProperty):
+
+    """Hide an inherited accessor."""
+
+    __slots__ = ()
+
+    def __get__(self, instance, owner):
+        raise AttributeError
+
+class SectionAccessor(object):
+
+    """
+    Bind a section on first attribute access, generated by `ConfigMeta`.
+
+    The bound section is stored in the instance dictionary, which takes
+    precedence over this (non-data) descriptor for every later lookup.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        # pylint: disable=protected-access
+        return instance._get_item(self.name)
+
+def _is_free(cls, key):
+    """Return True if `key` is not taken, or only by an accessor."""
+    return isinstance(
+        getattr(cls, key, None),
+        (SlotProperty, SectionAccessor)) or not hasattr(cls, key)
+
+def compile_accessors(cls):
+    """
+    Generate fast attribute access for a class holding per-instance values.
+
+    Every root level option gets a property on `cls` that reads its
+    value slot directly, every section a `SectionAccessor`. Sections get
+    their own `BoundSection` subclass with such properties, collected in
+    `cls._bound_types`. Names that are already taken by methods or
+    attributes are only available through item access. Assignment always
+    goes through `MappingMixin.__setattr__`.
+
+    Parameters
+    ----------
+    cls: type
+        class created by `ConfigMeta`, with `_section_positions`
+
+    Returns
+    -------
+    None
+    """
+    # pylint: disable=protected-access
+    cls._bound_types = {}
+    root_slots = cls._section_positions.get(None, {})
+    for parent in cls.__mro__[1:]:
+        for key in vars(parent):
+            if key not in cls._elements and isinstance(
+                    vars(parent)[key], (SlotProperty, SectionAccessor)):
+                setattr(cls, key, _HiddenSlot(None))
+    for key, index in root_slots.items():
+        if _is_free(cls, key):
+            setattr(cls, key, SlotProperty(index))
+    for section, slots in cls._section_positions.items():
+        if section is None:
+            continue
+        if _is_free(cls, section):
+            setattr(cls, section, SectionAccessor(section))
+        attributes = {}
+        for key, index in slots.items():
+            if _is_free(BoundSection, key):
+                attributes[key] = SlotProperty(index)
+        cls._bound_types[section] = type(
+            'Bound{}'.format(type(cls._elements[section]).__name__),
+            (BoundSection,),
+            attributes)
+
+def copy_value(value):
+    """Return copy of list values, other values are immutable."""
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, array.array):
+        return value.__copy__()
+    return value
+
+def freeze_value(value):
+    """Return hashable copy of `value`, lists become tuples."""
+    if isinstance(value, (list, array.array)):
+        return tuple(freeze_value(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(
+            (key, freeze_value(item)) for key, item in value.items())
+    return value
+
+def compile_snapshot_type(cls):
+    """
+    Generate the immutable snapshot types for a `Config` class.
+
+    The snapshot of a class is a namedtuple with a field per root level
+    element, sections are nested namedtuples with a field per option.
+
+    Parameters
+    ----------
+    cls: type
+        class created by `ConfigMeta`
+
+    Returns
+    -------
+    Tuple[type, Tuple[Tuple[type, Union[int, Tuple[int]]]]]
+        snapshot type and, per field, the section snapshot type (None
+        for root level options) and its value slot(s)
+    """
+    # pylint: disable=protected-access
+    fields = []
+    for name in cls._elements:
+        if name in cls._bound_types:
+            slots = cls._section_positions[name]
+            section_type = collections.namedtuple(
+                '{}Snapshot'.format(type(cls._elements[name]).__name__),
+                list(slots),
+                rename=True)
+            fields.append((section_type, tuple(slots.values())))
+        else:
+            fields.append((None, cls._positions[(None, name)]))
+    snapshot_type = collections.namedtuple(
+        '{}Snapshot'.format(cls.__name__), list(cls._elements), rename=True)
+    return snapshot_type, tuple(fields)
+
+def _create_temporary(target):
+    """
+    Create a file next to `target`, return its handle and path.
+
+    The file is created with mode 0o666, which the umask restricts like
+    for any new file. The umask is process wide, it is never changed.
+    """
+    directory, name = os.path.split(os.path.abspath(target))
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+    while True:
+        temporary = os.path.join(directory, '.{}.{}'.format(
+            name, binascii.hexlify(os.urandom(6)).decode('ascii')))
+        try:
+            return os.open(temporary, flags, 0o666), temporary
+        except OSError as error:
+            if error.errno != errno.EEXIST:
+                raise
+
+def write_atomic(target, text):
+    """
+    Write `text` to a stream or file in a single operation.
+
+    Files are replaced atomically: `text` is written to a temporary file
+    in the same directory, which is renamed to `target` when complete.
+
+    Parameters
+    ----------
+    target: Union[TextIO, BinaryIO, pathlib.Path, str]
+        stream or path to write to
+    text: Union[str, bytes]
+        complete content, text is written to files in the preferred
+        encoding, which files are read with as well
+
+    Raises
+    ------
+    OSError:
+        if `target` can not be written
+
+    Returns
+    -------
+    None
+    """
+    if hasattr(target, 'write'):
+        target.write(text)
+        return
+    if not isinstance(text, bytes):
+        text = text.encode(locale.getpreferredencoding(False))
+    target = str(target)
+    try:
+        mode = os.stat(target).st_mode & 0o7777
+    except OSError:
+        mode = None
+    handle, temporary = _create_temporary(target)
+    try:
+        if mode is not None:
+            os.chmod(temporary, mode)
+        with io.open(handle, 'wb') as temporary_file:
+            temporary_file.write(text)
+            temporary_file.flush()
+            os.fsync(temporary_file.fileno())
+        if hasattr(os, 'replace'):
+            os.replace(temporary, target)
+        else:
+            os.rename(temporary, target)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+# plug-ins without `load` store values in the shared element tree,
+# plug-ins without `dump` print to the process wide `sys.stdout`
+_PLUGIN_HOOK_LOCK = threading.Lock()
+
+def read_loader(read):
+    """
+    Return a `load` function for file types that only provide `read`.
+
+    `read` populates the element tree, as before file types could return
+    values. It runs under a lock with all option values reset to None,
+    the values it sets are collected and the previous ones restored.
+
+    Parameters
+    ----------
+    read: Callable[[Optional[Config], pathlib.Path, Dict], None]
+        `read` function of the file type, called without config
+
+    Returns
+    -------
+    Callable[[Config, pathlib.Path, Dict], Dict[Tuple[str, str], Any]]
+        function returning values keyed on (section, key)
+    """
+    def load(_, path, elements):
+        """Return values `read` finds in the file at `path`."""
+        options = []
+        for name, element in elements.items():
+            if isinstance(element, Section):
+                options.extend(
+                    ((name, key), option)
+                    for key, option in element.get_elements().items()
+                    if not isinstance(option, Section))
+            else:
+                options.append(((None, name), element))
+        with _PLUGIN_HOOK_LOCK:
+            previous = [option.get_value() for _, option in options]
+            for _, option in options:
+                option._value = None # pylint: disable=protected-access
+            try:
+                read(None, path, elements)
+                return dict(
+                    (location, option.get_value())
+                    for location, option in options
+                    if option.get_value() is not None)
+            finally:
+                for (_, option), value in zip(options, previous):
+                    option._value = value # pylint: disable=protected-access
+    return load
+
+def write_dumper(write):
+    """
+    Return a `dump` function for file types that only provide `write`.
+
+    `write` prints the file, its output is captured (under a lock,
+    `sys.stdout` is process wide) and written with `write_atomic`.
+
+    Parameters
+    ----------
+    write: Callable[[Config, Dict, Optional[str]], None]
+        `write` function of the file type
+
+    Returns
+    -------
+    Callable[[Config, Dict, Optional[str], Any], None]
+        function writing to a stream or path
+    """
+    def dump(config, elements, doc, target):
+        """Write the output of `write` to `target`."""
+        output = StringIO()
+        with _PLUGIN_HOOK_LOCK:
+            stdout = sys.stdout
+            sys.stdout = output
+            try:
+                write(config, elements, doc)
+            finally:
+                sys.stdout = stdout
+        write_atomic(target, output.getvalue())
+    return dump
 
 class MappingMixin(object):
 
-    """Methods for emulating a mapping type."""
+    """
+    Methods for emulating a mapping type.
 
-    def __getattr__(self, key):
+    Values are looked up through `_get_item` and stored through
+    `_set_item`, which by default delegate to the elements themselves.
+    Classes provide attribute access themselves, either with
+    `__getattr__` or with the accessors `ConfigMeta` generates.
+    """
+
+    def _get_item(self, key):
         if isinstance(self._elements[key], MappingMixin):
             return self._elements[key]
         return self._elements[key].get_value()
 
+    def _set_item(self, key, value):
+        self._elements[key].set_value(value)
+
     def __setattr__(self, key, value):
-        if key in self.__dict__:
-            self.__dict__[key] = value
-        elif self._elements is None or key not in self._elements:
-            self.__dict__[key] = value
+        if self._elements is not None and key in self._elements:
+            self._set_item(key, value)
         else:
-            self._elements[key].set_value(value)
+            # sections keep their element state in slots
+            object.__setattr__(self, key, value)
 
     def __len__(self):
         return len(self._elements)
 
     def __getitem__(self, key):
-        if isinstance(self._elements[key], MappingMixin):
-            return self._elements[key]
-        return self._elements[key].get_value()
+        return self._get_item(key)
 
     def __setitem__(self, key, value):
         if key not in self._elements:
             raise AttributeError(
                 'no field with name {}'.format(key))
-        self._elements[key].set_value(value)
+        self._set_item(key, value)
 
     def __iter__(self):
         return iter(self._elements)
@@ -170,10 +683,7 @@ class MappingMixin(object):
         """Get items without risking a KeyError."""
         if key not in self._elements:
             return default
-        else:
-            if isinstance(self._elements[key], MappingMixin):
-                return self._elements[key]
-            return self._elements[key].get_value()
+        return self._get_item(key)
 
     def update(self, *args, **kwargs):
         """Update more than one key at a time."""
@@ -181,6 +691,9 @@ class MappingMixin(object):
         # self._elements.update(*args, **kwargs)
         raise NotImplementedError
 
+# creation index of the next config element
+_CREATION_COUNTER = count()
+
 class ConfigElement(object):
 
     """
@@ -218,17 +731,30 @@ class ConfigElement(object):
     action: str
         action for argparse
 
+    Notes
+    -----
+    Elements use `__slots__`, large schemas hold tens of thousands of
+    them. Subclasses that do not define `__slots__` get an instance
+    dictionary as usual.
+
     Examples
     --------
     ..doctest::
 
         >>> TODO
     """
-    creation_counter = 0
-    element_name = None
+    __slots__ = (
+        'creation_counter',
+        'element_name',
+        'doc',
+        '_default',
+        '_value',
+        'required',
+        '_short_name',
+        '_long_name',
+        '_validate')
     type_ = string_types[0]
     action = 'store'
-    _value = None
 
     def __init__(
             self,
@@ -239,8 +765,8 @@ class ConfigElement(object):
             long_name=None,
             validate=None):
         # Store the creation index in the instance "creation_counter"
-        self.creation_counter = ConfigElement.creation_counter
-        ConfigElement.creation_counter += 1
+        self.creation_counter = next(_CREATION_COUNTER)
+        self.element_name = None
         self.doc = doc
         self._default = default
         self._value = default
@@ -275,6 +801,47 @@ class ConfigElement(object):
         self.validate(value)
         self._value = value
 
+    def merge_value(self, current, value):
+        """
+        Combine a newly found value with the current one.
+
+        Parameters
+        ----------
+        current: Any
+            value found so far
+        value: Any
+            validated value from a configuration location with higher
+            priority
+
+        Returns
+        -------
+        Any
+            new value, `value` overwrites `current` by default
+        """
+        # pylint: disable=unused-argument,no-self-use
+        return value
+
+    def get_cli_names(self):
+        """
+        Return command line option strings and argparse destination.
+
+        Returns
+        -------
+        Tuple[Tuple[str], str]
+            option strings and the key this element ends up under in the
+            parsed arguments
+        """
+        name = []
+        if self._short_name is not None:
+            name.append(self._short_name)
+        if self._long_name is not None:
+            name.append(self._long_name)
+            dest = self._long_name[2:]
+        else:
+            name.append("--{}".format(self.element_name))
+            dest = self.element_name
+        return tuple(name), dest
+
     def construct_parser(self, parser):
         """
         Add self to parser.
@@ -298,13 +865,7 @@ class ConfigElement(object):
 
             >>> TODO
         """
-        name = []
-        if self._short_name is not None:
-            name.append(self._short_name)
-        if self._long_name is not None:
-            name.append(self._long_name)
-        else:
-            name.append("--{}".format(self.element_name))
+        name, dest = self.get_cli_names()
         type_ = self.type_ if self.action == 'store' else self.subtype
         # argparse attempts to convert, which does not end well with
         # python2 basestr
@@ -313,6 +874,7 @@ class ConfigElement(object):
         parser.add_argument(
             *name,
             action=self.action,
+            dest=dest,
             #nargs=1,
             default=None,
             type=type_,
@@ -433,12 +995,21 @@ class StringListOption(ConfigElement):
         additional validation function, defaults to None
     additive: bool, optional
         whether to add all found lists together instead of overwrite
-        them, defaults to False
+        them, defaults to False. Items that are already present are
+        skipped, in time linear in the length of both lists
+    compact: bool, optional
+        store values as `CompactList` (an `array.array`) instead of a
+        list, only for integer, float and boolean items. Saves memory
+        for large lists, and values that are already compact need no
+        validation per item. Integers must fit in 64 bits, floats are
+        stored in double precision. Defaults to False
 
     Raises
     ------
     InvalidData:
         if default value does not pass validation
+    ValueError:
+        if `compact` is set for a list of items that can not be compact
 
     Attributes
     ----------
@@ -460,6 +1031,7 @@ class StringListOption(ConfigElement):
         >>> TODO
     """
 
+    __slots__ = ('_additive', '_index', 'compact')
     type_ = list
     subtype = string_types[0]
     action = 'append'
@@ -472,7 +1044,13 @@ class StringListOption(ConfigElement):
             short_name=None,
             long_name=None,
             validate=None,
-            additive=False):
+            additive=False,
+            compact=False):
+        if compact and self.subtype not in COMPACT_TYPES:
+            raise ValueError(
+                'compact storage is not available for {} items'.format(
+                    self.subtype))
+        self.compact = compact
         ConfigElement.__init__(
             self,
             doc=doc,
@@ -482,29 +1060,97 @@ class StringListOption(ConfigElement):
             long_name=long_name,
             validate=validate)
         self._additive = additive
+        # occurrences per item of _value, built when first needed
+        self._index = None
+        if compact and default is not None:
+            self._default = self._value = self.to_compact(default)
+
+    def to_compact(self, items):
+        """
+        Return `items` as `CompactList`, converted in a single pass.
+
+        Parameters
+        ----------
+        items: Iterable
+            integers, floats or booleans, depending on `subtype`
 
-    def _merge_value(self, value):
+        Raises
+        ------
+        InvalidData:
+            if an item does not fit in the compact representation
+
+        Returns
+        -------
+        CompactList
+        """
+        typecode, compact_type = COMPACT_TYPES[self.subtype]
+        try:
+            return compact_type(typecode, items)
+        except (TypeError, OverflowError) as error:
+            raise InvalidData('can not store compact: {}'.format(error))
+
+    def merge_value(self, current, value):
+        if self.compact and value is not None and not isinstance(
+                value, array.array):
+            value = self.to_compact(value)
+        if not self._additive or current is None or value is None:
+            return value
+        if current is self._value:
+            index = self._get_index()
+            index = None if index is None else set(index)
+        else:
+            try:
+                index = set(current)
+            except TypeError:
+                index = None
+        result = copy_value(current)
+        if index is None:
+            # unhashable items, scan the list
+            for item in value:
+                if item not in result:
+                    result.append(item)
+            return result
         for item in value:
-            if item not in self._value:
-                self._value.append(item)
+            if item not in index:
+                index.add(item)
+                result.append(item)
+        return result
 
     def set_value(self, value):
         self.validate(value)
-        if self._additive and self._value is not None and value is not None:
-            self._merge_value(value)
-        else:
-            self._value = value
+        self._value = self.merge_value(self._value, value)
+        self._index = None
 
     def extract_data_from_parser(self, command_line_arguments):
-        print(command_line_arguments)
         name = self.element_name if self._long_name is None else self._long_name[2:]
         if command_line_arguments[name] is None:
             return
         self.validate(command_line_arguments[name])
-        if self._additive and self._value is not None:
-            self._merge_value(command_line_arguments[name])
-        else:
-            self._value = command_line_arguments[name]
+        self._value = self.merge_value(
+            self._value, command_line_arguments[name])
+        self._index = None
+
+    def _get_index(self):
+        """Return occurrences per item of value, None if unhashable."""
+        if self._index is None and self._value is not None:
+            try:
+                self._index = collections.Counter(self._value)
+            except TypeError:
+                pass
+        return self._index
+
+    def _index_add(self, items):
+        if self._index is not None:
+            try:
+                self._index.update(items)
+            except TypeError:
+                self._index = None
+
+    def _index_remove(self, item):
+        if self._index is not None:
+            self._index[item] -= 1
+            if self._index[item] <= 0:
+                del self._index[item]
 
     def _validate_item(self, value):
         if not isinstance(value, self.subtype):
@@ -514,11 +1160,18 @@ class StringListOption(ConfigElement):
     def validate(self, value):
         if value is None:
             return
-        if not isinstance(value, self.type_):
+        if self.compact and isinstance(value, array.array):
+            # compact lists hold items of the right type by construction
+            typecode, compact_type = COMPACT_TYPES[self.subtype]
+            if type(value) is not compact_type or value.typecode != typecode:
+                raise InvalidData('expected a compact list of {}, not {}'.format(
+                    self.subtype, value))
+        elif not isinstance(value, self.type_):
             raise InvalidData('expected a {}, not {}'.format(
                 self.type_, value))
-        for item in value:
-            self._validate_item(item)
+        elif not all(map(isinstance, value, repeat(self.subtype))):
+            for item in value:
+                self._validate_item(item)
         if self._validate is not None:
             self._validate(value)
 
@@ -526,10 +1179,17 @@ class StringListOption(ConfigElement):
         """Append value to option."""
         self._validate_item(value)
         self._value.append(value)
+        self._index_add((value,))
 
     def count(self, value):
         """Count occurrence of value."""
-        return self._value.count(value)
+        index = self._get_index()
+        if index is None:
+            return self._value.count(value)
+        try:
+            return index[value]
+        except TypeError:
+            return self._value.count(value)
 
     def index(self, value):
         """Return index of first occurrence of value."""
@@ -539,19 +1199,24 @@ class StringListOption(ConfigElement):
         """Extend value of option with extension."""
         self.validate(extension)
         self._value.extend(extension)
+        self._index_add(extension)
 
     def insert(self, index, value):
         """Insert value at index."""
         self._validate_item(value)
         self._value.insert(index, value)
+        self._index_add((value,))
 
     def pop(self, index=-1):
         """Remove and return value at index."""
-        return self._value.pop(index)
+        value = self._value.pop(index)
+        self._index_remove(value)
+        return value
 
     def remove(self, value):
         """Remove value."""
         self._value.remove(value)
+        self._index_remove(value)
 
     def reverse(self):
         """Reverse list in place."""
@@ -570,6 +1235,7 @@ class StringListOption(ConfigElement):
     def __iadd__(self, other):
         self.validate(other)
         self._value += other
+        self._index_add(other)
         return self
 
     def __mul__(self, other):
@@ -580,10 +1246,17 @@ class StringListOption(ConfigElement):
 
     def __imul__(self, other):
         self._value *= other
+        self._index = None
         return self
 
     def __contains__(self, value):
-        return value in self._value
+        index = self._get_index()
+        if index is None:
+            return value in self._value
+        try:
+            return value in index
+        except TypeError:
+            return value in self._value
 
     def __iter__(self):
         return iter(self._value)
@@ -594,11 +1267,20 @@ class StringListOption(ConfigElement):
     def __setitem__(self, index, value):
         if isinstance(index, int):
             self._validate_item(value)
+            old_value = self._value[index]
+            self._value[index] = value
+            self._index_remove(old_value)
+            self._index_add((value,))
         else:
             self.validate(value)
-        self._value[index] = value
+            self._value[index] = value
+            self._index = None
 
     def __delitem__(self, index):
+        if isinstance(index, int):
+            self._index_remove(self._value[index])
+        else:
+            self._index = None
         del self._value[index]
 
     def __len__(self):
@@ -611,18 +1293,21 @@ class IntegerListOption(StringListOption):
 
     """List configuration element with integer content."""
 
+    __slots__ = ()
     subtype = int
 
 class FloatListOption(StringListOption):
 
     """List configuration element with float content."""
 
+    __slots__ = ()
     subtype = float
 
 class BooleanListOption(StringListOption):
 
     """List configuration element with boolean content."""
 
+    __slots__ = ()
     subtype = bool
 
 class Section(with_metaclass(ConfigMeta, ConfigElement, MappingMixin)):
@@ -680,6 +1365,9 @@ class Section(with_metaclass(ConfigMeta, ConfigElement, MappingMixin)):
             required=required,
             validate=validate)
 
+    def __getattr__(self, key):
+        return self._get_item(key)
+
     def has_default(self):
         """Return True because Section always has a default value."""
         return True
@@ -700,53 +1388,189 @@ class Section(with_metaclass(ConfigMeta, ConfigElement, MappingMixin)):
         raise NotImplementedError
 
     def construct_parser(self, parser):
-        for element in self._elements:
-            self._elements[element].construct_parser(parser)
+        for entry in self._schema:
+            entry.element.construct_parser(parser)
 
     def extract_data_from_parser(self, command_line_arguments):
-        for element in self._elements:
-            self._elements[element].extract_data_from_parser(
-                command_line_arguments)
+        for entry in self._schema:
+            entry.element.extract_data_from_parser(command_line_arguments)
 
     def validate(self, value):
         pass
 
     def validate_data(self):
         self.incomplete_count = 0
-        for element in self._elements:
+        for entry in self._schema:
             try:
-                self._elements[element].validate_data()
+                entry.element.validate_data()
             except MissingData:
-                print(self.required)
                 if not self.required:
                     self.incomplete_count += 1
                 else:
                     raise
 
+class BoundSection(MappingMixin):
+
+    """
+    Values of one section of a `Config` instance.
+
+    Sections are shared by all instances of a `Config` class, their
+    values are not. A bound section reads and writes the value slots
+    of the config instance it belongs to. `ConfigMeta` generates a
+    subclass per section with a property for every option.
+
+    Parameters
+    ----------
+    config: Config
+        instance that holds the values
+    name: str
+        section name
+
+    Examples
+    --------
+    ..doctest::
+
+        >>> TODO
+    """
+
+    def __init__(self, config, name):
+        section = config.get_elements()[name]
+        self.__dict__['_config'] = config
+        self.__dict__['_name'] = name
+        self.__dict__['_section'] = section
+        self.__dict__['_elements'] = section.get_elements()
+        self.__dict__['_slots'] = config._section_positions.get(name, {})
+        self.__dict__['_values'] = config._values
+
+    def _get_item(self, key):
+        return self._values[self._slots[key]]
+
+    def _set_item(self, key, value):
+        # pylint: disable=protected-access
+        self._config._set_slot(self._slots[key], value)
+
+    @property
+    def doc(self):
+        """Section documentation."""
+        return self._section.doc
+
+    @property
+    def required(self):
+        """MUST section be present?"""
+        return self._section.required
+
+    @property
+    def incomplete_count(self):
+        """Number of required elements without a value."""
+        # pylint: disable=protected-access
+        return self._config._incomplete.get(self._name, 0)
+
+    def get_elements(self):
+        """Return raw element tree, use with caution."""
+        return self._elements
+
+    def get_value(self):
+        """Return current content value."""
+        result = {}
+        for key in self._elements:
+            result[key] = self._get_item(key)
+        return result
+
 class StringOption(ConfigElement):
 
     """Configuration element with string value."""
 
+    __slots__ = ()
     type_ = string_types[0]
 
 class IntegerOption(ConfigElement):
 
     """Configuration element with integer value."""
 
+    __slots__ = ()
     type_ = int
 
 class FloatOption(ConfigElement):
 
     """Configuration element with float value."""
 
+    __slots__ = ()
     type_ = float
 
 class BooleanOption(ConfigElement):
 
     """Configuration element with boolean value."""
 
+    __slots__ = ()
     type_ = bool
 
+# element class per type name in generated schemas, see `Config.from_schema`
+ELEMENT_TYPES = {
+    'section': Section,
+    'string': StringOption,
+    'integer': IntegerOption,
+    'float': FloatOption,
+    'boolean': BooleanOption,
+    'string_list': StringListOption,
+    'integer_list': IntegerListOption,
+    'float_list': FloatListOption,
+    'boolean_list': BooleanListOption}
+
+ELEMENT_NAME = re.compile(r'[A-Za-z][A-Za-z0-9_]*\Z')
+
+def compile_elements(schema, path=()):
+    """
+    Create elements described by `schema`, in a single pass.
+
+    Elements are created in the order of `schema`, so the order of their
+    `creation_counter` is the order of the description. Every section
+    gets its own `Section` subclass.
+
+    Parameters
+    ----------
+    schema: Dict[str, Dict[str, Any]]
+        description per element name, see `Config.from_schema`
+    path: Tuple[str], optional
+        names of the enclosing sections, for error messages
+
+    Raises
+    ------
+    InvalidConfigTree:
+        if an element name is not a public python identifier, or an
+        element has an unknown type or invalid arguments
+
+    Returns
+    -------
+    collections.OrderedDict
+        element per name
+    """
+    elements = collections.OrderedDict()
+    for name, description in schema.items():
+        arguments = dict(description)
+        location = '.'.join(path + (name,))
+        # names become attributes, snapshot fields and argparse dests
+        if not ELEMENT_NAME.match(name) or keyword.iskeyword(name):
+            raise InvalidConfigTree(
+                'invalid element name {!r} for {}, use a python identifier '
+                'not starting with an underscore'.format(name, location))
+        type_name = arguments.pop('type', None)
+        element_type = ELEMENT_TYPES.get(type_name)
+        if element_type is None:
+            raise InvalidConfigTree(
+                'unknown type {!r} for {}'.format(type_name, location))
+        if element_type is Section:
+            attributes = compile_elements(
+                arguments.pop('options', {}), path + (name,))
+            attributes['__doc__'] = arguments.pop('doc', None)
+            element_type = type(Section)(
+                '{}Section'.format(name), (Section,), attributes)
+        try:
+            elements[name] = element_type(**arguments)
+        except TypeError as error:
+            raise InvalidConfigTree('invalid options for {}: {}'.format(
+                location, error))
+    return elements
+
 class InvalidConfigTree(Exception):
 
     """Inappropriate configuration tree for file type."""
@@ -759,6 +1583,9 @@ class MissingData(Exception):
 
     """An element marked as required is missing a value."""
 
+# option strings argparse adds to every configuration parser
+_BUILTIN_CLI_OPTIONS = frozenset(['-h', '--help', '--generate-config'])
+
 class Config(with_metaclass(ConfigMeta, MappingMixin)):
 
     """
@@ -773,14 +1600,25 @@ class Config(with_metaclass(ConfigMeta, MappingMixin)):
     user_path: pathlib.Path, optional
         overwrite system user configuration path, defaults to None
     cli: bool, optional
-        whether to parse commandline arguments, defaults to True
+        whether to parse commandline arguments, defaults to True. The
+        command line parser is only used if the arguments contain at
+        least one of our options, other arguments are ignored in that
+        case. It is built once per class and shared by all instances.
+    sources: List[user_config.sources.Source], optional
+        sources of values in order of priority, defaults to None:
+        `get_sources()`, which uses the arguments above. Values of all
+        sources are merged once, at the end
+    profile: user_config.profile.ConfigProfile, optional
+        record the duration of every phase of loading, the files read
+        and the time spent in every validator, defaults to None
+
+    Instances can be created concurrently from multiple threads, reads
+    of the same file are shared. Use `load_async` in asyncio code.
 
     Raises
     ------
     AttributeError:
         if `application` or `author` is not set
-    InvalidConfigTree:
-        if configuration tree is inappropriate for `file_type`
     InvalidData:
         if user supplied invalid data for a configuration element
     MissingData:
@@ -797,6 +1635,25 @@ class Config(with_metaclass(ConfigMeta, MappingMixin)):
     version: str, optional
         application version (set if your configuration is version
         dependent)
+    schema_fingerprint: str
+        stable hash of the element tree, set by `ConfigMeta`. Changes
+        whenever a change to the class could make stored values invalid
+    compiled_cache: Union[bool, pathlib.Path], optional
+        keep validated values of configuration files in binary form in
+        this directory (True: the user cache directory), and load them
+        instead of parsing files that did not change. Defaults to None:
+        always parse
+    lazy_sections: str, optional
+        read sections of configuration files when they are first
+        accessed, instead of at load time. 'optional': only sections
+        that are not required, required ones are still checked at load
+        time. 'all': all sections, required values of sections that are
+        never accessed are only checked by `validate_data()`, whether
+        or not a file contains the section. Needs a
+        file type with an `index` function. Ignored when
+        `compiled_cache` is set: files are read as a whole, to store
+        them in the cache. Defaults to None: read everything at load
+        time
 
     Examples
     --------
@@ -809,67 +1666,888 @@ class Config(with_metaclass(ConfigMeta, MappingMixin)):
     application = None
     author = None
     version = None
+    compiled_cache = None
+    lazy_sections = None
+    _profile = None
 
     def __init__(
             self,
             file_name="config",
             global_path=None,
             user_path=None,
-            cli=True):
-        if self.application is None:
-            raise AttributeError(
-                'application not set, please provide an application name')
-        if self.author is None:
-            raise AttributeError(
-                'author not set, please provide an application author')
-        # validate _elements
-        self._validate(self._elements)
-        # read global config
+            cli=True,
+            sources=None,
+            profile=None):
+        if profile is not None:
+            self._profile = profile
+            profile.start()
+        if sources is None:
+            with self._phase('sources'):
+                sources = self.get_sources(
+                    file_name, global_path, user_path, cli)
+        self._initialize(sources)
+
+    @classmethod
+    def load_async(
+            cls,
+            file_name="config",
+            global_path=None,
+            user_path=None,
+            cli=True,
+            sources=None,
+            executor=None,
+            profile=None):
+        """
+        Create an instance without blocking the running event loop.
+
+        Sources that read files are resolved concurrently in `executor`,
+        concurrent loads of the same file share a single read. The
+        remaining work (other sources, merging, checking required values)
+        runs on the loop.
+
+        Services should normally pass `cli=False`: the command line of
+        the process is parsed on every load, and `--help` or
+        `--generate-config` exit the process from the loop.
+
+        Parameters
+        ----------
+        file_name: str, optional
+            name of the configuration file, defaults to config
+        global_path: pathlib.Path, optional
+            overwrite system global configuration path, defaults to None
+        user_path: pathlib.Path, optional
+            overwrite system user configuration path, defaults to None
+        cli: bool, optional
+            whether to parse commandline arguments, defaults to True
+        sources: List[user_config.sources.Source], optional
+            sources to load, defaults to None: `get_sources()`
+        executor: concurrent.futures.Executor, optional
+            executor to read files in, defaults to None: the loop's
+            default executor
+        profile: user_config.profile.ConfigProfile, optional
+            record the duration of every phase, defaults to None
+
+        Raises
+        ------
+        AttributeError:
+            if `application` or `author` is not set
+        InvalidData:
+            if user supplied invalid data for a configuration element
+        MissingData:
+            if an element marked as required has no value
+
+        Returns
+        -------
+        asyncio.Future
+            resolves to the validated instance
+
+        Examples
+        --------
+        ..doctest::
+
+            >>> config = await MyConfig.load_async(cli=False) # doctest: +SKIP
+        """
+        import asyncio
+        config = cls.__new__(cls)
+        if profile is not None:
+            config._profile = profile
+            profile.start()
+        if sources is None:
+            with config._phase('sources'):
+                sources = config.get_sources(
+                    file_name, global_path, user_path, cli)
+        loop = asyncio.get_event_loop()
+        reads = asyncio.gather(*[
+            loop.run_in_executor(executor, config._source_layers, source)
+            for source in sources if source.blocking])
+        result = loop.create_future()
+
+        def initialize(reads):
+            """Finish the instance once all files are read."""
+            if result.cancelled():
+                return
+            if reads.cancelled():
+                result.cancel()
+            elif reads.exception() is not None:
+                result.set_exception(reads.exception())
+            else:
+                read_layers = iter(reads.result())
+                try:
+                    config._initialize(sources, [
+                        next(read_layers) if source.blocking else None
+                        for source in sources])
+                except Exception as error: # pylint: disable=broad-except
+                    result.set_exception(error)
+                else:
+                    result.set_result(config)
+        reads.add_done_callback(initialize)
+        return result
+
+    @classmethod
+    def from_schema(cls, schema, name='GeneratedConfig', **attributes):
+        """
+        Create a subclass from a description of its elements.
+
+        Elements are created in a single pass, in the order of `schema`.
+        JSON objects keep their order as well.
+
+        Parameters
+        ----------
+        schema: Union[Dict[str, Dict[str, Any]], str]
+            description per element name, or the same as a JSON string.
+            Every description has a `type` (see `ELEMENT_TYPES`), other
+            keys are passed to the element: `doc`, `default`, `required`,
+            `short_name`, `long_name`, `validate`, `additive` and
+            `compact`. Sections take `doc`, `required` and `validate`,
+            and describe their elements in `options`. Element names are
+            attribute names, so they must be python identifiers, give
+            hyphenated command line options as `long_name`
+        name: str, optional
+            class name, defaults to GeneratedConfig
+        **attributes:
+            other class attributes, such as `application`, `author` and
+            `file_type`
+
+        Raises
+        ------
+        AttributeError:
+            if `attributes` overwrite a reserved attribute
+        InvalidConfigTree:
+            if an element name is not an identifier, an element has an
+            unknown type or invalid arguments, or the tree is
+            inappropriate for `file_type`
+        ValueError:
+            if `schema` is not valid JSON
+
+        Returns
+        -------
+        type
+            subclass of this class
+
+        Examples
+        --------
+        ..doctest::
+
+            >>> MyConfig = Config.from_schema({
+            ...     'general': {'type': 'section', 'options': {
+            ...         'name': {'type': 'string', 'default': 'nobody'}}}},
+            ...     application='my_app', author='me') # doctest: +SKIP
+        """
+        if isinstance(schema, string_types):
+            schema = json.loads(
+                schema, object_pairs_hook=collections.OrderedDict)
+        class_attributes = compile_elements(schema)
+        class_attributes.update(attributes)
+        return type(cls)(name, (cls,), class_attributes)
+
+    def get_sources(self, file_name, global_path, user_path, cli):
+        """
+        Return sources of configuration values, in order of priority.
+
+        Defaults to the global and the user configuration file, followed
+        by command line arguments. Override to add sources, such as
+        environment variables or drop-in directories.
+
+        Parameters
+        ----------
+        file_name: str
+            name of the configuration file
+        global_path: pathlib.Path
+            overwrite system global configuration path, or None
+        user_path: pathlib.Path
+            overwrite system user configuration path, or None
+        cli: bool
+            whether to parse commandline arguments
+
+        Raises
+        ------
+        AttributeError:
+            if `application` or `author` is not set
+
+        Returns
+        -------
+        List[user_config.sources.Source]
+
+        Examples
+        --------
+        ..doctest::
+
+            >>> class MyConfig(Config): # doctest: +SKIP
+            ...     # elements and attributes go here
+            ...     def get_sources(self, file_name, global_path,
+            ...                     user_path, cli):
+            ...         # command line arguments keep the last word
+            ...         sources = Config.get_sources(
+            ...             self, file_name, global_path, user_path, False)
+            ...         sources.append(EnvironmentSource())
+            ...         if cli:
+            ...             sources.append(CommandLineSource())
+            ...         return sources
+        """
+        global_path, user_path = self._resolve_paths(
+            file_name, global_path, user_path)
+        sources = [FileSource(global_path, 'global'), FileSource(
+            user_path, 'user')]
+        if cli:
+            sources.append(CommandLineSource())
+        return sources
+
+    def _resolve_paths(self, file_name, global_path, user_path):
+        """Return paths of the global and user configuration file."""
+        self._check_attributes()
         if global_path is None or user_path is None:
             paths = AppDirs(self.application, self.author, self.version)
         if global_path is None:
             global_path = Path(paths.site_config_dir)
         global_path = global_path.joinpath(
             "{}.{}".format(file_name, self._extension))
-        if global_path.is_file():
-            self._read(global_path, self._elements)
-        # read user config
         if user_path is None:
             user_path = Path(paths.user_config_dir)
         user_path = user_path.joinpath(
             "{}.{}".format(file_name, self._extension))
-        if user_path.is_file():
-            self._read(user_path, self._elements)
-        if cli:
-            # construct a commandline parser
-            parser = argparse.ArgumentParser(
-                prog=self.application,
-                description="{}\n\n{}\n{}\n{}".format(
-                    self.__doc__,
-                    "Command line arguments overwrite configuration found in:",
-                    user_path,
-                    global_path))
-            parser.add_argument(
-                '--generate-config',
-                action='store_const',
-                const=True,
-                default=False,
-                required=False,
-                help="print a complete configuration file with current settings")
-            for element in self._elements:
-                self._elements[element].construct_parser(parser)
-            command_line_arguments = vars(parser.parse_args())
-
-            # check if we should print a configuration file
-            if command_line_arguments['generate_config']:
-                self._write(self._elements, self.__doc__)
-                sys.exit(False)
-
-            # fetch command line argument data
-            for element in self._elements:
-                self._elements[element].extract_data_from_parser(
-                    command_line_arguments)
-
-        # validate _data
-        for element in self._elements:
-            self._elements[element].validate_data()
+        return global_path, user_path
+
+    @classmethod
+    def _check_attributes(cls):
+        """Raise AttributeError if `application` or `author` is not set."""
+        if cls.application is None:
+            raise AttributeError(
+                'application not set, please provide an application name')
+        if cls.author is None:
+            raise AttributeError(
+                'author not set, please provide an application author')
+
+    def _read_layer(self, name, path):
+        """Read the file at `path`, sharing concurrent reads."""
+        return Layer(name, path, _FILE_READS.call(
+            (type(self), path), self._load_file, path))
+
+    def _create_layer(self, name, path, values):
+        """Validate values keyed on (section, key), return them as layer."""
+        return Layer(name, path, self._to_slots(
+            values, profile=self._profile))
+
+    def _phase(self, name, **details):
+        """Return context manager recording phase `name`, if profiled."""
+        if self._profile is None:
+            return NULL_PHASE
+        return self._profile.phase(name, **details)
+
+    def _source_layers(self, source):
+        """Return layers of `source`."""
+        with self._phase('source', source=type(source).__name__):
+            return source.layers(self)
+
+    def _initialize(self, sources, layers=None):
+        """
+        Load values from `sources` and validate them.
+
+        `layers` holds already resolved layers per source, or None for
+        sources that still have to be resolved.
+        """
+        self._check_attributes()
+        self._initialize_state([])
+        self._sources = sources
+        for position, source in enumerate(sources):
+            if layers is None or layers[position] is None:
+                source_layers = self._source_layers(source)
+            else:
+                source_layers = layers[position]
+            self._layers.extend(source_layers)
+            self._layer_counts.append(len(source_layers))
+        with self._phase('merge'):
+            self._values = self._merge_layers(self._layers)
+        self._pending = set(
+            section for layer in self._layers
+            if isinstance(layer.values, LazyValues)
+            for section in layer.values.pending)
+        if self.lazy_sections == 'all' and self._reads_lazily():
+            # also sections no file has, their required values are
+            # checked on first access as well
+            self._pending.update(self._bound_types)
+        with self._phase('finish'):
+            for source in sources:
+                source.finish(self)
+        with self._phase('check'):
+            self._incomplete = self._check_values(
+                self._values, self._pending)
+        if self._profile is not None:
+            self._profile.finish()
+
+    def _initialize_state(self, layers):
+        """Set up empty per-instance state."""
+        self._incomplete = {}
+        self._bound_sections = {}
+        self._overrides = {}
+        self._subscribers = []
+        self._sources = []
+        self._layers = layers
+        # number of layers per source, in order
+        self._layer_counts = []
+        # sections with values in layers that are not read yet
+        self._pending = set()
+
+    @classmethod
+    def _from_values(cls, values, incomplete):
+        """Create an instance from validated slot values, without files."""
+        config = cls.__new__(cls)
+        config._initialize_state([])
+        config._values = values
+        config._incomplete = incomplete
+        return config
+
+    @classmethod
+    def _has_cli_arguments(cls, arguments):
+        """
+        Return True if `arguments` contain any of our options.
+
+        Handles `--option=value`, argparse's abbreviated long options and
+        short options with attached values. Arguments after `--` are
+        ignored.
+        """
+        options = cls._cli_options.union(_BUILTIN_CLI_OPTIONS)
+        for argument in arguments:
+            if argument == '--':
+                return False
+            if not argument.startswith('-') or argument == '-':
+                continue
+            if argument in options:
+                return True
+            if argument.startswith('--'):
+                argument = argument.split('=', 1)[0]
+                if any(option.startswith(argument) for option in options):
+                    return True
+            elif argument[:2] in options:
+                return True
+        return False
+
+    @staticmethod
+    def _wants_help(arguments):
+        """Return True if `arguments` ask for help."""
+        for argument in arguments:
+            if argument == '--':
+                return False
+            if argument == '-h' or (
+                    argument.startswith('--h') and '--help'.startswith(argument)):
+                return True
+        return False
+
+    @classmethod
+    def _get_parser(cls):
+        """Return command line parser for this class, built only once."""
+        parser = cls.__dict__.get('_parser')
+        if parser is None:
+            parser = cls._build_parser([])
+            cls._parser = parser
+        return parser
+
+    @classmethod
+    def _build_parser(cls, paths):
+        """Construct command line parser, mentioning configuration `paths`."""
+        if not paths:
+            description = cls.__doc__
+        else:
+            description = "{}\n\n{}\n{}".format(
+                cls.__doc__,
+                "Command line arguments overwrite configuration found in:",
+                "\n".join(str(path) for path in reversed(paths)))
+        parser = argparse.ArgumentParser(
+            prog=cls.application, description=description)
+        parser.add_argument(
+            '--generate-config',
+            action='store_const',
+            const=True,
+            default=False,
+            required=False,
+            help="print a complete configuration file with current settings")
+        for entry in cls._schema:
+            entry.element.construct_parser(parser)
+        return parser
+
+    @classmethod
+    def _reads_lazily(cls):
+        """Return True if `lazy_sections` applies to files."""
+        # the compiled cache stores complete files
+        return bool(cls.lazy_sections) and cls._index is not None and \
+            cls._get_compiled_cache() is None
+
+    @classmethod
+    def _get_compiled_cache(cls):
+        """Return compiled cache, or None if disabled."""
+        if not cls.compiled_cache:
+            return None
+        compiled = cls.__dict__.get('_compiled')
+        if compiled is None:
+            directory = cls.compiled_cache
+            if directory is True:
+                directory = Path(AppDirs(
+                    cls.application, cls.author, cls.version).user_cache_dir)
+            compiled = CompiledCache(directory)
+            cls._compiled = compiled
+        return compiled
+
+    def _load_file(self, path, validate=True, lazy=True):
+        """
+        Return (validated) values from file at `path`, by slot.
+
+        With `lazy_sections` set, and `lazy`, sections that may be read
+        later are returned as pending sections of `LazyValues`.
+        """
+        if self._profile is not None:
+            return self._profile.read_file(
+                self._read_file, path, validate, lazy)
+        return self._read_file(path, validate, lazy)
+
+    def _read_file(self, path, validate, lazy):
+        """Return values from file at `path`, see `_load_file`."""
+        if not path.is_file():
+            return {}
+        compiled = self._get_compiled_cache()
+        if compiled is not None:
+            result = compiled.load(path, self.schema_fingerprint)
+            if result is not None:
+                return result
+            # taken before reading, a file that changes meanwhile is stale
+            key = file_key(path)
+        if lazy and validate and self._reads_lazily():
+            file_index = self._index(path, self._elements)
+            if file_index is not None:
+                return self._index_values(file_index)
+        result = self._to_slots(
+            self._load(path, self._elements), validate, self._profile)
+        if compiled is not None and validate:
+            compiled.store(path, key, self.schema_fingerprint, dict(
+                (index, to_builtin(value)) for index, value in result.items()))
+        return result
+
+    @classmethod
+    def _to_slots(cls, values, validate=True, profile=None):
+        """
+        Return values keyed on (section, key) by slot, validated.
+
+        Validators are timed by `profile`, if any.
+        """
+        result = {}
+        positions = cls._positions
+        schema = cls._schema
+        for location, value in values.items():
+            index = positions[location]
+            if validate and profile is not None:
+                profile.validate(schema[index], value)
+            elif validate:
+                schema[index].validate(value)
+            result[index] = value
+        return result
+
+    def _index_values(self, file_index):
+        """Return `LazyValues` for an indexed file."""
+        cls = type(self)
+        # shared by instances through caches, the profile is passed in
+        load = lambda section, profile: cls._to_slots(
+            file_index.load(section), profile=profile)
+        eager = []
+        lazy = []
+        for section in file_index.sections:
+            if self.lazy_sections != 'all' and \
+                    self._elements[section].required:
+                eager.append(section)
+            else:
+                lazy.append(section)
+        values = {}
+        for section in eager:
+            values.update(load(section, self._profile))
+        return LazyValues(values, lazy, load)
+
+    def _materialize(self, section):
+        """Read pending `section` from all layers, merge and check it."""
+        with self._phase('materialize', section=section):
+            self._materialize_section(section)
+
+    def _materialize_section(self, section):
+        """Read pending `section`, see `_materialize`."""
+        layers = self._layers
+        for layer in layers:
+            if isinstance(layer.values, LazyValues):
+                layer.values.load_section(section, self._profile)
+        indexes = self._section_positions.get(section, {}).values()
+        values = self._values
+        for index in indexes:
+            values[index] = self._merge_slot(index, layers)
+        self._incomplete = self._check_slots(values, indexes, layers)
+        self._pending.discard(section)
+
+    def _materialize_all(self):
+        """Read all pending sections."""
+        for section in list(self._pending):
+            self._materialize(section)
+
+    def _apply_values(self, values, layer_values):
+        """Merge slot values of one layer into `values`."""
+        schema = self._schema
+        for index, value in layer_values.items():
+            # layers are kept around for reloading, don't share lists
+            values[index] = schema[index].element.merge_value(
+                values[index], copy_value(value))
+
+    def _merge_slot(self, index, layers):
+        """Return value of slot `index` for `layers`."""
+        if index in self._overrides:
+            return self._overrides[index]
+        value = copy_value(self._defaults[index])
+        merge_value = self._schema[index].element.merge_value
+        for layer in layers:
+            if index in layer.values:
+                value = merge_value(value, copy_value(layer.values[index]))
+        return value
+
+    def _merge_layers(self, layers):
+        """Return slot values for `layers`, in order of priority."""
+        values = list(self._defaults)
+        for index in self._copy_positions:
+            values[index] = copy_value(values[index])
+        for layer in layers:
+            self._apply_values(values, layer.values)
+        for index, value in self._overrides.items():
+            values[index] = value
+        return values
+
+    @classmethod
+    def _get_snapshot_type(cls):
+        """Return snapshot types for this class, built only once."""
+        snapshot_type = cls.__dict__.get('_snapshot_type')
+        if snapshot_type is None:
+            snapshot_type = compile_snapshot_type(cls)
+            cls._snapshot_type = snapshot_type
+        return snapshot_type
+
+    def freeze(self):
+        """
+        Return an immutable, hashable snapshot of all current values.
+
+        The snapshot is a tree of namedtuples with the same attribute
+        names as this instance, lists are stored as tuples. It never
+        changes, so threads can share it without locking. Reloads replace
+        all values in a single assignment, so a snapshot never mixes old
+        and new values. To follow reloads, take a new snapshot from a
+        `subscribe` callback and publish it with a single assignment.
+
+        Returns
+        -------
+        namedtuple
+            snapshot of all sections and options
+
+        Examples
+        --------
+        ..doctest::
+
+            >>> snapshot = config.freeze() # doctest: +SKIP
+            >>> snapshot.general.name # doctest: +SKIP
+            'value'
+        """
+        self._materialize_all()
+        snapshot_type, fields = self._get_snapshot_type()
+        values = self._values
+        result = []
+        for section_type, slots in fields:
+            if section_type is None:
+                result.append(freeze_value(values[slots]))
+            else:
+                result.append(section_type._make(
+                    freeze_value(values[index]) for index in slots))
+        return snapshot_type._make(result)
+
+    def dump(self, target):
+        """
+        Write a complete configuration file with current settings.
+
+        Parameters
+        ----------
+        target: Union[TextIO, pathlib.Path, str]
+            stream, or path to write to atomically
+
+        Raises
+        ------
+        OSError:
+            if `target` can not be written
+
+        Returns
+        -------
+        None
+        """
+        self._dump(self._elements, self.__doc__, target)
+
+    def get_paths(self):
+        """Return paths of all configuration files, in order of priority."""
+        return [layer.path for layer in self._layers if layer.path is not None]
+
+    def subscribe(self, callback):
+        """
+        Call `callback(config, changed)` after every reload.
+
+        Parameters
+        ----------
+        callback: Callable[[Config, List[Tuple[str, str]]], None]
+            called with this instance and the (section, key) pairs of all
+            values that changed
+
+        Returns
+        -------
+        None
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """Stop calling `callback` after reloads."""
+        self._subscribers.remove(callback)
+
+    def reload(self, path=None, incremental=True):
+        """
+        Re-read configuration files and publish the new values.
+
+        Only the file at `path` is read again, the other layers (including
+        command line arguments and values set at runtime) are merged in
+        their usual order of priority. Drop-in directories are listed
+        again if `path` is None, the directory or a file in it, to pick
+        up added and removed files. The new values are validated before
+        they replace the old ones in a single assignment, on failure the
+        old values stay in place.
+
+        In incremental mode the values read from a file are compared to
+        the ones read from it last time. Only values that differ are
+        validated and merged, and required values are only checked in
+        sections that contain such a value.
+
+        Parameters
+        ----------
+        path: pathlib.Path, optional
+            file or drop-in directory to re-read, defaults to None: all
+            files
+        incremental: bool, optional
+            only validate what changed, defaults to True
+
+        Raises
+        ------
+        InvalidData:
+            if validation fails
+        MissingData:
+            if a required element without value is in a required section
+
+        Returns
+        -------
+        List[Tuple[str, str]]
+            (section, key) of all values that changed
+        """
+        # compare complete layers, reloaded files are read as a whole
+        self._materialize_all()
+        layers, counts, added, touched = self._refresh_layers(path)
+        for position, layer in enumerate(layers):
+            if layer.path is None or path not in (None, layer.path) or \
+                    position in added:
+                continue
+            if not incremental:
+                layers[position] = layer._replace(
+                    values=self._load_file(layer.path, lazy=False))
+                continue
+            old_layer_values = layer.values
+            new_layer_values = self._load_file(layer.path, validate=False)
+            for index in set(old_layer_values).union(new_layer_values):
+                if index not in new_layer_values:
+                    touched.add(index)
+                elif (index not in old_layer_values or
+                      old_layer_values[index] != new_layer_values[index]):
+                    self._schema[index].validate(new_layer_values[index])
+                    touched.add(index)
+            layers[position] = layer._replace(values=new_layer_values)
+        old_values = self._values
+        if incremental:
+            values = list(old_values)
+            for index in touched:
+                values[index] = self._merge_slot(index, layers)
+            incomplete = self._check_slots(values, touched, layers)
+        else:
+            values = self._merge_layers(layers)
+            incomplete = self._check_values(values)
+            touched = range(len(values))
+        changed = [
+            (self._schema[index].section, self._schema[index].key)
+            for index in sorted(touched)
+            if values[index] != old_values[index]]
+        self._layers = layers
+        self._layer_counts = counts
+        self._replace_values(values, incomplete, changed)
+        return changed
+
+    def _refresh_layers(self, path):
+        """
+        Return layers with files added to or removed from sources.
+
+        Sources that read `path` or its directory are asked to
+        `refresh` their layers, all sources if `path` is None. Returns
+        the new layers, the number of layers per source, positions of
+        added layers and slots of all added and removed layers.
+        """
+        layers = []
+        counts = []
+        added = set()
+        touched = set()
+        start = 0
+        for source, count in zip(self._sources, self._layer_counts):
+            old_layers = self._layers[start:start + count]
+            start += count
+            new_layers = None
+            if path is None or any(
+                    source_path in (path, path.parent)
+                    for source_path in source.get_paths()):
+                new_layers = source.refresh(self, old_layers)
+            if new_layers is None:
+                new_layers = old_layers
+            kept = set(id(layer) for layer in new_layers)
+            for layer in old_layers:
+                if id(layer) not in kept:
+                    touched.update(layer.values)
+            kept = set(id(layer) for layer in old_layers)
+            for layer in new_layers:
+                if id(layer) not in kept:
+                    if isinstance(layer.values, LazyValues):
+                        for section in list(layer.values.pending):
+                            layer.values.load_section(
+                                section, self._profile)
+                    added.add(len(layers))
+                    touched.update(layer.values)
+                layers.append(layer)
+            counts.append(len(new_layers))
+        return layers, counts, added, touched
+
+    def _replace_values(self, values, incomplete, changed):
+        """Publish new slot values, call subscribers if any `changed`."""
+        self._values = values
+        for bound in self._bound_sections.values():
+            bound.__dict__['_values'] = values
+        self._incomplete = incomplete
+        if changed:
+            for callback in list(self._subscribers):
+                callback(self, changed)
+
+    def _check_slots(self, values, indexes, layers):
+        """
+        Validate changed slot values, return incomplete count per section.
+
+        Values that come straight from a layer were validated when the
+        layer was read, merged values (additive lists, fallbacks to other
+        layers) are validated here. Required values are only checked for
+        sections that contain one of `indexes`.
+        """
+        schema = self._schema
+        sections = set()
+        for index in indexes:
+            entry = schema[index]
+            sections.add(entry.section)
+            value = values[index]
+            if (value is None or
+                    index in self._overrides or
+                    value == self._defaults[index] or
+                    any(layer.values.get(index) == value for layer in layers)):
+                continue
+            entry.validate(value)
+        incomplete = dict(self._incomplete)
+        for section in sections:
+            count = 0
+            for index in self._section_positions[section].values():
+                entry = schema[index]
+                if values[index] is not None or not entry.required:
+                    continue
+                if entry.section_required:
+                    raise MissingData(
+                        'no value was provided for required option {}'.format(
+                            entry.key))
+                count += 1
+            if count:
+                incomplete[section] = count
+            else:
+                incomplete.pop(section, None)
+        return incomplete
+
+    def _get_item(self, key):
+        bound_type = self._bound_types.get(key)
+        if bound_type is None:
+            return self._values[self._positions[(None, key)]]
+        try:
+            return self._bound_sections[key]
+        except KeyError:
+            if key in self._pending:
+                self._materialize(key)
+            bound = bound_type(self, key)
+            self._bound_sections[key] = bound
+            if isinstance(getattr(type(self), key, None), SectionAccessor):
+                # later lookups are plain instance attribute loads
+                self.__dict__[key] = bound
+            return bound
+
+    def _set_item(self, key, value):
+        if key in self._bound_types:
+            self._elements[key].set_value(value)
+        else:
+            self._set_slot(self._positions[(None, key)], value)
+
+    def _set_slot(self, index, value):
+        """Validate value and merge it into slot `index`."""
+        entry = self._schema[index]
+        entry.validate(value)
+        value = entry.element.merge_value(self._values[index], value)
+        self._values[index] = value
+        # values set at runtime survive reloads
+        self._overrides[index] = value
+
+    def get_elements(self):
+        """Return raw element tree, use with caution."""
+        return self._elements
+
+    def validate_data(self):
+        """
+        Validate all values of this instance.
+
+        Sections that are not read yet (see `lazy_sections`) are read
+        first.
+
+        Raises
+        ------
+        InvalidData:
+            if validation fails
+        MissingData:
+            if a required element without value is in a required section
+
+        Returns
+        -------
+        None
+        """
+        self._materialize_all()
+        self._incomplete = self._check_values(self._values)
+
+    def _check_values(self, values, skip=()):
+        """
+        Validate slot values, return incomplete count per section.
+
+        Sections in `skip` are left out.
+        """
+        profile = self._profile
+        incomplete = {}
+        for index, entry in enumerate(self._schema):
+            if entry.section in skip:
+                continue
+            value = values[index]
+            if value is None:
+                if not entry.required:
+                    continue
+                if entry.section_required:
+                    # none of the configuration locations provided a
+                    # required value, raise an error now
+                    raise MissingData(
+                        'no value was provided for required option {}'.format(
+                            entry.key))
+                incomplete[entry.section] = incomplete.get(
+                    entry.section, 0) + 1
+            elif profile is not None:
+                profile.validate(entry, value)
+            else:
+                entry.validate(value)
+        return incomplete
@@ -0,0 +1,310 @@
+"""Caches for parsed configuration files."""
+import os
+import errno
+import hashlib
+import marshal
+import threading
+import collections
+from pathlib import Path
+
+# bump when the layout of compiled cache files changes
+COMPILED_FORMAT = 1
+
+def file_key(path, stat=None):
+    """
+    Return a cache key identifying the current state of `path`.
+
+    Parameters
+    ----------
+    path: pathlib.Path
+        file to identify
+    stat: os.stat_result, optional
+        state of `path`, such as `os.fstat` of an open file, defaults to
+        None: stat `path`
+
+    Raises
+    ------
+    OSError:
+        if `path` can not be stat'ed
+
+    Returns
+    -------
+    Tuple[str, int, int, int]
+        path, modification time in nanoseconds, size and inode
+    """
+    if stat is None:
+        stat = os.stat(str(path))
+    mtime_ns = getattr(stat, 'st_mtime_ns', None)
+    if mtime_ns is None:
+        mtime_ns = int(stat.st_mtime * 1e9)
+    return (str(path), mtime_ns, stat.st_size, stat.st_ino)
+
+class FileCache(object):
+
+    """
+    Least recently used cache of parse results, keyed on file state.
+
+    A changed modification time, size or inode is a cache miss, so
+    entries never need explicit invalidation. Cached results are shared
+    between readers and must not be modified.
+
+    Parameters
+    ----------
+    max_entries: int, optional
+        maximum number of cached files, 0 disables the cache,
+        defaults to 0
+
+    Examples
+    --------
+    ..doctest::
+
+        >>> cache = FileCache(max_entries=16)
+        >>> cache.get('setup.py', lambda path: 'parsed') # doctest: +SKIP
+        'parsed'
+    """
+
+    def __init__(self, max_entries=0):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def resize(self, max_entries):
+        """Change the maximum number of entries, 0 disables the cache."""
+        with self._lock:
+            self.max_entries = max_entries
+            self._evict()
+
+    def clear(self):
+        """Drop all cached entries and reset statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, path, parse, tag=None):
+        """
+        Return parse result for `path`, calling `parse(path)` on a miss.
+
+        Parameters
+        ----------
+        path: pathlib.Path
+            file to parse
+        parse: Callable[[pathlib.Path], Any]
+            parser, only called if there is no valid cache entry
+        tag: Hashable, optional
+            part of the cache key, for parsers whose result depends on
+            more than the file, defaults to None
+
+        Returns
+        -------
+        Any
+            result of `parse(path)`
+        """
+        if self.max_entries <= 0:
+            return parse(path)
+        try:
+            key = (tag,) + file_key(path)
+        except OSError:
+            # let the parser decide what a missing file means
+            return parse(path)
+        with self._lock:
+            try:
+                result = self._entries.pop(key)
+            except KeyError:
+                pass
+            else:
+                self._entries[key] = result
+                self.hits += 1
+                return result
+        result = parse(path)
+        with self._lock:
+            self.misses += 1
+            # don't store results for files that changed while parsing
+            if (tag,) + file_key(path) == key:
+                self._entries[key] = result
+                self._evict()
+        return result
+
+class InFlightReads(object):
+
+    """
+    Share one read between all threads that want it at the same time.
+
+    The first caller for a key runs the read, callers that arrive while
+    it is running wait for and share its result (or exception). Nothing
+    is kept once the read finished, use `FileCache` for that.
+
+    Examples
+    --------
+    ..doctest::
+
+        >>> reads = InFlightReads()
+        >>> reads.call('key', lambda: 'parsed')
+        'parsed'
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def __len__(self):
+        return len(self._pending)
+
+    def call(self, key, read, *args):
+        """
+        Return `read(*args)`, shared with concurrent calls for `key`.
+
+        Parameters
+        ----------
+        key: Hashable
+            identifies the read, usually includes the path
+        read: Callable
+            function to call if no read for `key` is in flight
+        *args: Any
+            arguments for `read`
+
+        Raises
+        ------
+        Exception:
+            whatever `read` raised, in every waiting thread
+
+        Returns
+        -------
+        Any
+            result of `read(*args)`
+        """
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = [threading.Event(), None, None]
+                self._pending[key] = pending
+                owner = True
+            else:
+                owner = False
+        done, _, _ = pending
+        if not owner:
+            done.wait()
+            if pending[2] is not None:
+                raise pending[2]
+            return pending[1]
+        try:
+            pending[1] = read(*args)
+        except BaseException as error:
+            pending[2] = error
+            raise
+        finally:
+            with self._lock:
+                del self._pending[key]
+            done.set()
+        return pending[1]
+
+class CompiledCache(object):
+
+    """
+    Validated values of configuration files, stored in binary form.
+
+    Every configuration file gets a marshal file in `directory` holding
+    its values by slot, the file state it was read at and the
+    `schema_fingerprint` of the `Config` class. An entry is only used if both still
+    match, so changed files and changed classes never see stale values.
+    Failing to read or write an entry is never an error, the file is
+    just parsed again.
+
+    Parameters
+    ----------
+    directory: pathlib.Path
+        where to keep compiled files, created when needed
+
+    Examples
+    --------
+    ..doctest::
+
+        >>> cache = CompiledCache(Path('/tmp/compiled')) # doctest: +SKIP
+        >>> cache.load(Path('config.cfg'), 'fingerprint') is None # doctest: +SKIP
+        True
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def get_path(self, path):
+        """Return path of the compiled file for configuration file `path`."""
+        digest = hashlib.sha1(
+            str(Path(path).absolute()).encode('utf-8')).hexdigest()
+        return self.directory / '{}-{}.cache'.format(
+            Path(path).name, digest[:16])
+
+    def load(self, path, fingerprint):
+        """
+        Return values of `path` by slot, or None if there is no valid entry.
+
+        Parameters
+        ----------
+        path: pathlib.Path
+            configuration file
+        fingerprint: str
+            `schema_fingerprint` of the class the values have to match
+
+        Returns
+        -------
+        Optional[Dict[int, Any]]
+        """
+        try:
+            key = file_key(path)
+            with open(str(self.get_path(path)), 'rb') as compiled_file:
+                data = compiled_file.read()
+        except (OSError, IOError):
+            return None
+        try:
+            header, values = marshal.loads(data)
+        except (EOFError, ValueError, TypeError):
+            return None
+        if header != (COMPILED_FORMAT, fingerprint, key):
+            return None
+        return values
+
+    def store(self, path, key, fingerprint, values):
+        """
+        Store validated `values` of `path`.
+
+        Parameters
+        ----------
+        path: pathlib.Path
+            configuration file
+        key: Tuple
+            `file_key(path)`, taken before `path` was read
+        fingerprint: str
+            `schema_fingerprint` of the class the values match
+        values: Dict[int, Any]
+            validated values by slot
+
+        Returns
+        -------
+        None
+        """
+        # pylint: disable=cyclic-import
+        from user_config import write_atomic
+        try:
+            data = marshal.dumps(((COMPILED_FORMAT, fingerprint, key), values))
+        except ValueError:
+            # values marshal can not handle are never cached
+            return
+        try:
+            try:
+                os.makedirs(str(self.directory))
+            except OSError as error:
+                if error.errno != errno.EEXIST:
+                    raise
+            write_atomic(self.get_path(path), data)
+        except (OSError, IOError):
+            # a read-only cache directory only costs speed
+            return
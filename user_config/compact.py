@@ -0,0 +1,91 @@
+"""Compact storage for numeric list values."""
+import array
+
+class CompactList(array.array):
+
+    """
+    `array.array` with the list methods list options provide.
+
+    Items are stored unboxed, 8 bytes per integer or float and 1 byte
+    per boolean. Compares equal to lists and tuples with equal items.
+
+    Examples
+    --------
+    ..doctest::
+
+        >>> weights = CompactList('d', [0.5, 0.25])
+        >>> weights.sort()
+        >>> weights == [0.25, 0.5]
+        True
+    """
+
+    __hash__ = None
+
+    def __copy__(self):
+        return type(self)(self.typecode, self)
+
+    def __getitem__(self, index):
+        result = array.array.__getitem__(self, index)
+        if isinstance(index, slice):
+            return type(self)(self.typecode, result)
+        return result
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple, array.array)):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __add__(self, other):
+        result = self.__copy__()
+        result.extend(other)
+        return result
+
+    def __radd__(self, other):
+        return other + self.tolist()
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    def __repr__(self):
+        return '{}({!r}, {!r})'.format(
+            type(self).__name__, self.typecode, self.tolist())
+
+    def sort(self, key=None, reverse=False):
+        """Sort items in place."""
+        self[:] = array.array(
+            self.typecode, sorted(self, key=key, reverse=reverse))
+
+class BooleanCompactList(CompactList):
+
+    """`CompactList` of booleans, stored as bytes."""
+
+    def __getitem__(self, index):
+        result = CompactList.__getitem__(self, index)
+        if isinstance(index, slice):
+            return result
+        return bool(result)
+
+    def __iter__(self):
+        return iter(map(bool, array.array.__iter__(self)))
+
+    def tolist(self):
+        return list(self)
+
+# typecode and storage class per list item type
+COMPACT_TYPES = {
+    int: ('q', CompactList),
+    float: ('d', CompactList),
+    bool: ('B', BooleanCompactList)}
+
+def to_builtin(value):
+    """Return `value` with compact lists converted to lists."""
+    if isinstance(value, array.array):
+        return value.tolist()
+    return value
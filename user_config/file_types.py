@@ -0,0 +1,150 @@
+"""Registry of configuration file type plug-ins."""
+import threading
+from importlib import import_module
+
+ENTRY_POINT_GROUP = 'user_config.file_type'
+
+# file types shipped with user_config, these never need an entry point scan
+BUILTIN_FILE_TYPES = {
+    'ini': 'user_config.ini:register_extension'}
+
+def _load_reference(reference):
+    """Import `module:attribute` reference and return the attribute."""
+    module_name, attribute = reference.split(':')
+    return getattr(import_module(module_name), attribute)
+
+def _iter_entry_points(group):
+    """
+    Yield (name, load) pairs for all entry points in `group`.
+
+    Uses `importlib.metadata` where available and only falls back to
+    `pkg_resources` on interpreters that lack it, so the (slow)
+    `pkg_resources` import is never paid on modern pythons.
+    """
+    try:
+        from importlib import metadata
+    except ImportError:
+        try:
+            import importlib_metadata as metadata
+        except ImportError:
+            metadata = None
+    if metadata is None:
+        from pkg_resources import iter_entry_points
+        for entry_point in iter_entry_points(group):
+            yield entry_point.name, entry_point.load
+        return
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, 'select'):
+        selected = entry_points.select(group=group)
+    else:
+        selected = entry_points.get(group, [])
+    for entry_point in selected:
+        yield entry_point.name, entry_point.load
+
+class FileTypeRegistry(object):
+
+    """
+    Process-wide, lazily populated registry of file type extensions.
+
+    Entry points are only scanned the first time a file type that is
+    not built in gets requested, and every `register_extension()`
+    result is cached per name.
+
+    Parameters
+    ----------
+    group: str
+        entry point group to scan
+    builtin: Dict[str, str]
+        file types that can be imported directly, as `module:attribute`
+        references
+
+    Examples
+    --------
+    ..doctest::
+
+        >>> registry = FileTypeRegistry(ENTRY_POINT_GROUP, BUILTIN_FILE_TYPES)
+        >>> registry.get('ini')['extension']
+        'cfg'
+    """
+
+    def __init__(self, group, builtin):
+        self.group = group
+        self._builtin = dict(builtin)
+        self._loaders = None
+        self._extensions = {}
+        self._lock = threading.RLock()
+
+    def _scan(self):
+        """Collect loaders for all entry points in our group."""
+        loaders = {}
+        for name, load in _iter_entry_points(self.group):
+            # TODO: deal with duplicate entry point names
+            loaders[name] = load
+        return loaders
+
+    def register(self, name, register_extension):
+        """
+        Register a file type without an entry point.
+
+        Parameters
+        ----------
+        name: str
+            file type name, as used in `Config.file_type`
+        register_extension: Callable[[], Dict]
+            function returning the extension dictionary
+
+        Returns
+        -------
+        None
+        """
+        with self._lock:
+            self._builtin[name] = register_extension
+            self._extensions.pop(name, None)
+
+    def get(self, name):
+        """
+        Return the (cached) extension dictionary for file type `name`.
+
+        Parameters
+        ----------
+        name: str
+            file type name
+
+        Raises
+        ------
+        ImportError:
+            if no appropriate `entry_point` could be found for `name`
+
+        Returns
+        -------
+        Dict
+            result of the plug-in's `register_extension()`
+        """
+        try:
+            return self._extensions[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name in self._extensions:
+                return self._extensions[name]
+            if name in self._builtin:
+                register_extension = self._builtin[name]
+                if not callable(register_extension):
+                    register_extension = _load_reference(register_extension)
+            else:
+                if self._loaders is None:
+                    self._loaders = self._scan()
+                if name not in self._loaders:
+                    raise ImportError(
+                        'no entry point found for file type {}'.format(name))
+                register_extension = self._loaders[name]()
+            self._extensions[name] = register_extension()
+            return self._extensions[name]
+
+    def clear(self):
+        """Forget cached extensions and entry points."""
+        with self._lock:
+            self._loaders = None
+            self._extensions.clear()
+
+FILE_TYPES = FileTypeRegistry(ENTRY_POINT_GROUP, BUILTIN_FILE_TYPES)
@@ -1,11 +1,24 @@
 """ini configuration file format."""
+import io
+import os
+import sys
+import array
+import bisect
+import locale
 import collections
-from six import string_types
+from six import string_types, text_type
 try:
     import configparser
 except ImportError:
     import ConfigParser as configparser
-from user_config import Section, InvalidConfigTree
+from user_config import Section, InvalidConfigTree, write_atomic
+from user_config.cache import FileCache, file_key
+
+# parsed files, keyed on path and file state. Disabled by default, enable
+# with `PARSE_CACHE.resize(max_entries)`.
+PARSE_CACHE = FileCache()
+
+_BOOLEAN_STATES = configparser.ConfigParser.BOOLEAN_STATES
 
 def ini_validate(_, elements):
     """
@@ -51,9 +64,177 @@ def ini_validate(_, elements):
                     'unsupported data type {}'.format(
                         sub_elements[sub_element].type_))
 
-def ini_read(_, path, elements):
+def _finish_value(section, key, lines):
+    """Store multiline value, dropping trailing empty lines."""
+    while lines[-1] == '' and len(lines) > 1:
+        lines.pop()
+    section[key] = lines[0] if len(lines) == 1 else '\n'.join(lines)
+
+def ini_parse_lines(lines, source='<???>'):
     """
-    Read ini configuration file and populate `data`.
+    Parse ini lines into raw strings in a single pass.
+
+    Handles the subset of ini that `ini_write` produces: section headers,
+    `key = value` (or `key: value`) pairs, indented continuation lines
+    and full line `#` or `;` comments. Option names are lower cased, like
+    `configparser` does. There is no interpolation and no special
+    treatment of a `DEFAULT` section.
+
+    Parameters
+    ----------
+    lines: Iterable[str]
+        ini text, line by line
+    source: str, optional
+        file name used in error messages, defaults to '<???>'
+
+    Raises
+    ------
+    configparser.MissingSectionHeaderError:
+        if an option appears before the first section header
+    configparser.ParsingError:
+        if a line is not a valid header, option or continuation, or if
+        a section or option is defined twice
+
+    Returns
+    -------
+    Dict[str, Dict[str, str]]
+        raw values per section and key
+    """
+    result = {}
+    section = None
+    key = None
+    value = None
+    indent = 0
+    for lineno, line in enumerate(lines, 1):
+        stripped = line.strip()
+        if not stripped:
+            if value is not None:
+                value.append('')
+            continue
+        if stripped[0] == '#' or stripped[0] == ';':
+            continue
+        line_indent = len(line) - len(line.lstrip())
+        if value is not None:
+            if line_indent > indent:
+                value.append(stripped)
+                continue
+            _finish_value(section, key, value)
+            value = None
+        if stripped[0] == '[' and stripped[-1] == ']':
+            name = stripped[1:-1]
+            if name in result:
+                error = configparser.ParsingError(source)
+                error.append(lineno, 'duplicate section {}'.format(name))
+                raise error
+            section = result[name] = {}
+            continue
+        if section is None:
+            raise configparser.MissingSectionHeaderError(source, lineno, line)
+        equals = stripped.find('=')
+        colon = stripped.find(':')
+        if equals < 0 or (0 <= colon < equals):
+            equals = colon
+        key = stripped[:equals].rstrip().lower() if equals > 0 else ''
+        if not key or key in section:
+            error = configparser.ParsingError(source)
+            error.append(lineno, repr(line))
+            raise error
+        value = [stripped[equals + 1:].lstrip()]
+        indent = line_indent
+    if value is not None:
+        _finish_value(section, key, value)
+    return result
+
+def ini_parse(path):
+    """
+    Parse ini file into raw strings.
+
+    Parameters
+    ----------
+    path: pathlib.Path
+        path to configuration file, missing files are treated as empty
+
+    Raises
+    ------
+    configparser.Error:
+        if the file is not valid ini
+
+    Returns
+    -------
+    Dict[str, Dict[str, str]]
+        raw values per section and key
+    """
+    try:
+        with io.open(str(path)) as config_file:
+            return ini_parse_lines(config_file, str(path))
+    except (IOError, OSError):
+        if os.path.exists(str(path)):
+            raise
+        return {}
+
+def _get_boolean(value):
+    """Convert raw ini text to bool, like `ConfigParser.getboolean`."""
+    try:
+        return _BOOLEAN_STATES[value.lower()]
+    except KeyError:
+        raise ValueError('Not a boolean: {}'.format(value))
+
+def _get_list(value, subtype):
+    """Convert raw ini list to a list of `subtype`."""
+    convert = _CONVERTERS.get(subtype, _get_string)
+    result = []
+    for item in value.split('\n'):
+        item = item.lstrip()
+        if not item.startswith("- "):
+            raise ValueError('{} is not a valid ini list'.format(value))
+        result.append(convert(item[2:]))
+    return result
+
+def _get_compact_list(value, element):
+    """Convert raw ini list to a compact list, in bulk."""
+    items = [item.lstrip() for item in value.split('\n')]
+    if not all(item.startswith("- ") for item in items):
+        raise ValueError('{} is not a valid ini list'.format(value))
+    return element.to_compact(map(
+        _CONVERTERS[element.subtype], [item[2:] for item in items]))
+
+def _get_string(value):
+    """Return raw ini text unchanged."""
+    return value
+
+_CONVERTERS = {
+    bool: _get_boolean,
+    int: int,
+    float: float}
+
+def get_converter(element):
+    """
+    Return function converting raw ini text to the type of `element`.
+
+    Parameters
+    ----------
+    element: ConfigElement
+        element to convert values for
+
+    Returns
+    -------
+    Callable[[str], Any]
+    """
+    if element.type_ == list:
+        if getattr(element, 'compact', False):
+            return lambda value: _get_compact_list(value, element)
+        subtype = element.subtype
+        return lambda value: _get_list(value, subtype)
+    return _CONVERTERS.get(element.type_, _get_string)
+
+def ini_load(_, path, elements):
+    """
+    Read ini configuration file into a flat table of typed values.
+
+    Parsed files are taken from `PARSE_CACHE` when it is enabled and the
+    file did not change. Otherwise only the sections of `elements` are
+    read and parsed, see `ini_index`. Empty values
+    are ignored. Values are converted, but not validated.
 
     Parameters
     ----------
@@ -66,11 +247,15 @@ def ini_read(_, path, elements):
 
     Raises
     ------
-    None
+    ValueError:
+        if a value can not be converted to the element type
+    configparser.Error:
+        if the file is not valid ini
 
     Returns
     -------
-    None
+    Dict[Tuple[str, str], Any]
+        values found in the file, keyed on (section, key)
 
     Examples
     --------
@@ -78,84 +263,445 @@ def ini_read(_, path, elements):
 
         >>> TODO
     """
-    config = configparser.ConfigParser()
-    config.read(str(path))
+    if PARSE_CACHE.max_entries <= 0:
+        try:
+            index = ini_index(None, path, elements)
+            if index is not None:
+                return index.load_all()
+        except (IOError, OSError):
+            # the full parse decides what a missing file means
+            pass
+    parsed = PARSE_CACHE.get(path, ini_parse)
+    result = {}
     for section in elements:
-        keys = elements[section].get_elements()
-        for key in keys:
-            try:
-                if keys[key].type_ == bool:
-                    keys[key].set_value(config.getboolean(section, key))
-                elif keys[key].type_ == list:
-                    value = config.get(section, key).split('\n')
-                    if len(value) == 1 and value[0] == '':
-                        continue
-                    result = []
-                    for item in value:
-                        item = item.lstrip()
-                        if not item.startswith("- "):
-                            raise ValueError(
-                                '{} is not a valid ini list'.format(
-                                    config.get(section, key)))
-                        result.append(item[2:])
-                    keys[key].set_value(result)
-                elif issubclass(keys[key].type_, string_types):
-                    value = config.get(section, key)
-                    if value != '':
-                        keys[key].set_value(value)
-                elif keys[key].type_ == int or keys[key].type_ == float:
-                    keys[key].set_value(
-                        keys[key].type_(config.get(section, key)))
-            except ValueError:
-                # if the value is empty string, not defined, ignore
-                if config.get(section, key) != '':
-                    raise
-            except configparser.NoOptionError:
-                pass
-            except configparser.NoSectionError:
-                pass
-
-def _print_item(key, item, value):
-    """Print single key value pair."""
-    # print docstring
+        if section in parsed:
+            _convert_section(
+                section, parsed[section], elements[section], result)
+    return result
+
+def _convert_section(section, raw_values, element, result):
+    """Convert raw values of `section` into `result`."""
+    keys = element.get_elements()
+    for key in keys:
+        raw_value = raw_values.get(key.lower())
+        if not raw_value:
+            # not defined or empty, ignore
+            continue
+        result[(section, key)] = get_converter(keys[key])(raw_value)
+
+# positions of the section headers of ini files, keyed on path and file
+# state. Only positions are kept, no file handles or contents. Disable
+# with `INDEX_CACHE.resize(0)`.
+INDEX_CACHE = FileCache(max_entries=16)
+
+class IniScan(object):
+
+    """
+    Positions of the section headers of an ini file.
+
+    Created by `ini_scan`, shared by all indexes of the same file.
+    Sections are read from the file when they are needed, with a handle
+    that is closed right after.
+
+    Parameters
+    ----------
+    path: pathlib.Path
+        scanned file
+    key: Tuple
+        `file_key` of the file when it was scanned
+    encoding: str
+        encoding of the file
+    headers: Dict[bytes, int]
+        start of every section, by raw section name
+    bounds: array.array
+        start of every section, and the end of the file
+    """
+
+    def __init__(self, path, key, encoding, headers, bounds):
+        self.path = path
+        self.key = key
+        self.encoding = encoding
+        self.headers = headers
+        self.bounds = bounds
+
+    def read_sections(self, starts):
+        """
+        Return decoded text of the sections starting at `starts`.
+
+        Returns None if the file changed since it was scanned, the
+        positions may no longer be valid.
+
+        Raises
+        ------
+        OSError:
+            if the file can not be read
+        """
+        result = []
+        with io.open(str(self.path), 'rb') as config_file:
+            if file_key(self.path, os.fstat(config_file.fileno())) != \
+                    self.key:
+                return None
+            for start in starts:
+                end = self.bounds[bisect.bisect_right(self.bounds, start)]
+                config_file.seek(start)
+                data = config_file.read(end - start)
+                if len(data) != end - start:
+                    # truncated since the check above
+                    return None
+                result.append(data.decode(self.encoding))
+        return result
+
+def _find_headers(data):
+    """
+    Yield start, indentation and raw name of section header lines.
+
+    Only lines with a `[` are looked at, searching for it is much faster
+    than looking at every line.
+    """
+    position = data.find(b'[')
+    while position >= 0:
+        line_start = data.rfind(b'\n', 0, position) + 1
+        line_end = data.find(b'\n', position)
+        if line_end < 0:
+            line_end = len(data)
+        indentation = data[line_start:position]
+        if not indentation or indentation.isspace():
+            line = data[position:line_end].rstrip()
+            if line.endswith(b']'):
+                yield line_start, indentation, line[1:-1]
+        position = data.find(b'[', line_end)
+
+def ini_scan(path):
+    """
+    Locate the section headers of an ini file.
+
+    Only the headers are located, with a single scan of the file, its
+    content is not kept. See `ini_index` for the files that can not be
+    scanned.
+
+    Parameters
+    ----------
+    path: pathlib.Path
+        path to configuration file
+
+    Raises
+    ------
+    OSError:
+        if the file can not be read
+    configparser.Error:
+        if an option appears before the first section header
+
+    Returns
+    -------
+    Optional[IniScan]
+    """
+    encoding = locale.getpreferredencoding(False)
+    if u'[]\n'.encode(encoding) != b'[]\n':
+        return None
+    with io.open(str(path), 'rb') as config_file:
+        key = file_key(path, os.fstat(config_file.fileno()))
+        data = config_file.read()
+    if len(data) != key[2]:
+        # changed while reading, the positions would not match the key
+        return None
+    headers = collections.OrderedDict()
+    bounds = array.array('q')
+    for start, indentation, name in _find_headers(data):
+        # indented headers may be continuation lines
+        if indentation or name in headers:
+            return None
+        headers[name] = start
+        bounds.append(start)
+    bounds.append(len(data))
+    # raises the same errors as a full parse for options without section
+    ini_parse_lines(
+        data[:bounds[0]].decode(encoding).splitlines(True), str(path))
+    return IniScan(path, key, encoding, headers, bounds)
+
+class IniIndex(object):
+
+    """
+    Sections of an ini file, parsed one at a time.
+
+    Created by `ini_index`. The text of a section is read, decoded,
+    parsed and converted when `load` asks for it, other parts of the
+    file are never read.
+
+    Parameters
+    ----------
+    scan: IniScan
+        scanned file
+    offsets: Dict[str, int]
+        start of every known section
+    elements: Dict[ConfigElement]
+        configuration element tree
+    """
+
+    def __init__(self, scan, offsets, elements):
+        self.path = scan.path
+        self._scan = scan
+        self._offsets = offsets
+        self._elements = elements
+
+    @property
+    def sections(self):
+        """Names of known sections that are present in the file."""
+        return list(self._offsets)
+
+    def load(self, section):
+        """
+        Return converted values of `section`, keyed on (section, key).
+
+        If the file changed since it was scanned, the whole file is
+        parsed again and the section is taken from it.
+
+        Parameters
+        ----------
+        section: str
+            name of a section in `sections`
+
+        Raises
+        ------
+        OSError:
+            if the file exists, but can not be read
+        ValueError:
+            if a value can not be converted to the element type
+        configparser.Error:
+            if the section is not valid ini, errors are the same as for
+            parsing the whole file
+
+        Returns
+        -------
+        Dict[Tuple[str, str], Any]
+        """
+        return self._load([section])
+
+    def load_all(self):
+        """Return converted values of all `sections`, see `load`."""
+        return self._load(list(self._offsets))
+
+    def _load(self, sections):
+        result = {}
+        try:
+            texts = self._scan.read_sections(
+                [self._offsets[section] for section in sections])
+        except (IOError, OSError):
+            # the full parse decides what a missing file means
+            texts = None
+        if texts is None:
+            parsed = ini_parse(self.path)
+            for section in sections:
+                if section in parsed:
+                    _convert_section(
+                        section, parsed[section], self._elements[section],
+                        result)
+            return result
+        for section, text in zip(sections, texts):
+            self._load_section(section, text, result)
+        return result
+
+    def _load_section(self, section, text, result):
+        """Parse and convert the `text` of `section` into `result`."""
+        try:
+            parsed = ini_parse_lines(text.splitlines(True), str(self.path))
+        except configparser.Error:
+            # report the line numbers of the whole file
+            ini_parse(self.path)
+            raise
+        _convert_section(
+            section, parsed[section], self._elements[section], result)
+
+def ini_index(_, path, elements):
+    """
+    Locate the sections of an ini file, without parsing them.
+
+    Scans are taken from `INDEX_CACHE` when it is enabled and the file
+    did not change.
+
+    Parameters
+    ----------
+    _: user_config.Config
+        IGNORED
+    path: pathlib.Path
+        path to configuration file
+    elements: Dict[ConfigElement]
+        configuration element tree
+
+    Raises
+    ------
+    OSError:
+        if the file can not be read
+    configparser.Error:
+        if an option appears before the first section header
+
+    Returns
+    -------
+    Optional[IniIndex]
+        None if the file has to be parsed as a whole: it contains
+        indented section headers (which might be continuation lines) or
+        duplicate sections, or its encoding is not ASCII compatible
+    """
+    scan = INDEX_CACHE.get(path, ini_scan)
+    if scan is None:
+        return None
+    offsets = collections.OrderedDict()
+    for name in elements:
+        start = scan.headers.get(name.encode(scan.encoding))
+        if start is not None:
+            offsets[name] = start
+    return IniIndex(scan, offsets, elements)
+
+def ini_read(config, path, elements):
+    """
+    Read ini configuration file and populate `data`.
+
+    See `ini_load` for details on how the file is read.
+
+    Parameters
+    ----------
+    config: Optional[user_config.Config]
+        instance to store values in, if None values are stored in the
+        elements themselves
+    path: pathlib.Path
+        path to configuration file
+    elements: Dict[ConfigElement]
+        configuration element tree
+
+    Raises
+    ------
+    ValueError:
+        if a value can not be converted to the element type
+    configparser.Error:
+        if the file is not valid ini
+
+    Returns
+    -------
+    None
+
+    Examples
+    --------
+    ..doctest::
+
+        >>> TODO
+    """
+    target = elements if config is None else config
+    for (section, key), value in ini_load(config, path, elements).items():
+        target[section][key] = value
+
+def _item_lines(key, item, value):
+    """Yield lines for single key value pair."""
+    # docstring
     if item.doc is not None:
-        doc_string = item.doc.split('\n')
-        for line in doc_string:
-            print("## {}".format(line))
+        for line in item.doc.split('\n'):
+            yield u"## {}\n".format(line)
 
     # TODO: display data type
-    # print default
+    # default
     if item.has_default():
         # handle multiline strings
         if item.type_ == list:
-            lines = ['- {}'.format(thing) for thing in item.get_default()]
+            lines = [u'- {}'.format(thing) for thing in item.get_default()]
         else:
-            lines = str(item.get_default()).split('\n')
-        print("# {} = {}".format(key, lines[0]))
-        if len(lines) > 1:
-            for line in lines[1:]:
-                print("#     {}".format(line))
+            lines = text_type(item.get_default()).split('\n')
+        yield u"# {} = {}\n".format(key, lines[0])
+        for line in lines[1:]:
+            yield u"#     {}\n".format(line)
     else:
         if item.required:
-            print("## REQUIRED")
-        print("# {} = ".format(key))
+            yield u"## REQUIRED\n"
+        yield u"# {} = \n".format(key)
 
-    # print current value
+    # current value
     if value is None and item.required:
-        print("{} = ".format(key))
+        yield u"{} = \n".format(key)
     elif value is not None and value != item.get_default():
         # handle multiline strings
         if item.type_ == list:
-            lines = ['- {}'.format(thing) for thing in value]
+            lines = [u'- {}'.format(thing) for thing in value]
         else:
-            lines = str(value).split('\n')
-        print("{} = {}".format(key, lines[0]))
-        if len(lines) > 1:
-            for line in lines[1:]:
-                print("    {}".format(line))
-    print("")
+            lines = text_type(value).split('\n')
+        yield u"{} = {}\n".format(key, lines[0])
+        for line in lines[1:]:
+            yield u"    {}\n".format(line)
+    yield u"\n"
+
+def ini_lines(config, elements, doc):
+    """
+    Generate default ini file, line by line.
+
+    This includes data already set in the existing configuration files.
+
+    Parameters
+    ----------
+    config: Optional[user_config.Config]
+        instance to take current values from, if None values are taken
+        from the elements themselves
+    elements: Dict[ConfigElement]
+        configuration element tree
+    doc: Option[str]
+        `Config` class docstring
+
+    Returns
+    -------
+    Iterator[str]
+        lines, including line endings
+    """
+    # config class docstring
+    if doc is not None:
+        for line in doc.split('\n'):
+            yield u"## {}\n".format(line)
+        yield u"\n"
+
+    for section in elements:
+        yield u"[{}]\n".format(section)
+        # docstring and optional status
+        if elements[section].doc is not None:
+            for line in elements[section].doc.split('\n'):
+                yield u"## {}\n".format(line)
+        if not elements[section].required:
+            yield u"## OPTIONAL_SECTION\n"
+        if elements[section].doc is not None or not elements[section].required:
+            yield u"\n"
+
+        keys = elements[section].get_elements()
+        values = elements[section] if config is None else config[section]
+        for key in keys:
+            for line in _item_lines(key, keys[key], values[key]):
+                yield line
+        yield u"\n"
+
+def ini_dump(config, elements, doc, target):
+    """
+    Write default ini file to a text stream or file.
+
+    The whole file is generated in memory and written at once. Files are
+    written atomically: to a temporary file in the same directory that
+    replaces `target` when complete.
+
+    Parameters
+    ----------
+    config: Optional[user_config.Config]
+        instance to take current values from, if None values are taken
+        from the elements themselves
+    elements: Dict[ConfigElement]
+        configuration element tree
+    doc: Option[str]
+        `Config` class docstring
+    target: Union[TextIO, pathlib.Path, str]
+        stream or path to write to
 
-def ini_write(_, elements, doc):
+    Raises
+    ------
+    OSError:
+        if `target` can not be written
+
+    Returns
+    -------
+    None
+    """
+    write_atomic(target, u''.join(ini_lines(config, elements, doc)))
+
+def ini_write(config, elements, doc):
     """
     Print default ini file.
 
@@ -163,8 +709,9 @@ def ini_write(_, elements, doc):
 
     Parameters
     ----------
-    _: user_config.Config
-        IGNORED
+    config: Optional[user_config.Config]
+        instance to take current values from, if None values are taken
+        from the elements themselves
     elements: Dict[ConfigElement]
         configuration element tree
     doc: Option[str]
@@ -184,29 +731,7 @@ def ini_write(_, elements, doc):
 
         >>> TODO
     """
-    # print config class docstring
-    if doc is not None:
-        doc_string = doc.split('\n')
-        for line in doc_string:
-            print("## {}".format(line))
-        print("")
-
-    for section in elements:
-        print("[{}]".format(section))
-        # print docstring and optional status
-        if elements[section].doc is not None:
-            doc_string = elements[section].doc.split('\n')
-            for line in doc_string:
-                print("## {}".format(line))
-        if not elements[section].required:
-            print("## OPTIONAL_SECTION")
-        if elements[section].doc is not None or not elements[section].required:
-            print("")
-
-        keys = elements[section].get_elements()
-        for key in keys:
-            _print_item(key, keys[key], keys[key].get_value())
-        print("")
+    ini_dump(config, elements, doc, sys.stdout)
 
 def register_extension():
     """
@@ -221,10 +746,13 @@ def register_extension():
     ..doctest::
 
         >>> register_extension()
-        {'read': <function ini_read at 0x...>, 'write': <function ini_write at 0x...>, 'validate': <function ini_validate at 0x...>, 'extension': 'cfg'}
+        {'load': <function ini_load at 0x...>, 'index': <function ini_index at 0x...>, 'read': <function ini_read at 0x...>, 'write': <function ini_write at 0x...>, 'dump': <function ini_dump at 0x...>, 'validate': <function ini_validate at 0x...>, 'extension': 'cfg'}
     """
     return {
         'extension': 'cfg',
+        'load': ini_load,
+        'index': ini_index,
         'read': ini_read,
         'write': ini_write,
+        'dump': ini_dump,
         'validate': ini_validate}
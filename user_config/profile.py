@@ -0,0 +1,193 @@
+"""Timing of the phases of configuration loading."""
+import time
+import logging
+import threading
+
+LOGGER = logging.getLogger(__name__)
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+class _Phase(object):
+
+    """Context manager adding its duration to a profile."""
+
+    __slots__ = ('_profile', '_name', '_details', '_start')
+
+    def __init__(self, profile, name, details):
+        self._profile = profile
+        self._name = name
+        self._details = details
+        self._start = None
+
+    def __enter__(self):
+        self._start = _clock()
+        return self
+
+    def __exit__(self, *exc_info):
+        record = {'name': self._name, 'seconds': _clock() - self._start}
+        record.update(self._details)
+        self._profile.phases.append(record)
+
+class _NullPhase(object):
+
+    """Context manager doing nothing, for instances without profile."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+NULL_PHASE = _NullPhase()
+
+class ConfigProfile(object):
+
+    """
+    Durations of the phases of creating a `Config` instance.
+
+    Pass an instance as `profile` to `Config` or `Config.load_async`.
+    Instances without profile only pay for a few checks, validators
+    are only timed when a profile is given.
+
+    Recorded are the duration of every phase (resolving paths, reading
+    every source, building and running the command line parser,
+    merging, checking required values), every file read with its size,
+    and the number of calls and total duration of every validator.
+    Sections read later (see `Config.lazy_sections`) and reloads add
+    their phases, files and validator calls when they happen. Checking
+    the element tree against the file type happens once per class, when
+    it is created, and is not part of any profile.
+
+    Parameters
+    ----------
+    callback: Callable[[ConfigProfile], None], optional
+        called when the instance is complete, defaults to None
+
+    Attributes
+    ----------
+    seconds: float
+        total duration, None until the instance is complete
+    phases: List[Dict[str, Any]]
+        `name` and `seconds` of every phase, in order of completion,
+        with details such as the `source`
+    files: List[Dict[str, Any]]
+        `path`, `bytes` and `seconds` of every file read, including
+        parsing and validation
+    validators: Dict[Tuple[str, str], List]
+        calls and seconds per (section, key)
+
+    Examples
+    --------
+    ..doctest::
+
+        >>> profile = ConfigProfile() # doctest: +SKIP
+        >>> config = MyConfig(profile=profile) # doctest: +SKIP
+        >>> profile.as_dict()['phases'][0] # doctest: +SKIP
+        {'name': 'sources', 'seconds': 0.0003}
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.seconds = None
+        self.phases = []
+        self.files = []
+        self.validators = {}
+        self._start = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start timing the instance."""
+        self._start = _clock()
+
+    def phase(self, name, **details):
+        """Return context manager recording the phase `name`."""
+        return _Phase(self, name, details)
+
+    def read_file(self, read, path, *args):
+        """
+        Return `read(path, *args)`, recording the file and its duration.
+
+        The size of missing files is recorded as None.
+        """
+        start = _clock()
+        try:
+            return read(path, *args)
+        finally:
+            seconds = _clock() - start
+            try:
+                size = path.stat().st_size
+            except OSError:
+                size = None
+            self.files.append(
+                {'path': str(path), 'bytes': size, 'seconds': seconds})
+
+    def validate(self, entry, value):
+        """
+        Call the validator of schema `entry` and record its duration.
+
+        Parameters
+        ----------
+        entry: user_config.SchemaEntry
+            element to validate for
+        value: Any
+            value to validate
+
+        Raises
+        ------
+        InvalidData:
+            if validation fails
+
+        Returns
+        -------
+        float
+            seconds the validator took
+        """
+        start = _clock()
+        try:
+            entry.validate(value)
+        finally:
+            seconds = _clock() - start
+            key = (entry.section, entry.key)
+            with self._lock:
+                record = self.validators.get(key)
+                if record is None:
+                    record = self.validators[key] = [0, 0.]
+                record[0] += 1
+                record[1] += seconds
+        return seconds
+
+    def finish(self):
+        """Stop timing, log a summary and call `callback`."""
+        self.seconds = _clock() - self._start
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            LOGGER.debug(
+                'configuration loaded in %.3f ms: %s', self.seconds * 1000,
+                ', '.join('{} {:.3f} ms'.format(
+                    phase['name'], phase['seconds'] * 1000)
+                          for phase in self.phases))
+        if self.callback is not None:
+            self.callback(self)
+
+    def as_dict(self):
+        """
+        Return all measurements as plain data.
+
+        Returns
+        -------
+        Dict[str, Any]
+            `seconds`, `phases` and `files` as described for the
+            attributes, `validators` as a list of dictionaries with
+            `section`, `key`, `calls` and `seconds`, slowest first
+        """
+        validators = [
+            {'section': section, 'key': key, 'calls': calls,
+             'seconds': seconds}
+            for (section, key), (calls, seconds) in self.validators.items()]
+        validators.sort(key=lambda record: record['seconds'], reverse=True)
+        return {
+            'seconds': self.seconds,
+            'phases': [dict(phase) for phase in self.phases],
+            'files': [dict(record) for record in self.files],
+            'validators': validators}
@@ -0,0 +1,335 @@
+"""Reload configuration files when they change."""
+import os
+import sys
+import select
+import struct
+import logging
+import threading
+import ctypes
+import ctypes.util
+
+from user_config.cache import file_key
+
+LOGGER = logging.getLogger(__name__)
+
+# inotify event masks, see inotify(7)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+    IN_CREATE | IN_DELETE)
+# inotify_init1 flags, python 2 has no os.O_CLOEXEC
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct('iIII')
+
+def file_state(path):
+    """Return `file_key` of `path`, or None if it does not exist."""
+    try:
+        return file_key(path)
+    except OSError:
+        return None
+
+class PollingBackend(object):
+
+    """
+    Report all watched files as candidates after every interval.
+
+    Parameters
+    ----------
+    paths: List[pathlib.Path]
+        files and directories to watch
+    """
+
+    def __init__(self, paths):
+        self.paths = list(paths)
+        self._wakeup = threading.Event()
+
+    def add(self, paths):
+        """Watch `paths` as well."""
+        self.paths.extend(path for path in paths if path not in self.paths)
+
+    def wait(self, timeout):
+        """Block for `timeout` seconds, return files that may have changed."""
+        self._wakeup.wait(timeout)
+        self._wakeup.clear()
+        return self.paths
+
+    def interrupt(self):
+        """Wake up a blocked `wait`."""
+        self._wakeup.set()
+
+    def close(self):
+        """Stop watching."""
+        self.interrupt()
+
+class InotifyBackend(object):
+
+    """
+    Report files in watched directories that inotify saw change.
+
+    Directories are watched instead of files, so that files that are
+    created, deleted or atomically replaced are picked up too. Watched
+    paths that are directories themselves (drop-in directories) are
+    reported for changes to files in them that are not watched yet.
+
+    Parameters
+    ----------
+    paths: List[pathlib.Path]
+        files and directories to watch, their parent directories must
+        exist
+
+    Raises
+    ------
+    OSError:
+        if inotify is unavailable or a directory can not be watched
+    """
+
+    def __init__(self, paths):
+        self._libc = ctypes.CDLL(
+            ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._directories = {}
+        self._names = {}
+        self._watched_directories = {}
+        try:
+            self.add(paths)
+        except OSError:
+            os.close(self._fd)
+            raise
+
+    def _watch(self, directory):
+        """Watch `directory`, unless it is already watched."""
+        if directory in self._directories.values():
+            return
+        descriptor = self._libc.inotify_add_watch(
+            self._fd, directory.encode(sys.getfilesystemencoding()),
+            WATCH_MASK)
+        if descriptor < 0:
+            raise OSError(
+                ctypes.get_errno(), 'could not watch {}'.format(directory))
+        self._directories[descriptor] = directory
+
+    def add(self, paths):
+        """
+        Watch `paths` as well, and directories that were created since.
+
+        Raises
+        ------
+        OSError:
+            if a directory can not be watched
+        """
+        for path in paths:
+            directory = str(path.parent)
+            self._names.setdefault(directory, {})[path.name] = path
+            self._watch(directory)
+            if path.is_dir():
+                self._watch(str(path))
+                self._watched_directories[str(path)] = path
+
+    @staticmethod
+    def available():
+        """Return True if inotify can be used on this platform."""
+        if not sys.platform.startswith('linux'):
+            return False
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6')
+            return hasattr(libc, 'inotify_init1')
+        except OSError:
+            return False
+
+    def wait(self, timeout):
+        """Block for up to `timeout` seconds, return changed files."""
+        if self._fd is None:
+            return []
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable or self._fd is None:
+            return []
+        changed = set()
+        try:
+            data = os.read(self._fd, 65536)
+        except OSError:
+            return []
+        offset = 0
+        while offset < len(data):
+            descriptor, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0').decode(
+                sys.getfilesystemencoding())
+            offset += length
+            directory = self._directories.get(descriptor)
+            if directory is None:
+                continue
+            path = self._names.get(directory, {}).get(name)
+            if path is None:
+                path = self._watched_directories.get(directory)
+            if path is not None:
+                changed.add(path)
+        return list(changed)
+
+    def interrupt(self):
+        """Do nothing, `wait` returns within its timeout."""
+
+    def close(self):
+        """Stop watching."""
+        if self._fd is not None:
+            fd, self._fd = self._fd, None
+            os.close(fd)
+
+class ConfigWatcher(object):
+
+    """
+    Reload a `Config` instance when one of its files changes.
+
+    Uses inotify where available and falls back to polling file state
+    (modification time, size and inode) every `interval` seconds.
+    Candidates reported by either backend are confirmed against their
+    file state, so only files that really changed get re-read. Drop-in
+    directories are watched as well, files added to them are read and
+    watched from then on. Errors during reload are logged and leave the
+    old values in place.
+
+    Parameters
+    ----------
+    config: user_config.Config
+        instance to keep up to date
+    interval: float, optional
+        seconds between polls, or between checks for `stop()` when using
+        inotify, defaults to 1.
+    use_inotify: bool, optional
+        set to False to force polling, defaults to True
+    incremental: bool, optional
+        only validate values that changed, see `Config.reload`, defaults
+        to True
+
+    Examples
+    --------
+    ..doctest::
+
+        >>> watcher = ConfigWatcher(config) # doctest: +SKIP
+        >>> config.subscribe(lambda config, changed: print(changed)) # doctest: +SKIP
+        >>> watcher.start() # doctest: +SKIP
+    """
+
+    def __init__(
+            self, config, interval=1., use_inotify=True, incremental=True):
+        self.config = config
+        self.interval = interval
+        self.use_inotify = use_inotify
+        self.incremental = incremental
+        self._states = {}
+        for path in self._get_paths():
+            self._states[path] = file_state(path)
+        self._backend = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def _get_paths(self):
+        """Return files of the config, and paths its sources read."""
+        paths = list(self.config.get_paths())
+        # pylint: disable=protected-access
+        for source in self.config._sources:
+            paths.extend(
+                path for path in source.get_paths() if path not in paths)
+        return paths
+
+    def _add_paths(self):
+        """
+        Watch files and directories the config reads since last time.
+
+        Returns the new paths. Their state is unknown, they may have
+        changed since they were read.
+        """
+        paths = self._get_paths()
+        added = [path for path in paths if path not in self._states]
+        for path in added:
+            self._states[path] = None
+        for path in set(self._states).difference(paths):
+            if file_state(path) is None:
+                del self._states[path]
+        if self._backend is not None:
+            self._backend.add(paths)
+        return added
+
+    def _create_backend(self):
+        paths = list(self._states)
+        if self.use_inotify and InotifyBackend.available():
+            try:
+                return InotifyBackend(paths)
+            except OSError:
+                LOGGER.debug('inotify unavailable, polling', exc_info=True)
+        return PollingBackend(paths)
+
+    def check(self, paths=None):
+        """
+        Reload files whose state changed since the last check.
+
+        Parameters
+        ----------
+        paths: List[pathlib.Path], optional
+            candidates to check, defaults to None: all watched files and
+            directories
+
+        Returns
+        -------
+        List[Tuple[str, str]]
+            (section, key) of all values that changed
+        """
+        changed = []
+        candidates = list(self._states) if paths is None else paths
+        while candidates:
+            for path in candidates:
+                state = file_state(path)
+                if state == self._states.get(path):
+                    continue
+                self._states[path] = state
+                changed.extend(self.config.reload(
+                    path, incremental=self.incremental))
+            candidates = self._add_paths()
+        return changed
+
+    def _run(self):
+        while not self._stopped.is_set():
+            candidates = self._backend.wait(self.interval)
+            if self._stopped.is_set():
+                break
+            try:
+                self.check(candidates)
+            except Exception: # pylint: disable=broad-except
+                LOGGER.exception('could not reload configuration')
+
+    def start(self):
+        """Start watching in a daemon thread."""
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._backend = self._create_backend()
+        self._thread = threading.Thread(
+            target=self._run, name='user_config watcher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching and wait for the thread to finish."""
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._backend.interrupt()
+        self._thread.join()
+        self._backend.close()
+        self._thread = None
+        self._backend = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
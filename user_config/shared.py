@@ -0,0 +1,257 @@
+"""Share loaded configuration values between processes."""
+import os
+import mmap
+import time
+import struct
+import marshal
+
+from user_config.compact import to_builtin
+
+# sequence number and length of the published values
+_HEADER = struct.Struct('<QQ')
+DEFAULT_SIZE = 1 << 16
+
+class SharedConfig(object):
+
+    """
+    Configuration values in memory shared by a master and its workers.
+
+    The master publishes the validated values of a `Config` instance as
+    a compact binary blob, workers decode it instead of reading, parsing
+    and validating the configuration files themselves. Workers decode
+    once per published version, not on every read: values are read
+    through a normal `Config` instance.
+
+    Without a `path` the memory is an anonymous shared mapping, which is
+    inherited by processes forked after creation (pre-fork servers,
+    `multiprocessing` with the fork start method). With a `path` the
+    mapping is backed by that file (use a tmpfs such as /dev/shm), and
+    any process can `attach` to it.
+
+    Publishing uses a sequence lock: readers retry instead of seeing a
+    half written blob. There must be only one publishing process.
+
+    Parameters
+    ----------
+    config_class: type
+        `Config` subclass the values belong to
+    memory: mmap.mmap
+        shared mapping, starting with the header
+
+    Examples
+    --------
+    ..doctest::
+
+        >>> shared = SharedConfig.create(MyConfig()) # doctest: +SKIP
+        >>> # in a forked worker
+        >>> config = shared.load() # doctest: +SKIP
+        >>> shared.sync(config) # doctest: +SKIP
+        []
+    """
+
+    def __init__(self, config_class, memory):
+        self.config_class = config_class
+        self._memory = memory
+        self._keys = tuple(
+            (entry.section, entry.key) for entry in config_class._schema)
+        self._fingerprint = config_class.schema_fingerprint
+        # (config, callback) publishing reloads, set by `create`
+        self._subscription = None
+
+    @classmethod
+    def create(cls, config, path=None, size=None):
+        """
+        Create shared memory and publish the values of `config`.
+
+        Values are published again after every reload of `config`, until
+        `close` is called.
+
+        Parameters
+        ----------
+        config: user_config.Config
+            loaded instance, in the master process
+        path: pathlib.Path, optional
+            file to back the memory with, defaults to None: anonymous
+            memory that is inherited by forked processes
+        size: int, optional
+            capacity in bytes, defaults to None: the larger of 64 KiB and
+            four times the size of the current values
+
+        Raises
+        ------
+        ValueError:
+            if the values do not fit in `size` bytes
+
+        Returns
+        -------
+        SharedConfig
+        """
+        if size is None:
+            size = max(DEFAULT_SIZE, 4 * len(_encode(config)))
+        size += _HEADER.size
+        if path is None:
+            memory = mmap.mmap(-1, size)
+        else:
+            descriptor = os.open(str(path), os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                os.ftruncate(descriptor, size)
+                memory = mmap.mmap(descriptor, size)
+            finally:
+                os.close(descriptor)
+        shared = cls(type(config), memory)
+        shared.publish(config)
+        callback = lambda config, changed: shared.publish(config)
+        config.subscribe(callback)
+        shared._subscription = (config, callback)
+        return shared
+
+    @classmethod
+    def attach(cls, config_class, path):
+        """
+        Attach to memory created with a `path` by another process.
+
+        Parameters
+        ----------
+        config_class: type
+            `Config` subclass the values belong to
+        path: pathlib.Path
+            file the memory is backed by
+
+        Returns
+        -------
+        SharedConfig
+        """
+        descriptor = os.open(str(path), os.O_RDWR)
+        try:
+            memory = mmap.mmap(descriptor, 0)
+        finally:
+            os.close(descriptor)
+        return cls(config_class, memory)
+
+    @property
+    def sequence(self):
+        """Version of the published values, changes with every publish."""
+        return _HEADER.unpack_from(self._memory)[0]
+
+    def publish(self, config):
+        """
+        Make the current values of `config` visible to all workers.
+
+        Parameters
+        ----------
+        config: user_config.Config
+            instance of `config_class`
+
+        Raises
+        ------
+        ValueError:
+            if the values do not fit in the shared memory
+
+        Returns
+        -------
+        None
+        """
+        data = _encode(config)
+        if _HEADER.size + len(data) > len(self._memory):
+            raise ValueError(
+                'configuration values need {} bytes, only {} available'.format(
+                    len(data), len(self._memory) - _HEADER.size))
+        sequence, length = _HEADER.unpack_from(self._memory)
+        # odd sequence numbers tell readers a write is in progress
+        _HEADER.pack_into(self._memory, 0, sequence + 1, length)
+        self._memory[_HEADER.size:_HEADER.size + len(data)] = data
+        _HEADER.pack_into(self._memory, 0, sequence + 2, len(data))
+
+    def _read(self):
+        """Return sequence number, slot values and incomplete counts."""
+        while True:
+            sequence, length = _HEADER.unpack_from(self._memory)
+            if sequence % 2:
+                time.sleep(0)
+                continue
+            data = self._memory[_HEADER.size:_HEADER.size + length]
+            if _HEADER.unpack_from(self._memory)[0] == sequence:
+                break
+        fingerprint, values, incomplete = marshal.loads(data)
+        if fingerprint != self._fingerprint:
+            raise ValueError(
+                'shared values do not match {}'.format(
+                    self.config_class.__name__))
+        # pylint: disable=protected-access
+        for index in self.config_class._compact_positions:
+            if values[index] is not None:
+                values[index] = self.config_class._schema[
+                    index].element.to_compact(values[index])
+        return sequence, values, incomplete
+
+    def load(self):
+        """
+        Return a new `config_class` instance with the published values.
+
+        Raises
+        ------
+        ValueError:
+            if the values were published for a different schema
+
+        Returns
+        -------
+        user_config.Config
+        """
+        sequence, values, incomplete = self._read()
+        # pylint: disable=protected-access
+        config = self.config_class._from_values(values, incomplete)
+        config._shared_sequence = sequence
+        return config
+
+    def sync(self, config):
+        """
+        Update `config` if newer values were published.
+
+        Costs a single header read if nothing changed. Subscribers of
+        `config` are called as they are after a reload.
+
+        Parameters
+        ----------
+        config: user_config.Config
+            instance returned by `load`
+
+        Raises
+        ------
+        ValueError:
+            if the values were published for a different schema
+
+        Returns
+        -------
+        List[Tuple[str, str]]
+            (section, key) of all values that changed
+        """
+        # pylint: disable=protected-access
+        if self.sequence == getattr(config, '_shared_sequence', None):
+            return []
+        sequence, values, incomplete = self._read()
+        for index, value in config._overrides.items():
+            values[index] = value
+        old_values = config._values
+        changed = [
+            self._keys[index] for index, value in enumerate(values)
+            if value != old_values[index]]
+        config._shared_sequence = sequence
+        config._replace_values(values, incomplete, changed)
+        return changed
+
+    def close(self):
+        """Stop publishing reloads and unmap the shared memory."""
+        if self._subscription is not None:
+            config, callback = self._subscription
+            config.unsubscribe(callback)
+            self._subscription = None
+        self._memory.close()
+
+def _encode(config):
+    """Return binary representation of the values of `config`."""
+    # pylint: disable=protected-access
+    config._materialize_all()
+    return marshal.dumps((
+        config.schema_fingerprint,
+        [to_builtin(value) for value in config._values],
+        config._incomplete))
@@ -0,0 +1,435 @@
+"""Sources of configuration values."""
+import os
+import re
+import sys
+import collections
+from user_config.cache import FileCache
+
+# values by slot index, read from `path` (None if not a file)
+Layer = collections.namedtuple('Layer', ['name', 'path', 'values'])
+
+class LazyValues(dict):
+
+    """
+    Slot values of a file whose sections are read on first use.
+
+    Parameters
+    ----------
+    values: Dict[int, Any]
+        values of the sections that are already read, by slot
+    sections: Iterable[str]
+        sections that still have to be read
+    load: Callable[[str, user_config.profile.ConfigProfile], Dict[int, Any]]
+        returns the validated values of a section, by slot, timing
+        validators with the profile if it is not None
+    """
+
+    def __init__(self, values, sections, load):
+        dict.__init__(self, values)
+        self.pending = set(sections)
+        self._load = load
+
+    def load_section(self, section, profile=None):
+        """
+        Read `section` if it is still pending.
+
+        Instances are shared through caches, validators are timed with
+        `profile` of the instance reading the section, if any.
+        """
+        if section in self.pending:
+            self.update(self._load(section, profile))
+            self.pending.discard(section)
+            if not self.pending:
+                # release the file index
+                self._load = None
+
+# validated values of drop-in files, keyed on file state and schema
+FRAGMENT_CACHE = FileCache(max_entries=1024)
+
+_BOOLEAN_STATES = {
+    '1': True, 'yes': True, 'true': True, 'on': True,
+    '0': False, 'no': False, 'false': False, 'off': False}
+
+class Source(object):
+
+    """
+    Base class for sources of configuration values.
+
+    A `Config` instance asks its sources for layers of values in order,
+    later layers take priority over earlier ones, and merges them once
+    all sources are done. Sources should not do any work if they have
+    nothing to contribute.
+
+    Attributes
+    ----------
+    blocking: bool
+        True if resolving the source does I/O, `Config.load_async` only
+        resolves blocking sources in an executor
+
+    Examples
+    --------
+    ..doctest::
+
+        >>> TODO
+    """
+
+    blocking = False
+
+    def get_paths(self):
+        """Return files or directories this source reads."""
+        return []
+
+    def layers(self, config):
+        """
+        Return the layers of values this source contributes.
+
+        Parameters
+        ----------
+        config: user_config.Config
+            instance that is being loaded, use its `_read_layer` and
+            `_create_layer` methods to create layers from files or from
+            values keyed on (section, key)
+
+        Raises
+        ------
+        InvalidData:
+            if the source contains invalid data
+
+        Returns
+        -------
+        List[user_config.Layer]
+            layers in order of priority
+        """
+        raise NotImplementedError
+
+    def refresh(self, config, layers):
+        """
+        Return new layers if files were added or removed, on reload.
+
+        Parameters
+        ----------
+        config: user_config.Config
+            instance that is being reloaded
+        layers: List[user_config.Layer]
+            layers this source contributed so far
+
+        Returns
+        -------
+        Optional[List[user_config.Layer]]
+            None if `layers` still cover all files. Layers of files that
+            are still there should be passed on unchanged, `reload`
+            reads them again if needed
+        """
+        return None
+
+    def finish(self, config):
+        """Called when all layers of `config` are merged."""
+
+class FileSource(Source):
+
+    """
+    Values from a single configuration file.
+
+    A missing file contributes an empty layer, so it is picked up when it
+    is created and the configuration gets reloaded.
+
+    Parameters
+    ----------
+    path: pathlib.Path
+        configuration file
+    name: str, optional
+        layer name, defaults to None: the path
+    """
+
+    blocking = True
+
+    def __init__(self, path, name=None):
+        self.path = path
+        self.name = str(path) if name is None else name
+
+    def get_paths(self):
+        return [self.path]
+
+    def layers(self, config):
+        # pylint: disable=protected-access
+        return [config._read_layer(self.name, self.path)]
+
+class DirectorySource(Source):
+
+    """
+    Values from all matching files in a drop-in directory.
+
+    Files are read concurrently in a thread pool, but merged in lexical
+    order of their names, every file is its own layer. Additive lists
+    collect items from all files in that order. Values of files that did
+    not change are taken from `cache`. A missing directory contributes
+    nothing. `Config.reload` lists the directory again, files added
+    later are picked up.
+
+    Parameters
+    ----------
+    path: pathlib.Path
+        directory to read
+    pattern: str, optional
+        glob pattern for files, defaults to None: all files with the
+        extension of the configuration file type
+    name: str, optional
+        layer name prefix, defaults to None: the path
+    max_workers: int, optional
+        number of threads to read files with, defaults to None: the
+        `ThreadPoolExecutor` default. Threads only pay off when reading
+        waits for storage (cold caches, network file systems), parsing
+        itself holds the GIL. 1 reads files in the calling thread
+    cache: user_config.cache.FileCache, optional
+        cache for validated values per file, defaults to None:
+        `FRAGMENT_CACHE`
+
+    Examples
+    --------
+    ..doctest::
+
+        >>> DirectorySource(Path('/etc/xdg/my_app/config.d')) # doctest: +SKIP
+    """
+
+    blocking = True
+
+    def __init__(
+            self, path, pattern=None, name=None, max_workers=None,
+            cache=None):
+        self.path = path
+        self.pattern = pattern
+        self.name = str(path) if name is None else name
+        self.max_workers = max_workers
+        self.cache = FRAGMENT_CACHE if cache is None else cache
+
+    def get_paths(self):
+        return [self.path]
+
+    def get_files(self, config):
+        """Return files to read, in order of priority."""
+        if not self.path.is_dir():
+            return []
+        pattern = self.pattern
+        if pattern is None:
+            # pylint: disable=protected-access
+            pattern = '*.{}'.format(config._extension)
+        return sorted(
+            (path for path in self.path.glob(pattern) if path.is_file()),
+            key=lambda path: path.name)
+
+    def _read(self, config, path):
+        """Return layer of a single file, from cache if unchanged."""
+        name = '{}/{}'.format(self.name, path.name)
+        # pylint: disable=protected-access
+        values = self.cache.get(
+            path,
+            lambda path: config._read_layer(name, path).values,
+            config.schema_fingerprint)
+        return Layer(name, path, values)
+
+    def refresh(self, config, layers):
+        files = self.get_files(config)
+        if files == [layer.path for layer in layers]:
+            return None
+        current = dict((layer.path, layer) for layer in layers)
+        return [
+            current[path] if path in current else self._read(config, path)
+            for path in files]
+
+    def layers(self, config):
+        files = self.get_files(config)
+        if len(files) < 2 or self.max_workers == 1:
+            return [self._read(config, path) for path in files]
+        try:
+            from concurrent.futures import ThreadPoolExecutor
+        except ImportError:
+            return [self._read(config, path) for path in files]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # map keeps the order, and raises the first error in that order
+            return list(executor.map(
+                lambda path: self._read(config, path), files))
+
+def convert_text(element, text):
+    """
+    Convert `text` to the type of `element`.
+
+    Lists are comma separated, booleans accept 1/yes/true/on and
+    0/no/false/off.
+
+    Parameters
+    ----------
+    element: ConfigElement
+        element to convert for
+    text: str
+        raw value
+
+    Raises
+    ------
+    ValueError:
+        if `text` can not be converted
+
+    Returns
+    -------
+    Any
+    """
+    if element.type_ == list:
+        return [
+            _convert_item(element.subtype, item.strip())
+            for item in text.split(',') if item.strip()]
+    return _convert_item(element.type_, text)
+
+def _convert_item(type_, text):
+    if type_ == bool:
+        try:
+            return _BOOLEAN_STATES[text.lower()]
+        except KeyError:
+            raise ValueError('not a boolean: {}'.format(text))
+    return type_(text)
+
+class EnvironmentSource(Source):
+
+    """
+    Values from environment variables.
+
+    Options are read from `<PREFIX>_<SECTION>_<KEY>`, or `<PREFIX>_<KEY>`
+    for options outside of sections, in upper case. Empty variables are
+    ignored. See `convert_text` for the format of values.
+
+    Parameters
+    ----------
+    prefix: str, optional
+        variable name prefix, defaults to None: the application name
+    environment: Mapping[str, str], optional
+        variables to read, defaults to None: `os.environ`
+
+    Examples
+    --------
+    ..doctest::
+
+        >>> TODO
+    """
+
+    def __init__(self, prefix=None, environment=None):
+        self.prefix = prefix
+        self.environment = environment
+
+    def get_names(self, config):
+        """Return variable name per slot index of `config`."""
+        prefix = self.prefix
+        if prefix is None:
+            prefix = config.application
+        prefix = re.sub(r'\W', '_', prefix).upper()
+        names = {}
+        # pylint: disable=protected-access
+        for index, entry in enumerate(config._schema):
+            if entry.section is None:
+                name = '{}_{}'.format(prefix, entry.key)
+            else:
+                name = '{}_{}_{}'.format(prefix, entry.section, entry.key)
+            names[name.upper()] = index
+        return names
+
+    def layers(self, config):
+        environment = os.environ if self.environment is None else \
+            self.environment
+        values = {}
+        # pylint: disable=protected-access
+        schema = config._schema
+        for name, index in self.get_names(config).items():
+            text = environment.get(name)
+            if not text:
+                continue
+            entry = schema[index]
+            values[(entry.section, entry.key)] = convert_text(
+                entry.element, text)
+        return [config._create_layer('environment', None, values)]
+
+class DictSource(Source):
+
+    """
+    Values from a dictionary.
+
+    Parameters
+    ----------
+    values: Dict[str, Any]
+        values of options outside of sections, and a dictionary of
+        values per section
+    name: str, optional
+        layer name, defaults to dict
+
+    Raises
+    ------
+    AttributeError:
+        if `values` contain an unknown option, when the layer is created
+    """
+
+    def __init__(self, values, name='dict'):
+        self.values = values
+        self.name = name
+
+    def layers(self, config):
+        values = {}
+        # pylint: disable=protected-access
+        for key, value in self.values.items():
+            if key in config._bound_types:
+                for section_key, section_value in value.items():
+                    values[(key, section_key)] = section_value
+            else:
+                values[(None, key)] = value
+        for section, key in values:
+            if (section, key) not in config._positions:
+                raise AttributeError('no option {} in {}'.format(
+                    key, 'the root' if section is None else
+                    'section {}'.format(section)))
+        return [config._create_layer(self.name, None, values)]
+
+class CommandLineSource(Source):
+
+    """
+    Values from command line arguments.
+
+    The parser is only used if the arguments contain at least one of our
+    options, other arguments are ignored in that case. It is built once
+    per class and shared by all instances. `--generate-config` prints a
+    configuration file once all sources are merged, and exits.
+
+    Parameters
+    ----------
+    arguments: List[str], optional
+        arguments to parse, defaults to None: `sys.argv[1:]`
+    """
+
+    def __init__(self, arguments=None):
+        self.arguments = arguments
+        self.generate_config = False
+
+    def layers(self, config):
+        arguments = sys.argv[1:] if self.arguments is None else \
+            self.arguments
+        # pylint: disable=protected-access
+        if not config._has_cli_arguments(arguments):
+            return []
+        with config._phase('parser'):
+            if config._wants_help(arguments):
+                # only help output mentions the configuration paths
+                parser = config._build_parser([
+                    path for source in config._sources
+                    for path in source.get_paths()])
+            else:
+                parser = config._get_parser()
+        with config._phase('parse_args'):
+            command_line_arguments = vars(parser.parse_args(arguments))
+        self.generate_config = command_line_arguments['generate_config']
+        values = {}
+        schema = config._schema
+        with config._phase('extract'):
+            for dest, index in config._cli_destinations:
+                value = command_line_arguments[dest]
+                if value is not None:
+                    values[(schema[index].section, schema[index].key)] = value
+        return [config._create_layer('cli', None, values)]
+
+    def finish(self, config):
+        if self.generate_config:
+            config.dump(sys.stdout)
+            sys.exit(False)